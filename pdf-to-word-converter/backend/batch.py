@@ -0,0 +1,137 @@
+import os
+import time
+import uuid
+import zipfile
+import hashlib
+import logging
+import posixpath
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uploads import PDF_MAGIC, PDF_MAGIC_WINDOW, UPLOAD_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Límites de una conversión por lotes
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "500"))
+BATCH_MAX_ZIP_BYTES = int(os.getenv("BATCH_MAX_ZIP_MB", "1024")) * 1024 * 1024
+# Total descomprimido permitido por ZIP (protección frente a zip bombs)
+BATCH_MAX_UNCOMPRESSED_BYTES = int(os.getenv("BATCH_MAX_UNCOMPRESSED_MB", "4096")) * 1024 * 1024
+
+
+class BatchItem:
+    """📄 Un PDF del lote: origen, ruta temporal y resultado de su conversión"""
+
+    def __init__(self, source: str, path: Optional[str] = None, size: int = 0, sha256: Optional[str] = None,
+                 error: Optional[str] = None):
+        self.source = source
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.output: Optional[str] = None
+        self.error = error
+        self.duration: Optional[float] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.output is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "status": "ok" if self.ok else "error",
+            "output": self.output,
+            "size": self.size,
+            "duration_ms": round(self.duration * 1000) if self.duration is not None else None,
+            "error": self.error,
+        }
+
+
+def docx_name(source: str, used: set) -> str:
+    """Nombre del DOCX dentro del ZIP de salida: conserva carpetas y evita duplicados"""
+    stem, _ = posixpath.splitext(source)
+    name = f"{stem}.docx"
+    counter = 2
+    while name.lower() in used:
+        name = f"{stem} ({counter}).docx"
+        counter += 1
+    used.add(name.lower())
+    return name
+
+
+def _safe_member_name(name: str) -> Optional[str]:
+    """Ruta relativa normalizada del miembro o None si hay que ignorarlo"""
+    name = posixpath.normpath(name.replace("\\", "/")).lstrip("/")
+    parts = name.split("/")
+    if name.startswith("..") or any(p.startswith(".") or p == "__MACOSX" for p in parts):
+        return None
+    return name
+
+
+def extract_pdfs_from_zip(zip_path: str, dest_dir: Path, max_files: int,
+                          max_uncompressed: int = BATCH_MAX_UNCOMPRESSED_BYTES) -> List[BatchItem]:
+    """📦 Extrae los PDF de un ZIP a archivos temporales (ejecutar en un thread)
+
+    Se ignoran carpetas, archivos ocultos y los que no terminan en ``.pdf``.
+    Los miembros que no empiezan por ``%PDF-`` se devuelven como errores del
+    lote en vez de abortar la extracción. El SHA-256 se calcula al copiar,
+    así las conversiones pasan por la cache de resultados.
+    """
+    items: List[BatchItem] = []
+    with zipfile.ZipFile(zip_path) as archive:
+        members = []
+        for member in archive.infolist():
+            if member.is_dir() or not member.filename.lower().endswith(".pdf"):
+                continue
+            name = _safe_member_name(member.filename)
+            if name is not None:
+                members.append((name, member))
+
+        # Límites comprobados con el índice del ZIP, antes de escribir nada
+        if len(members) > max_files:
+            raise ValueError(f"El lote supera el máximo de {max_files} archivos")
+        if sum(member.file_size for _, member in members) > max_uncompressed:
+            raise ValueError(f"El ZIP supera {max_uncompressed // (1024 * 1024)} MB descomprimido")
+
+        written: List[str] = []
+        try:
+            for name, member in members:
+                dest = dest_dir / f"batch_input_{uuid.uuid4().hex}.pdf"
+                digest = hashlib.sha256()
+                with archive.open(member) as src, open(dest, "wb") as out:
+                    written.append(str(dest))
+                    first = src.read(UPLOAD_CHUNK_SIZE)
+                    if PDF_MAGIC not in first[:PDF_MAGIC_WINDOW]:
+                        out.close()
+                        os.remove(dest)
+                        written.pop()
+                        items.append(BatchItem(name, size=member.file_size, error="No es un PDF válido"))
+                        continue
+                    chunk = first
+                    while chunk:
+                        digest.update(chunk)
+                        out.write(chunk)
+                        chunk = src.read(UPLOAD_CHUNK_SIZE)
+                items.append(BatchItem(name, str(dest), member.file_size, digest.hexdigest()))
+        except BaseException:
+            # CRC incorrecto, disco lleno, cancelación...: no dejar copias huérfanas
+            for path in written:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            raise
+
+    logger.info(f"📦 {len(items)} PDF(s) extraídos de {os.path.basename(zip_path)}")
+    return items
+
+
+def batch_report(items: List[BatchItem], started_at: float) -> Dict[str, Any]:
+    """Resumen que se añade al final del ZIP (``_report.json``)"""
+    converted = sum(1 for item in items if item.ok)
+    return {
+        "total": len(items),
+        "converted": converted,
+        "failed": len(items) - converted,
+        "duration_ms": round((time.time() - started_at) * 1000),
+        "files": [item.to_dict() for item in items],
+    }
@@ -0,0 +1,120 @@
+"""⏱️ Compara los backends de PDFToolsManager (pypdf vs PyMuPDF)
+
+Genera PDFs sintéticos con reportlab (10/100/1000 páginas por defecto),
+ejecuta info/split/extract/merge con cada backend, comprueba que ambos
+devuelven los mismos conteos de páginas y metadata, e imprime los tiempos.
+
+Uso (desde backend/):
+    python benchmarks/bench_pdf_backends.py
+    python benchmarks/bench_pdf_backends.py --pages 10 100 --json resultados.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from pypdf import PdfReader
+
+from pdf_tools import PDFToolsManager
+from pdf_backends import PDF_BACKENDS
+
+
+def make_pdf(path: Path, pages: int):
+    c = canvas.Canvas(str(path), pagesize=A4)
+    c.setTitle(f"Benchmark {pages} páginas")
+    c.setAuthor("bench")
+    for i in range(pages):
+        c.setFont("Helvetica", 11)
+        for line in range(40):
+            c.drawString(50, 800 - line * 18, f"Página {i + 1} - línea {line + 1} " + "lorem ipsum " * 5)
+        c.showPage()
+    c.save()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def page_count(path: str) -> int:
+    return len(PdfReader(path).pages)
+
+
+def run_backend(backend: str, pdf_path: Path, work_dir: Path):
+    out_dir = work_dir / backend
+    out_dir.mkdir(exist_ok=True)
+    manager = PDFToolsManager(out_dir, backend=backend)
+    timings, checks = {}, {}
+
+    info, timings['info'] = timed(manager.get_pdf_info, str(pdf_path))
+    checks['info'] = {k: v for k, v in info.items() if k != 'pages_info'}
+    checks['pages_info'] = info['pages_info']
+    manager.release_document(str(pdf_path))
+
+    total = info['total_pages']
+    files, timings['split_pages'] = timed(manager.split_pdf_by_pages, str(pdf_path), "bench")
+    checks['split_pages'] = [page_count(f) for f in files]
+    manager.release_document(str(pdf_path))
+
+    extracted, timings['extract'] = timed(manager.extract_specific_pages, str(pdf_path), list(range(1, total + 1, 2)))
+    checks['extract'] = page_count(extracted)
+    manager.release_document(str(pdf_path))
+
+    merged, timings['merge_x3'] = timed(manager.merge_pdfs, [str(pdf_path)] * 3)
+    checks['merge_x3'] = page_count(merged)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    return timings, checks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--json", help="Guardar resultados en este archivo JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        for pages in args.pages:
+            pdf_path = work_dir / f"bench_{pages}.pdf"
+            make_pdf(pdf_path, pages)
+
+            per_backend = {name: run_backend(name, pdf_path, work_dir) for name in PDF_BACKENDS}
+            checks = [c for _, c in per_backend.values()]
+            identical = all(c == checks[0] for c in checks)
+
+            print(f"\n📄 {pages} páginas ({os.path.getsize(pdf_path) / 1024:.0f} KB) - resultados idénticos: {'sí' if identical else 'NO'}")
+            print(f"{'operación':<14}" + "".join(f"{name:>12}" for name in PDF_BACKENDS) + f"{'speedup':>10}")
+            baseline = next(iter(PDF_BACKENDS))
+            for op in per_backend[baseline][0]:
+                row = [per_backend[name][0][op] for name in PDF_BACKENDS]
+                speedup = row[0] / row[1] if row[1] else float('inf')
+                print(f"{op:<14}" + "".join(f"{t * 1000:>10.1f}ms" for t in row) + f"{speedup:>9.1f}x")
+
+            results.append({
+                "pages": pages,
+                "identical": identical,
+                "timings": {name: t for name, (t, _) in per_backend.items()},
+            })
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Resultados guardados en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,447 @@
+"""⏱️ Suite de benchmarks: conversión, PDFToolsManager y endpoints HTTP
+
+Genera un corpus sintético reproducible (ver corpus.py) y mide, para cada
+documento, throughput, latencia p50/p99 y pico de RSS:
+
+- ``ops``: ``convert_pdf_to_docx`` y cada método de PDFToolsManager. Cada
+  operación corre en un proceso nuevo, así el pico de RSS es el suyo.
+- ``http``: los endpoints contra un servidor uvicorn real (arrancado aquí o
+  ``--url``) con varios niveles de concurrencia. El pico de RSS suma el
+  proceso del servidor y sus workers.
+
+Los resultados se guardan en JSON; ``--compare`` los contrasta con una
+ejecución anterior y sale con código 1 si algo empeora más de ``--threshold``.
+
+Uso (desde backend/):
+    python benchmarks/bench_suite.py --json actual.json
+    python benchmarks/bench_suite.py --suite ops --corpus text_10 dense_100 --iterations 3
+    python benchmarks/bench_suite.py --suite http --concurrency 1 8 --requests 40
+    python benchmarks/bench_suite.py --json nuevo.json --compare actual.json --threshold 0.2
+"""
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import asyncio
+import logging
+import platform
+import resource
+import argparse
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from datetime import datetime, timezone
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from corpus import DEFAULT_CORPUS, generate_corpus, select_specs
+
+
+# ============================================
+# Estadísticas
+# ============================================
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentil por rango más cercano (con pocas muestras p99 = máximo)"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], wall: float, pages: int) -> Dict[str, Any]:
+    return {
+        "samples": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "throughput_ops_s": round(len(latencies) / wall, 3) if wall else None,
+        "throughput_pages_s": round(len(latencies) * pages / wall, 1) if wall else None,
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# ============================================
+# Operaciones (cada una en su propio proceso)
+# ============================================
+
+def _no_output(func, *args) -> Callable[[], List[str]]:
+    def run():
+        func(*args)
+        return []
+    return run
+
+
+def _ops(manager, pdf_path: str, pages: int, out_dir: Path) -> Dict[str, Callable[[], Tuple[Callable, List[str]]]]:
+    """operación -> preparación; la preparación devuelve (trabajo medido, archivos auxiliares)"""
+    from converter import convert_pdf_to_docx
+
+    ranges = [(start, min(start + 9, pages)) for start in range(1, pages + 1, 10)]
+    odd_pages = list(range(1, pages + 1, 2))
+    per_page = manager.plan_split_parts(pages, "bench")
+
+    def zip_setup():
+        files = manager.split_pdf_by_pages(pdf_path, "bench")
+        return (lambda: [manager.create_zip_from_files(files)]), files
+
+    return {
+        "convert_pdf_to_docx": lambda: ((lambda: [convert_pdf_to_docx(pdf_path, str(out_dir))]), []),
+        "count_pages": lambda: (_no_output(manager.count_pages, pdf_path), []),
+        "validate_pdf_file": lambda: (_no_output(manager.validate_pdf_file, pdf_path), []),
+        "get_pdf_info": lambda: (_no_output(manager.get_pdf_info, pdf_path), []),
+        "split_pdf_by_pages": lambda: ((lambda: manager.split_pdf_by_pages(pdf_path, "bench")), []),
+        "split_pdf_by_ranges": lambda: ((lambda: manager.split_pdf_by_ranges(pdf_path, ranges, "bench")), []),
+        "extract_specific_pages": lambda: ((lambda: [manager.extract_specific_pages(pdf_path, odd_pages)]), []),
+        "merge_pdfs": lambda: ((lambda: [manager.merge_pdfs([pdf_path] * 3)]), []),
+        "render_parts": lambda: (_no_output(manager.render_parts, pdf_path, per_page), []),
+        "create_zip_from_files": zip_setup,
+    }
+
+
+OPERATIONS = (
+    "convert_pdf_to_docx", "count_pages", "validate_pdf_file", "get_pdf_info", "split_pdf_by_pages",
+    "split_pdf_by_ranges", "extract_specific_pages", "merge_pdfs", "render_parts", "create_zip_from_files",
+)
+
+
+def measure_operation(operation: str, pdf_path: str, pages: int, iterations: int, out_dir: str) -> Dict[str, Any]:
+    """Se ejecuta en un proceso nuevo: mide ``iterations`` repeticiones en frío"""
+    logging.basicConfig(level=logging.WARNING)
+    from pdf_tools import PDFToolsManager
+
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    manager = PDFToolsManager(out)
+    baseline_rss = peak_rss_mb()
+    prepare = _ops(manager, pdf_path, pages, out)[operation]
+
+    latencies = []
+    for _ in range(iterations):
+        manager.release_document(pdf_path)
+        run, aux_files = prepare()
+        manager.release_document(pdf_path)
+        start = time.perf_counter()
+        outputs = run()
+        latencies.append(time.perf_counter() - start)
+        manager.cleanup_files(list(outputs or []) + aux_files)
+
+    shutil.rmtree(out, ignore_errors=True)
+    result = summarize(latencies, sum(latencies), pages)
+    result.update({"baseline_rss_mb": baseline_rss, "peak_rss_mb": peak_rss_mb()})
+    return result
+
+
+def run_ops_suite(corpus: Dict[str, Tuple[Path, dict]], operations: List[str], iterations: int,
+                  convert_iterations: int, convert_max_pages: int, work_dir: Path) -> List[Dict[str, Any]]:
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for doc_name, (pdf_path, spec) in corpus.items():
+        for operation in operations:
+            n = iterations
+            if operation == "convert_pdf_to_docx":
+                if spec["pages"] > convert_max_pages:
+                    continue
+                n = convert_iterations
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                stats = pool.submit(measure_operation, operation, str(pdf_path), spec["pages"], n,
+                                    str(work_dir / f"ops_{operation}")).result()
+            record = {"key": f"ops/{operation}/{doc_name}", "suite": "ops", "operation": operation,
+                      "document": doc_name, "pages": spec["pages"], **stats}
+            results.append(record)
+            print(f"  {operation:<24}{doc_name:<20}p50 {stats['p50_ms']:>10.1f} ms  p99 {stats['p99_ms']:>10.1f} ms  "
+                  f"{stats['throughput_pages_s']:>10.1f} pág/s  RSS {stats['peak_rss_mb']:>7.1f} MB")
+    return results
+
+
+# ============================================
+# Endpoints HTTP bajo concurrencia
+# ============================================
+
+def _process_tree(pid: int) -> List[int]:
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class RSSSampler:
+    """Muestrea el RSS del servidor y sus workers (Linux, /proc) y guarda el pico"""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if self.pid and os.path.exists(f"/proc/{self.pid}"):
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_kb = max(self.peak_kb, sum(_rss_kb(p) for p in _process_tree(self.pid)))
+            self._stop.wait(self.interval)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    @property
+    def peak_mb(self) -> Optional[float]:
+        return round(self.peak_kb / 1024, 1) if self._thread else None
+
+
+def http_scenarios(pdf_bytes: bytes, pages: int) -> Dict[str, Callable[[], dict]]:
+    """endpoint -> kwargs de httpx para una petición"""
+    pdf = lambda name="bench.pdf": (name, pdf_bytes, "application/pdf")
+    return {
+        "/pdf/info": lambda: {"files": {"file": pdf()}},
+        "/pdf/split/pages": lambda: {"files": {"file": pdf()}},
+        "/pdf/split/ranges": lambda: {"files": {"file": pdf()}, "data": {"ranges": json.dumps([[1, min(pages, 10)]])}},
+        "/pdf/extract/pages": lambda: {"files": {"file": pdf()}, "data": {"pages": json.dumps(list(range(1, pages + 1, 2)))}},
+        "/pdf/merge": lambda: {"files": [("files", pdf("a.pdf")), ("files", pdf("b.pdf"))]},
+        "/convert": lambda: {"files": {"file": pdf()}},
+    }
+
+
+async def _load(url: str, build: Callable[[], dict], requests: int, concurrency: int, timeout: float):
+    import httpx
+
+    latencies, errors = [], 0
+    slots = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        async def one():
+            nonlocal errors
+            async with slots:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, **build())
+                    await response.aread()
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        wall = time.perf_counter() - start
+    return latencies, wall, errors
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(work_dir: Path, env_overrides: Dict[str, str]) -> Tuple[subprocess.Popen, str]:
+    """Arranca uvicorn con main:app (TEMP_DIR dentro de ``work_dir``) y espera a /health"""
+    import httpx
+
+    port = _free_port()
+    env = {**os.environ, "CONVERSION_CACHE_ENABLED": "false", **env_overrides}
+    # Los logs del servidor van a server.log para no mezclarse con los resultados
+    log = open(work_dir / "server.log", "wb")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", str(BACKEND_DIR),
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    log.close()
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"❌ El servidor no arrancó:\n{(work_dir / 'server.log').read_text()[-2000:]}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return server, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("❌ El servidor no respondió a /health en 60 s")
+
+
+def run_http_suite(corpus: Dict[str, Tuple[Path, dict]], endpoints: List[str], concurrency: List[int],
+                   requests: int, timeout: float, base_url: Optional[str], work_dir: Path,
+                   convert_max_pages: int, warmup: Optional[int] = None) -> List[Dict[str, Any]]:
+    server = None
+    if not base_url:
+        server_dir = work_dir / "server"
+        server_dir.mkdir(exist_ok=True)
+        server, base_url = start_server(server_dir, {})
+    results = []
+    try:
+        for doc_name, (pdf_path, spec) in corpus.items():
+            scenarios = http_scenarios(pdf_path.read_bytes(), spec["pages"])
+            for endpoint in endpoints:
+                if endpoint == "/convert" and spec["pages"] > convert_max_pages:
+                    continue
+                # Calentamiento (no se mide): las primeras peticiones arrancan los workers del engine
+                warmup_requests = max(concurrency) if warmup is None else warmup
+                if warmup_requests:
+                    asyncio.run(_load(base_url + endpoint, scenarios[endpoint], warmup_requests, max(concurrency), timeout))
+                for level in concurrency:
+                    with RSSSampler(server.pid if server else None) as sampler:
+                        latencies, wall, errors = asyncio.run(
+                            _load(base_url + endpoint, scenarios[endpoint], requests, level, timeout)
+                        )
+                    stats = summarize(latencies, wall, spec["pages"])
+                    stats.update({"errors": errors, "peak_rss_mb": sampler.peak_mb})
+                    results.append({"key": f"http{endpoint}/{doc_name}/c{level}", "suite": "http",
+                                    "endpoint": endpoint, "document": doc_name, "pages": spec["pages"],
+                                    "concurrency": level, **stats})
+                    rss = f"{stats['peak_rss_mb']:>7.1f} MB" if stats["peak_rss_mb"] is not None else "      -"
+                    print(f"  {endpoint:<20}{doc_name:<20}c={level:<4}p50 {stats['p50_ms']:>10.1f} ms  "
+                          f"p99 {stats['p99_ms']:>10.1f} ms  {stats['throughput_ops_s']:>8.2f} req/s  "
+                          f"RSS {rss}  errores {errors}")
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+    return results
+
+
+# ============================================
+# Comparación con una ejecución anterior
+# ============================================
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, threshold: float) -> List[str]:
+    """Regresiones de p50, p99, throughput o RSS mayores que ``threshold`` (0.2 = 20 %)"""
+    with open(baseline_path) as f:
+        baseline = {r["key"]: r for r in json.load(f)["results"]}
+
+    regressions = []
+    for record in results:
+        old = baseline.get(record["key"])
+        if not old:
+            continue
+        checks = [("p50_ms", 1), ("p99_ms", 1), ("peak_rss_mb", 1), ("throughput_ops_s", -1)]
+        for field, direction in checks:
+            before, after = old.get(field), record.get(field)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * direction
+            if change > threshold:
+                regressions.append(f"{record['key']} {field}: {before} -> {after} ({change * 100:+.0f}%)")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", choices=("ops", "http", "all"), default="all")
+    parser.add_argument("--corpus", nargs="+", help=f"Documentos ({', '.join(s.name for s in DEFAULT_CORPUS)})")
+    parser.add_argument("--corpus-dir", help="Directorio donde generar/reutilizar el corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=list(OPERATIONS))
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--convert-iterations", type=int, default=2)
+    parser.add_argument("--convert-max-pages", type=int, default=100,
+                        help="No convierte a DOCX documentos más largos (tarda minutos)")
+    parser.add_argument("--endpoints", nargs="+", default=list(http_scenarios(b"", 1)))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=20, help="Peticiones por endpoint y nivel de concurrencia")
+    parser.add_argument("--warmup", type=int, help="Peticiones de calentamiento por endpoint (por defecto, la concurrencia máxima)")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--url", help="Servidor ya arrancado (si no, se arranca uno local)")
+    parser.add_argument("--json", help="Guardar resultados en este archivo JSON")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    specs = select_specs(args.corpus)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        corpus_dir = Path(args.corpus_dir) if args.corpus_dir else work_dir / "corpus"
+        print("📚 Generando corpus...")
+        corpus = generate_corpus(corpus_dir, specs, args.seed)
+
+        results = []
+        if args.suite in ("ops", "all"):
+            print("\n⚙️ Operaciones")
+            results += run_ops_suite(corpus, args.operations, args.iterations, args.convert_iterations,
+                                     args.convert_max_pages, work_dir)
+        if args.suite in ("http", "all"):
+            print("\n🌐 Endpoints HTTP")
+            results += run_http_suite(corpus, args.endpoints, args.concurrency, args.requests, args.timeout,
+                                      args.url, work_dir, args.convert_max_pages, args.warmup)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pdf_backend": os.getenv("PDF_BACKEND", "pypdf"),
+            "seed": args.seed,
+            "corpus": {name: spec for name, (_, spec) in corpus.items()},
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Resultados guardados en {args.json}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n⚠️ {len(regressions)} regresión(es) respecto a {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\n✅ Sin regresiones respecto a {args.compare} (umbral {args.threshold * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""📚 Corpus sintético y reproducible para los benchmarks
+
+Cada documento se genera con reportlab a partir de una semilla fija
+(``invariant=1``: mismos bytes en cada ejecución), variando número de
+páginas, imágenes por página, fuentes y densidad de texto.
+"""
+import io
+import random
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+FONTS = ("Helvetica", "Times-Roman", "Courier", "Helvetica-Bold", "Times-Italic", "Courier-Oblique")
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+         "incididunt ut labore et dolore magna aliqua página conversión documento").split()
+
+
+@dataclass(frozen=True)
+class CorpusSpec:
+    name: str
+    pages: int
+    lines_per_page: int = 40
+    fonts: int = 1
+    images_per_page: int = 0
+    # Imágenes compartidas por todas las páginas (un XObject) o distintas en cada una
+    shared_images: bool = False
+
+
+DEFAULT_CORPUS: Tuple[CorpusSpec, ...] = (
+    CorpusSpec("text_10", pages=10),
+    CorpusSpec("sparse_100", pages=100, lines_per_page=8),
+    CorpusSpec("dense_100", pages=100, lines_per_page=70),
+    CorpusSpec("fonts_50", pages=50, fonts=len(FONTS)),
+    CorpusSpec("images_30", pages=30, lines_per_page=10, images_per_page=3),
+    CorpusSpec("shared_images_100", pages=100, lines_per_page=10, images_per_page=2, shared_images=True),
+    CorpusSpec("text_1000", pages=1000, lines_per_page=20),
+)
+
+
+def _image(rng: random.Random, size: int = 160) -> ImageReader:
+    """Imagen RGB con ruido (no comprime casi nada, como una foto o un escaneo)"""
+    image = Image.frombytes("RGB", (size, size), rng.randbytes(size * size * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=80)
+    buffer.seek(0)
+    return ImageReader(buffer)
+
+
+def make_pdf(path: Path, spec: CorpusSpec, seed: int = 0) -> Path:
+    rng = random.Random(f"{spec.name}:{seed}")
+    width, height = A4
+    c = canvas.Canvas(str(path), pagesize=A4, invariant=1)
+    c.setTitle(f"Benchmark {spec.name}")
+    c.setAuthor("bench")
+
+    shared = [_image(rng) for _ in range(spec.images_per_page)] if spec.shared_images else []
+    line_height = (height - 100) / max(spec.lines_per_page, 1)
+    font_size = min(11, line_height * 0.8)
+
+    for page in range(spec.pages):
+        for line in range(spec.lines_per_page):
+            c.setFont(FONTS[(page + line) % spec.fonts], font_size)
+            text = " ".join(rng.choice(WORDS) for _ in range(12))
+            c.drawString(50, height - 50 - line * line_height, f"{page + 1}.{line + 1} {text}")
+        for i in range(spec.images_per_page):
+            image = shared[i] if spec.shared_images else _image(rng)
+            c.drawImage(image, 50 + i * 170, 60, width=150, height=150)
+        c.showPage()
+    c.save()
+    return path
+
+
+def generate_corpus(directory: Path, specs=DEFAULT_CORPUS, seed: int = 0) -> Dict[str, Tuple[Path, dict]]:
+    """Genera (o reutiliza si ya existen) los PDFs del corpus: nombre -> (ruta, spec)"""
+    directory.mkdir(parents=True, exist_ok=True)
+    corpus = {}
+    for spec in specs:
+        path = directory / f"{spec.name}_s{seed}.pdf"
+        if not path.exists():
+            make_pdf(path, spec, seed)
+        corpus[spec.name] = (path, asdict(spec))
+    return corpus
+
+
+def select_specs(names: List[str] = None) -> Tuple[CorpusSpec, ...]:
+    if not names:
+        return DEFAULT_CORPUS
+    by_name = {spec.name: spec for spec in DEFAULT_CORPUS}
+    unknown = [n for n in names if n not in by_name]
+    if unknown:
+        raise SystemExit(f"Documentos desconocidos: {', '.join(unknown)}. Opciones: {', '.join(by_name)}")
+    return tuple(by_name[n] for n in names)
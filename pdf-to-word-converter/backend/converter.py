@@ -0,0 +1,149 @@
+import os
+import re
+import uuid
+import logging
+import importlib.metadata
+from typing import List, Optional, Tuple
+import fitz
+from docx import Document
+from pdf2docx import Converter
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Identifica la versión del motor en las claves de la cache de resultados
+CONVERTER_VERSION = f"pdf2docx-{importlib.metadata.version('pdf2docx')}"
+TEXT_CONVERTER_VERSION = f"pymupdf-text-{fitz.VersionBind}"
+
+# Conversión paralela por rangos de páginas para PDFs grandes
+PARALLEL_PAGE_THRESHOLD = int(os.getenv("PARALLEL_PAGE_THRESHOLD", "100"))
+PARALLEL_MIN_CHUNK_PAGES = int(os.getenv("PARALLEL_MIN_CHUNK_PAGES", "20"))
+
+def _settings(cv: Converter, overrides: Optional[dict]) -> dict:
+    """Ajustes por defecto de pdf2docx con los del pre-análisis encima"""
+    return {**cv.default_settings, **(overrides or {})}
+
+def convert_pdf_with_pdf2docx(pdf_path: str, docx_path: str, settings: Optional[dict] = None) -> bool:
+    """Convierte PDF a DOCX usando pdf2docx
+
+    Equivale a ``Converter.convert`` pero con cada etapa en su propio span
+    (carga, análisis del documento, análisis de páginas y generación del DOCX).
+    """
+    try:
+        with span("pdf2docx.open"):
+            cv = Converter(pdf_path)
+        try:
+            settings = _settings(cv, settings)
+            _parse_pages(cv, 0, None, settings)
+            with span("pdf2docx.make_docx"):
+                cv.make_docx(docx_path, **settings)
+        finally:
+            cv.close()
+        return os.path.exists(docx_path) and os.path.getsize(docx_path) > 0
+    except Exception as e:
+        logger.error(f"Error con pdf2docx: {e}")
+        return False
+
+def convert_pdf_to_docx(pdf_path: str, output_dir: str, settings: Optional[dict] = None) -> str:
+    """Convierte PDF a DOCX usando pdf2docx (``settings`` sobrescribe los ajustes por defecto)"""
+    unique_id = str(uuid.uuid4())
+    docx_filename = f"converted_{unique_id}.docx"
+    docx_path = os.path.join(output_dir, docx_filename)
+    
+    logger.info("Iniciando conversión con pdf2docx...")
+    if convert_pdf_with_pdf2docx(pdf_path, docx_path, settings):
+        logger.info("Conversión exitosa con pdf2docx")
+        return docx_path
+    
+    raise Exception("No se pudo convertir el archivo")
+
+# Caracteres de control que no admite el XML de un DOCX
+_XML_INVALID_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+def convert_pdf_text_only(pdf_path: str, output_dir: str) -> str:
+    """⚡ Modo fast: sólo el texto editable, sin análisis de maquetación
+
+    Un párrafo por bloque de texto de PyMuPDF (en orden de lectura) y un
+    salto de página entre páginas. No hay tablas, imágenes ni estilos, pero
+    se evita el análisis carácter a carácter de pdf2docx.
+    """
+    docx_path = os.path.join(output_dir, f"converted_{uuid.uuid4()}.docx")
+    document = Document()
+    with span("text.extract"), fitz.open(pdf_path) as pdf:
+        for page in pdf:
+            if page.number:
+                document.add_page_break()
+            for block in page.get_text("blocks", sort=True):
+                if block[6] != 0:  # bloque de imagen
+                    continue
+                text = " ".join(_XML_INVALID_CHARS.sub("", block[4]).split())
+                if text:
+                    document.add_paragraph(text)
+    with span("text.make_docx"):
+        document.save(docx_path)
+    logger.info("Conversión de sólo texto completada")
+    return docx_path
+
+# ============================================
+# Conversión por bloques de páginas
+# ============================================
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """Cuenta las páginas del PDF (sólo lee el árbol de páginas)"""
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+def plan_page_chunks(total_pages: int, workers: int, min_chunk_pages: int = PARALLEL_MIN_CHUNK_PAGES) -> List[Tuple[int, int]]:
+    """Reparte [0, total_pages) en rangos contiguos (start, end) de tamaño similar"""
+    chunks = max(1, min(workers, total_pages // max(1, min_chunk_pages)))
+    size, extra = divmod(total_pages, chunks)
+    ranges = []
+    start = 0
+    for i in range(chunks):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+def should_convert_in_parallel(total_pages: int, workers: int) -> bool:
+    return workers > 1 and total_pages >= PARALLEL_PAGE_THRESHOLD
+
+def _parse_pages(cv: Converter, start: int, end: int, settings: dict) -> None:
+    """Etapas de análisis de pdf2docx, cada una en su span"""
+    with span("pdf2docx.load_pages", start=start, end=end):
+        cv.load_pages(start, end)
+    with span("pdf2docx.parse_document"):
+        cv.parse_document(**settings)
+    with span("pdf2docx.parse_pages"):
+        cv.parse_pages(**settings)
+
+def parse_pdf_chunk(pdf_path: str, start: int, end: int, json_path: str, settings: Optional[dict] = None) -> str:
+    """Analiza las páginas [start, end) con pdf2docx y guarda el layout en JSON"""
+    cv = Converter(pdf_path)
+    try:
+        _parse_pages(cv, start, end, _settings(cv, settings))
+        with span("pdf2docx.serialize"):
+            cv.serialize(json_path)
+    finally:
+        cv.close()
+    logger.info(f"Bloque de páginas {start + 1}-{end} analizado")
+    return json_path
+
+def make_docx_from_chunks(pdf_path: str, json_paths: List[str], output_dir: str,
+                          settings: Optional[dict] = None) -> str:
+    """Une los layouts de cada bloque y genera un único DOCX"""
+    docx_path = os.path.join(output_dir, f"converted_{uuid.uuid4()}.docx")
+    cv = Converter(pdf_path)
+    try:
+        with span("pdf2docx.deserialize", chunks=len(json_paths)):
+            for json_path in json_paths:
+                cv.deserialize(json_path)
+        with span("pdf2docx.make_docx"):
+            cv.make_docx(docx_path, **_settings(cv, settings))
+    finally:
+        cv.close()
+
+    if not os.path.exists(docx_path) or os.path.getsize(docx_path) == 0:
+        raise Exception("No se pudo convertir el archivo")
+    logger.info(f"DOCX generado a partir de {len(json_paths)} bloques")
+    return docx_path
@@ -0,0 +1,189 @@
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_DOCUMENT_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class DocumentStore:
+    """📁 Documentos subidos una sola vez y reutilizados por id
+
+    Cada documento son dos archivos en ``root``: ``{id}.pdf`` y ``{id}.json``
+    (nombre original, tamaño, SHA-256 y la info resumida del PDF). Al estar
+    en disco el registro lo comparten todos los workers de uvicorn.
+
+    La caducidad es deslizante: cada acceso renueva el ``mtime`` del JSON y
+    el documento vive ``ttl`` segundos desde el último uso. Si el total
+    supera ``max_bytes`` se eliminan primero los menos usados.
+    """
+
+    def __init__(self, root: Path, ttl: int, max_bytes: int):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self._sweeper: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def valid_id(doc_id: str) -> bool:
+        return bool(_DOCUMENT_ID.match(doc_id or ""))
+
+    def _pdf(self, doc_id: str) -> Path:
+        return self.root / f"{doc_id}.pdf"
+
+    def _meta(self, doc_id: str) -> Path:
+        return self.root / f"{doc_id}.json"
+
+    def create(self, src_path: str, filename: str, size: int, sha256: str,
+               info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Registra ``src_path`` (se mueve dentro del store) y devuelve la entrada"""
+        doc_id = uuid.uuid4().hex
+        entry = {
+            "document_id": doc_id,
+            "filename": filename,
+            "size": size,
+            "sha256": sha256,
+            "created_at": time.time(),
+            "info": info,
+        }
+        os.replace(src_path, self._pdf(doc_id))
+        tmp_path = self._meta(doc_id).with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, self._meta(doc_id))
+        self.created += 1
+
+        evicted = self._evict_over_quota(keep=doc_id)
+        if evicted:
+            self.evicted += evicted
+            logger.info(f"📁 Límite de disco: {evicted} documento(s) antiguo(s) eliminado(s)")
+        return self._with_expiry(entry, time.time())
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Entrada vigente (renovando su caducidad) o None"""
+        if not self.valid_id(doc_id):
+            return None
+        meta_path = self._meta(doc_id)
+        try:
+            last_used = meta_path.stat().st_mtime
+            with open(meta_path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        now = time.time()
+        if now - last_used > self.ttl or not self._pdf(doc_id).exists():
+            if self.delete(doc_id):
+                self.expired += 1
+            return None
+        try:
+            os.utime(meta_path, (now, now))
+        except FileNotFoundError:
+            return None
+        return self._with_expiry(entry, now)
+
+    def path(self, doc_id: str) -> str:
+        return str(self._pdf(doc_id))
+
+    def delete(self, doc_id: str) -> bool:
+        if not self.valid_id(doc_id):
+            return False
+        removed = False
+        for path in (self._pdf(doc_id), self._meta(doc_id)):
+            try:
+                os.remove(path)
+                removed = True
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"No se pudo eliminar {path}: {e}")
+        return removed
+
+    def _with_expiry(self, entry: Dict[str, Any], last_used: float) -> Dict[str, Any]:
+        return {**entry, "expires_at": last_used + self.ttl}
+
+    def _scan(self) -> List[tuple]:
+        """(último uso, id, bytes) de cada documento"""
+        documents = []
+        for entry in os.scandir(self.root):
+            if not entry.name.endswith(".json"):
+                continue
+            doc_id = entry.name[:-5]
+            try:
+                last_used = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            try:
+                size = self._pdf(doc_id).stat().st_size
+            except FileNotFoundError:
+                size = 0
+            documents.append((last_used, doc_id, size))
+        return documents
+
+    def _evict_over_quota(self, keep: str) -> int:
+        documents = sorted(self._scan())
+        excess = sum(size for _, _, size in documents) - self.max_bytes
+        evicted = 0
+        for _, doc_id, size in documents:
+            if excess <= 0:
+                break
+            if doc_id == keep:
+                continue
+            if self.delete(doc_id):
+                evicted += 1
+                excess -= size
+        return evicted
+
+    def sweep(self) -> Dict[str, int]:
+        """Elimina los documentos sin uso durante más de ``ttl`` segundos"""
+        now = time.time()
+        removed, freed = 0, 0
+        for last_used, doc_id, size in self._scan():
+            if now - last_used > self.ttl and self.delete(doc_id):
+                removed += 1
+                freed += size
+        if removed:
+            self.expired += removed
+            logger.info(f"🧹 {removed} documento(s) caducado(s) eliminado(s) ({freed / 1024 / 1024:.2f} MB)")
+        return {"removed": removed, "bytes_freed": freed}
+
+    async def start_sweeper(self, interval: float):
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_forever(interval))
+
+    async def stop_sweeper(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    async def _sweep_forever(self, interval: float):
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"❌ Error barriendo documentos: {e}")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, Any]:
+        documents = self._scan()
+        return {
+            "documents": len(documents),
+            "bytes": sum(size for _, _, size in documents),
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "created": self.created,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
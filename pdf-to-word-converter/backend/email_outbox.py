@@ -0,0 +1,415 @@
+import os
+import json
+import time
+import uuid
+import random
+import sqlite3
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from graph_client import GraphAuthError, GraphClient
+
+logger = logging.getLogger(__name__)
+
+# Máximo de peticiones por llamada a /$batch de Graph
+GRAPH_BATCH_LIMIT = 20
+
+
+class SendResult:
+    """Resultado del envío de un mensaje: enviado, reintentable o fallido"""
+
+    def __init__(self, status: int, retry_after: Optional[float] = None, error: Optional[str] = None):
+        self.status = status
+        self.retry_after = retry_after
+        self.error = error
+
+    @property
+    def sent(self) -> bool:
+        return self.status == 202
+
+    @property
+    def retryable(self) -> bool:
+        # 0 = error de red o de token
+        return self.status in (0, 401, 408, 429) or self.status >= 500
+
+
+def _retry_after(headers: Dict[str, str]) -> Optional[float]:
+    for name, value in (headers or {}).items():
+        if name.lower() == "retry-after":
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
+
+
+class GraphMailTransport:
+    """🌐 Envío con ``sendMail`` de Graph reutilizando el GraphClient compartido
+
+    El token cacheado y el pool de conexiones son los mismos que usa la
+    validación de usuarios. Varios mensajes se envían en una sola petición
+    ``/$batch`` (hasta 20); Graph responde y limita cada uno por separado.
+    """
+
+    name = "graph"
+
+    def __init__(self, graph: GraphClient, sender: str):
+        self.graph = graph
+        self.sender = sender
+
+    @property
+    def send_path(self) -> str:
+        return f"/users/{self.sender}/sendMail"
+
+    async def send(self, messages: Dict[str, Dict[str, Any]]) -> Dict[str, SendResult]:
+        try:
+            if len(messages) == 1:
+                (message_id, message), = messages.items()
+                response = await self.graph.request("POST", self.send_path, json=message)
+                return {message_id: SendResult(response.status_code, _retry_after(response.headers),
+                                               None if response.status_code == 202 else response.text[:500])}
+            return await self._send_batch(messages)
+        except (httpx.HTTPError, GraphAuthError) as e:
+            return {message_id: SendResult(0, error=str(e) or type(e).__name__) for message_id in messages}
+
+    async def _send_batch(self, messages: Dict[str, Dict[str, Any]]) -> Dict[str, SendResult]:
+        requests_ = [
+            {"id": message_id, "method": "POST", "url": self.send_path,
+             "headers": {"Content-Type": "application/json"}, "body": message}
+            for message_id, message in messages.items()
+        ]
+        response = await self.graph.request("POST", "/$batch", json={"requests": requests_})
+        if response.status_code != 200:
+            result = SendResult(response.status_code, _retry_after(response.headers), response.text[:500])
+            return {message_id: result for message_id in messages}
+
+        results = {}
+        for item in response.json().get("responses", []):
+            status = int(item.get("status", 0))
+            error = None if status == 202 else json.dumps(item.get("body"), ensure_ascii=False)[:500]
+            results[item.get("id")] = SendResult(status, _retry_after(item.get("headers")), error)
+        if any(result.status == 401 for result in results.values()):
+            self.graph.token_provider.invalidate()
+        # Un id sin respuesta se reintenta
+        return {message_id: results.get(message_id, SendResult(0, error="sin respuesta en el lote"))
+                for message_id in messages}
+
+
+class LogMailTransport:
+    """📝 Transporte de desarrollo: escribe el correo en el log en vez de enviarlo"""
+
+    name = "log"
+
+    async def send(self, messages: Dict[str, Dict[str, Any]]) -> Dict[str, SendResult]:
+        for message in messages.values():
+            message = message["message"]
+            recipients = ", ".join(r["emailAddress"]["address"] for r in message["toRecipients"])
+            logger.info(f"📧 CORREO SIMULADO para {recipients}: {message['subject']}")
+        return {message_id: SendResult(202) for message_id in messages}
+
+
+class RateLimiter:
+    """Cubo de tokens: ``per_minute`` envíos por minuto con ráfagas de hasta ``burst``"""
+
+    def __init__(self, per_minute: int, burst: int):
+        self.rate = per_minute / 60
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def available(self) -> int:
+        self._refill()
+        return int(self._tokens)
+
+    def take(self, count: int):
+        self._refill()
+        self._tokens -= count
+
+    def wait_time(self) -> float:
+        """Segundos hasta que haya al menos un token"""
+        self._refill()
+        return max(0.0, (1 - self._tokens) / self.rate) if self.rate else 60.0
+
+
+class EmailOutbox:
+    """📮 Bandeja de salida de correos duradera (SQLite en modo WAL)
+
+    ``enqueue`` sólo inserta una fila y vuelve: la petición no espera a
+    Graph. Un sender en segundo plano por proceso reclama lotes de mensajes
+    pendientes (``UPDATE ... RETURNING``, así cada mensaje lo envía un solo
+    worker), los envía respetando el límite de ``rate_per_minute`` y los
+    borra al aceptarlos Graph.
+
+    Los 429, 5xx y errores de red se reintentan con backoff exponencial
+    (respetando ``Retry-After``; un 429 además pausa el sender) hasta
+    ``max_attempts``; el resto de errores marca el mensaje como ``failed``.
+    Los mensajes reclamados por un proceso que muere vuelven a la cola tras
+    ``claim_timeout`` segundos.
+    """
+
+    def __init__(self, db_path: Path, transport, rate_per_minute: int = 30,
+                 batch_size: int = GRAPH_BATCH_LIMIT, max_attempts: int = 8,
+                 backoff_base: float = 5.0, backoff_max: float = 900.0,
+                 claim_timeout: float = 300.0, failed_ttl: float = 7 * 24 * 3600,
+                 poll_interval: float = 5.0):
+        self.db_path = str(db_path)
+        self.transport = transport
+        self.batch_size = max(1, min(batch_size, GRAPH_BATCH_LIMIT))
+        self.limiter = RateLimiter(rate_per_minute, self.batch_size)
+        self.rate_per_minute = rate_per_minute
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.claim_timeout = claim_timeout
+        self.failed_ttl = failed_ttl
+        self.poll_interval = poll_interval
+        self.enqueued = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.throttled = 0
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id TEXT PRIMARY KEY,
+                    recipient TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    next_attempt_at REAL NOT NULL,
+                    claimed_at REAL,
+                    last_error TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Conexión corta por operación: segura entre threads y procesos
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _run(self, sql: str, params=()) -> List[sqlite3.Row]:
+        conn = self._connect()
+        try:
+            with conn:
+                return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def _insert(self, message_id: str, recipient: str, message: Dict[str, Any]):
+        now = time.time()
+        self._run(
+            "INSERT INTO outbox (id, recipient, payload, status, created_at, next_attempt_at) "
+            "VALUES (?, ?, ?, 'pending', ?, ?)",
+            (message_id, recipient, json.dumps(message, ensure_ascii=False), now, now)
+        )
+
+    async def enqueue(self, recipient: str, message: Dict[str, Any]) -> str:
+        """Guarda el cuerpo de ``sendMail`` y devuelve el id del mensaje"""
+        message_id = uuid.uuid4().hex
+        await asyncio.to_thread(self._insert, message_id, recipient, message)
+        self.enqueued += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return message_id
+
+    def _claim(self, limit: int) -> List[sqlite3.Row]:
+        now = time.time()
+        return self._run("""
+            UPDATE outbox SET status = 'sending', claimed_at = ?
+            WHERE id IN (
+                SELECT id FROM outbox WHERE status = 'pending' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at LIMIT ?
+            )
+            RETURNING id, recipient, payload, attempts
+        """, (now, now, limit))
+
+    def _recover(self) -> int:
+        """Devuelve a la cola lo reclamado por procesos caídos y purga los fallidos antiguos"""
+        now = time.time()
+        # Cuenta como intento: un mensaje que tumba el proceso no se reintenta sin fin
+        recovered = self._run(
+            "UPDATE outbox SET attempts = attempts + 1, claimed_at = NULL, last_error = 'proceso caído', "
+            "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END, next_attempt_at = ? "
+            "WHERE status = 'sending' AND claimed_at < ? RETURNING id",
+            (self.max_attempts, now + self.backoff_base, now - self.claim_timeout)
+        )
+        self._run("DELETE FROM outbox WHERE status = 'failed' AND next_attempt_at < ?", (now - self.failed_ttl,))
+        if recovered:
+            logger.warning(f"📮 {len(recovered)} correo(s) reclamado(s) por un proceso caído vuelven a la cola")
+        return len(recovered)
+
+    def _backoff(self, attempts: int, retry_after: Optional[float]) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        delay *= random.uniform(0.5, 1.0)
+        return max(delay, retry_after or 0)
+
+    def _apply(self, rows: List[sqlite3.Row], results: Dict[str, SendResult]):
+        now = time.time()
+        sent, retry, failed = [], [], []
+        for row in rows:
+            result = results[row["id"]]
+            attempts = row["attempts"] + 1
+            if result.sent:
+                sent.append(row["id"])
+            elif result.retryable and attempts < self.max_attempts:
+                retry.append((attempts, now + self._backoff(attempts, result.retry_after), result.error, row["id"]))
+            else:
+                failed.append((attempts, now, result.error, row["id"]))
+                logger.error(f"❌ Correo a {row['recipient']} descartado tras {attempts} intento(s): {result.error}")
+
+        conn = self._connect()
+        try:
+            with conn:
+                if sent:
+                    conn.execute(f"DELETE FROM outbox WHERE id IN ({', '.join('?' * len(sent))})", sent)
+                conn.executemany(
+                    "UPDATE outbox SET status = 'pending', attempts = ?, next_attempt_at = ?, last_error = ?, "
+                    "claimed_at = NULL WHERE id = ?", retry
+                )
+                conn.executemany(
+                    "UPDATE outbox SET status = 'failed', attempts = ?, next_attempt_at = ?, last_error = ? "
+                    "WHERE id = ?", failed
+                )
+        finally:
+            conn.close()
+        self.sent += len(sent)
+        self.retried += len(retry)
+        self.failed += len(failed)
+
+    async def flush(self) -> int:
+        """Envía un lote de mensajes vencidos; devuelve cuántos se reclamaron"""
+        if time.time() < self._paused_until:
+            return 0
+        limit = min(self.batch_size, self.limiter.available())
+        if limit <= 0:
+            return 0
+        rows = await asyncio.to_thread(self._claim, limit)
+        if not rows:
+            return 0
+
+        self.limiter.take(len(rows))
+        try:
+            results = await self.transport.send({row["id"]: json.loads(row["payload"]) for row in rows})
+        except Exception as e:
+            # Cuenta como intento fallido de todo el lote (con su espera), no vuelve tal cual a la cola
+            logger.error(f"❌ Error enviando {len(rows)} correo(s): {e}")
+            results = {}
+            error = str(e) or type(e).__name__
+        else:
+            error = "sin respuesta del transporte"
+        results = {row["id"]: results.get(row["id"]) or SendResult(0, error=error) for row in rows}
+        throttled = [r.retry_after or self.backoff_base for r in results.values() if r.status == 429]
+        if throttled:
+            self.throttled += len(throttled)
+            self._paused_until = time.time() + max(throttled)
+            logger.warning(f"⏳ Graph limitó el envío de correos; pausa de {max(throttled):.0f} s")
+        await asyncio.to_thread(self._apply, rows, results)
+        return len(rows)
+
+    def _next_wait(self) -> float:
+        """Hasta el fin de la pausa por 429, el próximo token libre o ``poll_interval``"""
+        now = time.time()
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.limiter.available() <= 0:
+            return max(0.05, self.limiter.wait_time())
+        return self.poll_interval
+
+    async def _send_forever(self):
+        last_recovery = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_recovery >= self.claim_timeout / 2:
+                    await asyncio.to_thread(self._recover)
+                    last_recovery = time.monotonic()
+                if await self.flush() >= self.batch_size:
+                    continue
+            except Exception as e:
+                logger.error(f"❌ Error en el envío de correos: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._next_wait())
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._send_forever())
+            logger.info(f"📮 Outbox de correo iniciada ({self.transport.name}, {self.rate_per_minute}/min)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self._wakeup = None
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._run("SELECT status, COUNT(*) AS n FROM outbox GROUP BY status")
+        counts = {"pending": 0, "sending": 0, "failed": 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "transport": self.transport.name,
+            **self.counts(),
+            "rate_per_minute": self.rate_per_minute,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed_total": self.failed,
+            "throttled": self.throttled,
+        }
+
+
+def email_outbox_from_env(temp_dir: Path, graph: GraphClient) -> EmailOutbox:
+    """EMAIL_TRANSPORT=log|graph, EMAIL_SENDER, EMAIL_OUTBOX_PATH, EMAIL_RATE_PER_MINUTE...
+
+    EMAIL_RATE_PER_MINUTE es por proceso: con varios workers de uvicorn hay
+    que repartir entre ellos la cuota del buzón (30 mensajes/minuto en
+    Exchange Online); si aun así Graph responde 429, el sender se pausa.
+    """
+    name = os.getenv("EMAIL_TRANSPORT", LogMailTransport.name).lower()
+    if name == GraphMailTransport.name:
+        sender = os.getenv("EMAIL_SENDER")
+        if not sender:
+            raise ValueError("EMAIL_TRANSPORT=graph necesita EMAIL_SENDER (buzón desde el que se envía)")
+        transport = GraphMailTransport(graph, sender)
+    elif name == LogMailTransport.name:
+        transport = LogMailTransport()
+    else:
+        raise ValueError(f"Transporte de correo desconocido: {name}. Opciones: graph, log")
+
+    return EmailOutbox(
+        os.getenv("EMAIL_OUTBOX_PATH", str(Path(temp_dir) / "outbox.db")),
+        transport,
+        rate_per_minute=int(os.getenv("EMAIL_RATE_PER_MINUTE", "30")),
+        batch_size=int(os.getenv("EMAIL_BATCH_SIZE", str(GRAPH_BATCH_LIMIT))),
+        max_attempts=int(os.getenv("EMAIL_MAX_ATTEMPTS", "8")),
+        backoff_base=float(os.getenv("EMAIL_BACKOFF_BASE", "5")),
+        backoff_max=float(os.getenv("EMAIL_BACKOFF_MAX", "900")),
+        poll_interval=float(os.getenv("EMAIL_POLL_INTERVAL", "5")),
+    )
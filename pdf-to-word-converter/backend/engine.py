@@ -0,0 +1,200 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+from fastapi import HTTPException
+import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerCrashed(Exception):
+    """El proceso worker murió mientras ejecutaba el trabajo"""
+
+
+class _RemoteHTTPError(Exception):
+    """HTTPException serializable para cruzar la frontera entre procesos"""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _invoke(func: Callable, args: tuple, kwargs: dict, trace: bool = False, profile: bool = False) -> Any:
+    """Ejecuta ``func`` dentro del worker traduciendo HTTPException (no es picklable)
+
+    Con ``trace``/``profile`` devuelve ``(resultado, spans, perfil)`` para que
+    el proceso principal reemita los spans y combine el perfil de la petición.
+    """
+    try:
+        if trace or profile:
+            return tracing.run_traced(func, args, kwargs, trace, profile)
+        return func(*args, **kwargs)
+    except HTTPException as e:
+        raise _RemoteHTTPError(e.status_code, e.detail)
+
+
+class WorkerEngine:
+    """⚙️ Pool de workers (procesos o threads) para trabajo CPU-bound
+
+    - ``kind="process"`` evita el GIL: cada trabajo corre en otro proceso.
+    - Los procesos se reciclan tras ``max_tasks_per_child`` trabajos por
+      worker para contener el crecimiento de memoria de pdf2docx/PyMuPDF.
+      El reciclado rota el pool completo en lugar de usar el parámetro
+      ``max_tasks_per_child`` de ProcessPoolExecutor, que en Python 3.11
+      puede bloquearse (gh-115634).
+    - Si un worker muere, el pool se reconstruye y el trabajo afectado se
+      reintenta una vez en un proceso aislado; sólo falla si vuelve a caerse,
+      así un PDF que tumba al worker no arrastra a los demás trabajos.
+    """
+
+    def __init__(self, name: str, kind: str = "process", max_workers: Optional[int] = None,
+                 max_tasks_per_child: Optional[int] = None, start_method: str = "spawn"):
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Tipo de engine inválido: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_tasks_per_child = max_tasks_per_child or None
+        self.start_method = start_method
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.crashes = 0
+        self.recycles = 0
+        # observer(engine, operación, espera_s, ejecución_s, ok) tras cada trabajo
+        self.observer: Optional[Callable[[str, str, float, float, bool], None]] = None
+        self._generation = 0
+        self._tasks_in_generation = 0
+        self._lock = threading.Lock()
+        # Limita los trabajos en ejecución; el resto espera aquí (cola del engine)
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._executor = self._new_executor()
+        logger.info(f"⚙️ Engine '{name}' iniciado: {self.kind}, {self.max_workers} workers")
+
+    def _new_executor(self, max_workers: Optional[int] = None):
+        workers = max_workers or self.max_workers
+        if self.kind == "thread":
+            return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=self.name)
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(self.start_method)
+        )
+
+    def _maybe_recycle(self):
+        """Rota el pool tras max_tasks_per_child trabajos por worker
+
+        El pool viejo termina sus trabajos en curso y sus procesos salen;
+        los trabajos nuevos ya van al pool nuevo.
+        """
+        if self.kind != "process" or not self.max_tasks_per_child:
+            return
+        with self._lock:
+            if self._tasks_in_generation < self.max_tasks_per_child * self.max_workers:
+                return
+            self.recycles += 1
+            self._generation += 1
+            self._tasks_in_generation = 0
+            old = self._executor
+            self._executor = self._new_executor()
+        old.shutdown(wait=False)
+        logger.info(f"♻️ Engine '{self.name}': workers reciclados ({self.recycles})")
+
+    def _rebuild(self, generation: int):
+        """Reemplaza el pool roto (una sola vez por generación)"""
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.crashes += 1
+            self._generation += 1
+            self._tasks_in_generation = 0
+            broken = self._executor
+            self._executor = self._new_executor()
+        broken.shutdown(wait=False, cancel_futures=True)
+        logger.warning(f"⚠️ Engine '{self.name}': worker caído, pool reconstruido (caídas: {self.crashes})")
+
+    async def _run_isolated(self, func: Callable, args: tuple, kwargs: dict, trace: bool, profile: bool) -> Any:
+        loop = asyncio.get_running_loop()
+        isolated = self._new_executor(max_workers=1)
+        try:
+            return await loop.run_in_executor(isolated, _invoke, func, args, kwargs, trace, profile)
+        except BrokenProcessPool:
+            raise WorkerCrashed(f"El worker se cayó procesando el trabajo ({getattr(func, '__name__', func)})")
+        finally:
+            isolated.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Ejecuta ``func(*args, **kwargs)`` en el pool y espera el resultado"""
+        loop = asyncio.get_running_loop()
+        enqueued = time.perf_counter()
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.active += 1
+        started = time.perf_counter()
+        ok = False
+        # run_in_executor no propaga el contexto: el worker recoge los spans y aquí se reemiten
+        trace = tracing.tracing_active()
+        profile = tracing.profiling_active()
+        try:
+            self._maybe_recycle()
+            generation = self._generation
+            self._tasks_in_generation += 1
+            try:
+                result = await loop.run_in_executor(self._executor, _invoke, func, args, kwargs, trace, profile)
+            except BrokenProcessPool:
+                self._rebuild(generation)
+                result = await self._run_isolated(func, args, kwargs, trace, profile)
+            if trace or profile:
+                result, spans, profile_stats = result
+                tracing.replay(spans)
+                tracing.add_worker_profile(profile_stats)
+            ok = True
+            return result
+        except _RemoteHTTPError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        finally:
+            self.active -= 1
+            self.completed += 1
+            self._slots.release()
+            if self.observer:
+                self.observer(self.name, getattr(func, "__name__", "task"),
+                              started - enqueued, time.perf_counter() - started, ok)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_tasks_per_child": self.max_tasks_per_child,
+            "active": self.active,
+            "queued": self.queued,
+            "completed": self.completed,
+            "crashes": self.crashes,
+            "recycles": self.recycles,
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def engine_from_env(prefix: str, name: str, default_kind: str = "process",
+                    default_workers: Optional[int] = None) -> WorkerEngine:
+    """Crea un engine leyendo ``{prefix}_ENGINE``, ``{prefix}_WORKERS`` y ``{prefix}_MAX_TASKS``"""
+    workers = os.getenv(f"{prefix}_WORKERS")
+    max_tasks = os.getenv(f"{prefix}_MAX_TASKS", "25")
+    return WorkerEngine(
+        name=name,
+        kind=os.getenv(f"{prefix}_ENGINE", default_kind),
+        max_workers=int(workers) if workers else default_workers,
+        max_tasks_per_child=int(max_tasks) if max_tasks else None,
+        start_method=os.getenv("WORKER_START_METHOD", "spawn")
+    )
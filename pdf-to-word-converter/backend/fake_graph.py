@@ -0,0 +1,149 @@
+"""🧪 Servidor falso de Azure AD + Microsoft Graph para pruebas locales
+
+Implementa lo mínimo que usan graph_client y email_outbox: el token de
+client credentials, ``GET /v1.0/users/{email}``,
+``POST /v1.0/users/{sender}/sendMail`` y ``POST /v1.0/$batch`` (sólo con
+peticiones sendMail).
+
+Uso:
+    FAKE_GRAPH_USERS="ana@empresa.com,luis@empresa.com" uvicorn fake_graph:app --port 8765
+
+y arrancar el backend con:
+    AZURE_AUTHORITY_HOST=http://127.0.0.1:8765 GRAPH_BASE_URL=http://127.0.0.1:8765/v1.0 \\
+    AZURE_TENANT_ID=fake AZURE_CLIENT_ID=fake AZURE_CLIENT_SECRET=fake \\
+    EMAIL_TRANSPORT=graph EMAIL_SENDER=sistema@empresa.com python main.py
+
+Variables opcionales: FAKE_GRAPH_TOKEN_TTL (segundos, 3600),
+FAKE_GRAPH_LATENCY_MS (latencia añadida a cada respuesta, 0),
+FAKE_GRAPH_MAIL_PER_MINUTE (correos por minuto antes de responder 429 con
+Retry-After, 0 = sin límite) y FAKE_GRAPH_MAIL_FAILURE_RATE (fracción de
+envíos que fallan con 503, 0).
+``GET /_stats`` devuelve cuántos tokens, consultas y correos ha servido y
+``GET /_mail`` los correos recibidos.
+"""
+import os
+import time
+import uuid
+import random
+import asyncio
+from collections import deque
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Fake Graph")
+
+USERS = {u.strip().lower() for u in os.getenv("FAKE_GRAPH_USERS", "").split(",") if u.strip()}
+TOKEN_TTL = int(os.getenv("FAKE_GRAPH_TOKEN_TTL", "3600"))
+LATENCY = int(os.getenv("FAKE_GRAPH_LATENCY_MS", "0")) / 1000
+MAIL_PER_MINUTE = int(os.getenv("FAKE_GRAPH_MAIL_PER_MINUTE", "0"))
+MAIL_FAILURE_RATE = float(os.getenv("FAKE_GRAPH_MAIL_FAILURE_RATE", "0"))
+
+issued_tokens = set()
+stats = {"tokens": 0, "user_lookups": 0, "mail_sent": 0, "mail_throttled": 0, "mail_failed": 0, "batches": 0}
+mailbox = []
+# Instantes de los últimos envíos aceptados (ventana de un minuto)
+recent_mail = deque()
+
+
+async def simulate_latency():
+    if LATENCY:
+        await asyncio.sleep(LATENCY)
+
+
+@app.post("/{tenant}/oauth2/v2.0/token")
+async def token(tenant: str):
+    await simulate_latency()
+    access_token = f"fake-{uuid.uuid4().hex}"
+    issued_tokens.add(access_token)
+    stats["tokens"] += 1
+    return {"token_type": "Bearer", "expires_in": TOKEN_TTL, "access_token": access_token}
+
+
+def authorized(request: Request) -> bool:
+    return request.headers.get("authorization", "").removeprefix("Bearer ") in issued_tokens
+
+
+def send_mail(sender: str, payload: dict):
+    """(status, headers, body) de un sendMail, aplicando el límite y los fallos simulados"""
+    now = time.monotonic()
+    while recent_mail and now - recent_mail[0] >= 60:
+        recent_mail.popleft()
+    if MAIL_PER_MINUTE and len(recent_mail) >= MAIL_PER_MINUTE:
+        stats["mail_throttled"] += 1
+        retry_after = max(1, int(60 - (now - recent_mail[0])) + 1)
+        return 429, {"Retry-After": str(retry_after)}, {"error": {"code": "ApplicationThrottled"}}
+    if MAIL_FAILURE_RATE and random.random() < MAIL_FAILURE_RATE:
+        stats["mail_failed"] += 1
+        return 503, {}, {"error": {"code": "ServiceUnavailable"}}
+    message = (payload or {}).get("message")
+    if not message or not message.get("toRecipients"):
+        return 400, {}, {"error": {"code": "ErrorInvalidRecipients"}}
+
+    recent_mail.append(now)
+    stats["mail_sent"] += 1
+    mailbox.append({
+        "from": sender,
+        "to": [r["emailAddress"]["address"] for r in message["toRecipients"]],
+        "subject": message.get("subject"),
+        "body": message.get("body", {}).get("content"),
+        "received_at": time.time(),
+    })
+    return 202, {}, None
+
+
+@app.get("/v1.0/users/{email}")
+async def get_user(email: str, request: Request):
+    await simulate_latency()
+    if not authorized(request):
+        raise HTTPException(status_code=401, detail="InvalidAuthenticationToken")
+
+    stats["user_lookups"] += 1
+    email = email.lower()
+    if email not in USERS:
+        raise HTTPException(status_code=404, detail="Request_ResourceNotFound")
+    return {
+        "id": str(uuid.uuid5(uuid.NAMESPACE_DNS, email)),
+        "mail": email,
+        "userPrincipalName": email,
+        "displayName": email.split("@")[0].title(),
+    }
+
+
+@app.post("/v1.0/users/{sender}/sendMail")
+async def post_send_mail(sender: str, request: Request):
+    await simulate_latency()
+    if not authorized(request):
+        raise HTTPException(status_code=401, detail="InvalidAuthenticationToken")
+    status, headers, body = send_mail(sender, await request.json())
+    return JSONResponse(status_code=status, headers=headers, content=body)
+
+
+@app.post("/v1.0/$batch")
+async def post_batch(request: Request):
+    await simulate_latency()
+    if not authorized(request):
+        raise HTTPException(status_code=401, detail="InvalidAuthenticationToken")
+    requests_ = (await request.json()).get("requests", [])
+    if len(requests_) > 20:
+        raise HTTPException(status_code=400, detail="Maximum of 20 requests per batch")
+
+    stats["batches"] += 1
+    responses = []
+    for item in requests_:
+        parts = item.get("url", "").strip("/").split("/")
+        if item.get("method") != "POST" or len(parts) != 3 or parts[0] != "users" or parts[2] != "sendMail":
+            status, headers, body = 400, {}, {"error": {"code": "BadRequest", "message": "sólo sendMail"}}
+        else:
+            status, headers, body = send_mail(parts[1], item.get("body"))
+        responses.append({"id": item.get("id"), "status": status, "headers": headers, "body": body})
+    return {"responses": responses}
+
+
+@app.get("/_stats")
+async def get_stats():
+    return stats
+
+
+@app.get("/_mail")
+async def get_mail():
+    return mailbox
@@ -0,0 +1,206 @@
+import os
+import re
+import stat
+import hashlib
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+from result_cache import MemoryCache
+
+# Bloques de lectura cuando el servidor ASGI no ofrece sendfile
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_KB", "256")) * 1024
+
+# SHA-256 de los archivos servidos, por (dispositivo, inodo, tamaño, mtime):
+# los resultados enlazados desde la cache de conversiones comparten inodo
+etag_cache = MemoryCache(
+    max_entries=int(os.getenv("DOWNLOAD_ETAG_CACHE_SIZE", "1024")),
+    ttl=int(os.getenv("DOWNLOAD_ETAG_CACHE_TTL", "86400"))
+)
+
+download_stats = {"full": 0, "partial": 0, "not_modified": 0, "unsatisfiable": 0, "zero_copy": 0}
+
+_BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    """El rango pedido queda fuera del archivo"""
+
+
+def parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    """(inicio, fin) inclusivo de ``Range: bytes=...``
+
+    Devuelve None si la cabecera se debe ignorar (mal formada o con varios
+    rangos: se envía el archivo completo) y lanza RangeNotSatisfiable si el
+    rango no se solapa con el archivo.
+    """
+    match = _BYTE_RANGE.match(value.strip().replace(" ", ""))
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - suffix), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(int(last) if last else size - 1, size - 1)
+
+
+def _etag_list(value: str):
+    return {tag.strip().removeprefix("W/") for tag in value.split(",")}
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def content_etag(path: str, stat_result: os.stat_result) -> str:
+    """ETag fuerte con el SHA-256 del contenido (cacheado mientras el archivo no cambie)"""
+    key = (stat_result.st_dev, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+    digest = etag_cache.get(key)
+    if digest is None:
+        digest = await anyio.to_thread.run_sync(_sha256_file, path)
+        etag_cache.put(key, digest)
+    return f'"{digest}"'
+
+
+class ResumableFileResponse(FileResponse):
+    """📥 FileResponse con descargas reanudables y GET condicional
+
+    - ``ETag`` fuerte con el SHA-256 del contenido (Starlette usa mtime y
+      tamaño): un resultado que se vuelve a generar igual conserva su ETag.
+    - ``If-None-Match`` en GET/HEAD: 304 sin cuerpo.
+    - ``Range`` de un solo rango: 206 con ``Content-Range`` (416 si cae
+      fuera del archivo). Con ``If-Range`` que no coincide, o con varios
+      rangos, se envía el archivo completo. En POST (resultados que se
+      regeneran en cada petición) el rango sólo se respeta junto con un
+      ``If-Range`` que coincida, para no mezclar bytes de dos resultados.
+    - El cuerpo se envía con sendfile si el servidor ASGI ofrece
+      ``http.response.zerocopysend`` (o ``pathsend`` para el archivo
+      completo); si no, en bloques de DOWNLOAD_CHUNK_KB.
+    """
+
+    chunk_size = DOWNLOAD_CHUNK_SIZE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+        except FileNotFoundError:
+            raise RuntimeError(f"File at path {self.path} does not exist.")
+        if not stat.S_ISREG(stat_result.st_mode):
+            raise RuntimeError(f"File at path {self.path} is not a file.")
+
+        etag = await content_etag(str(self.path), stat_result)
+        self.headers["etag"] = etag
+        self.set_stat_headers(stat_result)
+        self.headers["accept-ranges"] = "bytes"
+        self.headers.setdefault("cache-control", "private, no-cache")
+
+        request_headers = Headers(scope=scope)
+        method = scope.get("method", "GET").upper()
+        size = stat_result.st_size
+
+        try:
+            if method in ("GET", "HEAD") and "if-none-match" in request_headers:
+                tags = _etag_list(request_headers["if-none-match"])
+                if etag in tags or "*" in tags:
+                    download_stats["not_modified"] += 1
+                    for name in ("content-length", "content-type", "content-disposition"):
+                        if name in self.headers:
+                            del self.headers[name]
+                    await self._send_empty(send, 304)
+                    return
+
+            byte_range = None
+            if "range" in request_headers and self._if_range_matches(request_headers, etag, method):
+                try:
+                    byte_range = parse_range(request_headers["range"], size)
+                except RangeNotSatisfiable:
+                    download_stats["unsatisfiable"] += 1
+                    self.headers["content-range"] = f"bytes */{size}"
+                    self.headers["content-length"] = "0"
+                    if "content-type" in self.headers:
+                        del self.headers["content-type"]
+                    await self._send_empty(send, 416)
+                    return
+
+            start, length = 0, size
+            if byte_range is not None:
+                start, end = byte_range
+                length = end - start + 1
+                self.status_code = 206
+                self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+                self.headers["content-length"] = str(length)
+                download_stats["partial"] += 1
+            else:
+                download_stats["full"] += 1
+
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if method == "HEAD":
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            else:
+                await self._send_file(scope, send, start, length, size)
+        finally:
+            if self.background is not None:
+                await self.background()
+
+    def _if_range_matches(self, request_headers: Headers, etag: str, method: str) -> bool:
+        """¿Se puede aplicar el Range? (If-Range ausente en GET, o igual al ETag/Last-Modified)"""
+        if_range = request_headers.get("if-range")
+        if if_range is None:
+            return method in ("GET", "HEAD")
+        if_range = if_range.strip()
+        if if_range.startswith(('"', "W/")):
+            return if_range == etag
+        try:
+            return parsedate_to_datetime(if_range) == parsedate_to_datetime(self.headers["last-modified"])
+        except (TypeError, ValueError):
+            return False
+
+    async def _send_empty(self, send: Send, status: int):
+        await send({"type": "http.response.start", "status": status, "headers": self.raw_headers})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_file(self, scope: Scope, send: Send, start: int, length: int, size: int):
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            download_stats["zero_copy"] += 1
+            with open(self.path, "rb") as f:
+                await send({"type": "http.response.zerocopysend", "file": f,
+                            "offset": start, "count": length, "more_body": False})
+            return
+        if "http.response.pathsend" in extensions and start == 0 and length == size:
+            download_stats["zero_copy"] += 1
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+
+        remaining = length
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            if start:
+                await file.seek(start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0 or length == 0:
+            # Archivo vacío o truncado mientras se enviaba: cerrar la respuesta
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def stats() -> Dict[str, Any]:
+    return {**download_stats, "etag_cache": etag_cache.stats()}
@@ -0,0 +1,272 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from urllib.parse import quote
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+GRAPH_SCOPE = ["https://graph.microsoft.com/.default"]
+
+
+class GraphAuthError(Exception):
+    """No se pudo obtener un token de aplicación para Graph"""
+
+
+class GraphTokenProvider:
+    """🔑 Token de aplicación (client credentials) reutilizado hasta que caduca
+
+    Un único ``ConfidentialClientApplication`` vive lo que vive el proceso.
+    El token se guarda con su expiración y sólo se pide uno nuevo cuando
+    quedan menos de ``refresh_margin`` segundos; las peticiones concurrentes
+    que lo necesiten esperan a la misma renovación. MSAL hace la petición
+    HTTP de forma bloqueante, así que la renovación corre en un thread.
+    """
+
+    def __init__(self, client_id: str, client_secret: str, tenant_id: str,
+                 authority_host: str = "https://login.microsoftonline.com",
+                 scopes=None, refresh_margin: int = 300):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.authority = f"{authority_host.rstrip('/')}/{tenant_id}"
+        self.scopes = scopes or GRAPH_SCOPE
+        self.refresh_margin = refresh_margin
+        self.refreshes = 0
+        self._app = None
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def uses_msal(self) -> bool:
+        # MSAL sólo acepta autoridades https conocidas; con un host propio
+        # (p. ej. fake_graph en local) se hace la misma petición OAuth2 a mano
+        return self.authority.startswith("https://login.microsoftonline.com/")
+
+    def _acquire(self) -> Dict[str, Any]:
+        if not self.uses_msal:
+            response = httpx.post(f"{self.authority}/oauth2/v2.0/token", timeout=10, data={
+                "grant_type": "client_credentials",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "scope": " ".join(self.scopes),
+            })
+            return response.json()
+
+        if self._app is None:
+            import msal
+            self._app = msal.ConfidentialClientApplication(
+                client_id=self.client_id,
+                client_credential=self.client_secret,
+                authority=self.authority
+            )
+        return self._app.acquire_token_for_client(scopes=self.scopes)
+
+    def invalidate(self):
+        """Fuerza a pedir un token nuevo (p. ej. tras un 401 de Graph)"""
+        self._token = None
+        self._expires_at = 0.0
+
+    async def get_token(self) -> str:
+        if self._token and time.time() < self._expires_at - self.refresh_margin:
+            return self._token
+
+        async with self._lock:
+            if self._token and time.time() < self._expires_at - self.refresh_margin:
+                return self._token
+
+            result = await asyncio.to_thread(self._acquire)
+            if "access_token" not in result:
+                raise GraphAuthError(result.get("error_description") or result.get("error") or "sin access_token")
+
+            self._token = result["access_token"]
+            self._expires_at = time.time() + int(result.get("expires_in", 3600))
+            self.refreshes += 1
+            logger.info(f"🔑 Token de Graph renovado (expira en {int(result.get('expires_in', 3600))} s)")
+            return self._token
+
+
+class GraphClient:
+    """🌐 Cliente async de Microsoft Graph con pool de conexiones persistente"""
+
+    def __init__(self, token_provider: GraphTokenProvider,
+                 base_url: str = "https://graph.microsoft.com/v1.0",
+                 max_connections: int = 20, timeout: float = 10.0):
+        self.token_provider = token_provider
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.requests = 0
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections)
+            )
+        return self._client
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Petición autenticada; si Graph responde 401 se renueva el token una vez"""
+        extra_headers = kwargs.pop("headers", {})
+        for attempt in range(2):
+            token = await self.token_provider.get_token()
+            headers = {**extra_headers, "Authorization": f"Bearer {token}"}
+            self.requests += 1
+            response = await self._http().request(method, path, headers=headers, **kwargs)
+            if response.status_code != 401 or attempt:
+                return response
+            self.token_provider.invalidate()
+        return response
+
+    async def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        """Usuario de Graph, o None si no existe (otros errores se propagan)"""
+        response = await self.request("GET", f"/users/{quote(email, safe='@')}")
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class UserLookupCache:
+    """🗂️ Cache acotada de búsquedas de usuario, positivas y negativas
+
+    Los usuarios encontrados se recuerdan ``ttl`` segundos y los que no
+    existen ``negative_ttl`` (más corto, para que un alta reciente se vea
+    pronto). Con más de ``max_entries`` entradas se expulsan las más
+    antiguas.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, ttl: int = 600, negative_ttl: int = 60, max_entries: int = 10000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # email -> (usuario o None, caduca_en)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, email: str):
+        """Devuelve el usuario, None (no existe) o ``UserLookupCache._MISSING``"""
+        entry = self._entries.get(email)
+        if entry is None or entry[1] < time.time():
+            if entry is not None:
+                del self._entries[email]
+            self.misses += 1
+            return self._MISSING
+        self._entries.move_to_end(email)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, email: str, user: Optional[Dict[str, Any]]):
+        ttl = self.ttl if user is not None else self.negative_ttl
+        self._entries[email] = (user, time.time() + ttl)
+        self._entries.move_to_end(email)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class AzureUserDirectory:
+    """👥 Validación de usuarios de Azure AD: token reutilizado, pool y cache
+
+    Las consultas concurrentes por el mismo correo comparten una sola
+    petición a Graph. Los errores de red o de Graph no se cachean.
+    """
+
+    def __init__(self, graph: GraphClient, cache: UserLookupCache):
+        self.graph = graph
+        self.cache = cache
+        self.errors = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    @classmethod
+    def from_env(cls) -> "AzureUserDirectory":
+        tokens = GraphTokenProvider(
+            client_id=os.getenv("AZURE_CLIENT_ID"),
+            client_secret=os.getenv("AZURE_CLIENT_SECRET"),
+            tenant_id=os.getenv("AZURE_TENANT_ID"),
+            authority_host=os.getenv("AZURE_AUTHORITY_HOST", "https://login.microsoftonline.com")
+        )
+        graph = GraphClient(
+            tokens,
+            base_url=os.getenv("GRAPH_BASE_URL", "https://graph.microsoft.com/v1.0"),
+            max_connections=int(os.getenv("GRAPH_MAX_CONNECTIONS", "20")),
+            timeout=float(os.getenv("GRAPH_TIMEOUT", "10"))
+        )
+        cache = UserLookupCache(
+            ttl=int(os.getenv("AZURE_USER_CACHE_TTL", "600")),
+            negative_ttl=int(os.getenv("AZURE_USER_NEGATIVE_TTL", "60")),
+            max_entries=int(os.getenv("AZURE_USER_CACHE_SIZE", "10000"))
+        )
+        return cls(graph, cache)
+
+    async def lookup(self, email: str) -> Optional[Dict[str, Any]]:
+        """Usuario de Azure AD o None si no existe; propaga errores de Graph"""
+        key = email.strip().lower()
+        cached = self.cache.get(key)
+        if cached is not UserLookupCache._MISSING:
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            # La consulta es de todos los que la esperan: si se cancela la
+            # petición que la lanzó, el resto sigue esperando el resultado
+            task = asyncio.ensure_future(self._fetch(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: str) -> Optional[Dict[str, Any]]:
+        user = await self.graph.get_user(key)
+        self.cache.put(key, user)
+        return user
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Evita "exception was never retrieved" si nadie seguía esperando
+        if not task.cancelled():
+            task.exception()
+
+    async def validate_user(self, email: str) -> bool:
+        try:
+            return await self.lookup(email) is not None
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error validando usuario de Azure {email}: {e}")
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cache": self.cache.stats(),
+            "graph_requests": self.graph.requests,
+            "token_refreshes": self.graph.token_provider.refreshes,
+            "errors": self.errors,
+        }
+
+    async def aclose(self):
+        await self.graph.aclose()
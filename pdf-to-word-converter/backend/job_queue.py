@@ -0,0 +1,185 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Estados posibles de un trabajo
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    """La cola de trabajos está llena (backpressure)"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Cola llena, reintentar en {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Job:
+    """📋 Trabajo asíncrono con estado, progreso y resultado"""
+
+    def __init__(self, kind: str, work: Callable[["Job"], Awaitable[Any]], meta: Optional[Dict[str, Any]] = None):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.work = work
+        self.meta = meta or {}
+        self.status = JOB_QUEUED
+        self.progress = 0.0
+        self.stage = "en cola"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.error_status = 500
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cleanup_paths: List[str] = []
+
+    def set_progress(self, progress: float, stage: str = None):
+        """Actualiza el progreso (0-100) y la etapa actual"""
+        self.progress = round(max(0.0, min(100.0, progress)), 1)
+        if stage:
+            self.stage = stage
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "stage": self.stage,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        data.update({k: v for k, v in self.meta.items() if not k.startswith("_")})
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class JobManager:
+    """🗂️ Cola acotada de trabajos con workers en segundo plano
+
+    Los trabajos se encolan y se procesan por un número fijo de workers
+    asyncio; el trabajo pesado lo hace la corrutina de cada trabajo
+    (normalmente delegando en un executor). Si la cola está llena,
+    ``submit`` lanza ``JobQueueFull`` con un Retry-After estimado.
+    """
+
+    def __init__(self, max_queue_size: int = 50, workers: int = 2, result_ttl: int = 3600):
+        self.max_queue_size = max_queue_size
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.jobs: Dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # Media móvil de la duración de los trabajos (para Retry-After)
+        self._avg_duration = 10.0
+
+    async def start(self):
+        """Arranca los workers (llamar en el startup de la app)"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"🗂️ Cola de trabajos iniciada: {self.workers} workers, capacidad {self.max_queue_size}")
+
+    async def stop(self):
+        """Detiene los workers"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    @property
+    def active_jobs(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status == JOB_RUNNING)
+
+    def estimate_retry_after(self) -> int:
+        """Estima en segundos cuándo habrá hueco en la cola"""
+        pending = self.queue_depth + self.active_jobs
+        return max(1, int(self._avg_duration * pending / max(1, self.workers)))
+
+    def submit(self, kind: str, work: Callable[[Job], Awaitable[Any]], meta: Optional[Dict[str, Any]] = None,
+               cleanup_paths: Optional[List[str]] = None) -> Job:
+        """Encola un trabajo; lanza JobQueueFull si no hay capacidad"""
+        if self._queue is None:
+            raise RuntimeError("La cola de trabajos no está iniciada")
+        self.reap_expired()
+
+        job = Job(kind, work, meta)
+        job.cleanup_paths = list(cleanup_paths or [])
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFull(self.estimate_retry_after())
+
+        self.jobs[job.id] = job
+        logger.info(f"🗂️ Trabajo {job.id} ({kind}) encolado. En cola: {self.queue_depth}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self.reap_expired()
+        return self.jobs.get(job_id)
+
+    def reap_expired(self):
+        """Elimina trabajos terminados más antiguos que result_ttl junto con sus archivos"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished and job.finished_at and now - job.finished_at > self.result_ttl
+        ]
+        for job_id in expired:
+            job = self.jobs.pop(job_id)
+            self._cleanup(job)
+            logger.info(f"🗑️ Trabajo expirado eliminado: {job_id}")
+
+    def _cleanup(self, job: Job):
+        for path in job.cleanup_paths:
+            try:
+                if path and os.path.exists(path):
+                    os.remove(path)
+            except Exception as e:
+                logger.warning(f"No se pudo eliminar {path}: {e}")
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+            job.set_progress(5, "procesando")
+            try:
+                job.result = await job.work(job)
+                job.status = JOB_DONE
+                job.set_progress(100, "completado")
+                logger.info(f"✅ Trabajo {job.id} completado")
+            except asyncio.CancelledError:
+                job.status = JOB_FAILED
+                job.error = "Trabajo cancelado"
+                raise
+            except Exception as e:
+                job.status = JOB_FAILED
+                job.error = getattr(e, "detail", None) or str(e)
+                job.error_status = getattr(e, "status_code", 500)
+                job.stage = "error"
+                logger.error(f"❌ Trabajo {job.id} falló: {job.error}")
+            finally:
+                job.finished_at = time.time()
+                duration = job.finished_at - job.started_at
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+                self._queue.task_done()
@@ -0,0 +1,447 @@
+import os
+import sys
+import time
+import uuid
+import shutil
+import signal
+import socket
+import asyncio
+import logging
+import tempfile
+import subprocess
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Filtros de LibreOffice: PDF importado en Writer (no en Draw) y salida DOCX
+PDF_IMPORT_FILTER = "writer_pdf_import"
+DOCX_EXPORT_FILTER = "MS Word 2007 XML"
+
+
+def _load_uno():
+    """Módulo ``uno`` o None
+
+    En Debian/Ubuntu pyuno se instala (paquete python3-uno) para el Python
+    del sistema: si no se puede importar se prueba UNO_PYTHON_PATH, que se
+    añade al final de sys.path para no tapar los paquetes de pip.
+    """
+    try:
+        import uno
+        return uno
+    except ImportError:
+        pass
+    extra = os.getenv("UNO_PYTHON_PATH", "/usr/lib/python3/dist-packages")
+    if extra and os.path.isdir(extra) and extra not in sys.path:
+        sys.path.append(extra)
+        try:
+            import uno
+            return uno
+        except ImportError as e:
+            logger.warning(f"pyuno no disponible ({e}): LibreOffice se lanzará por conversión")
+    return None
+
+
+def _kill_group(process: subprocess.Popen):
+    """Mata soffice y sus hijos (oosplash lanza soffice.bin en el mismo grupo)"""
+    if process.poll() is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        process.kill()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        logger.warning(f"soffice (pid {process.pid}) no terminó tras SIGKILL")
+
+
+def free_port() -> int:
+    """Puerto TCP libre en 127.0.0.1 (lo asigna el sistema)"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def remove_stale_profiles(profile_root: Path):
+    """Borra los perfiles ``soffice_<pid>_<i>`` de procesos que ya no existen"""
+    if not Path(profile_root).is_dir():
+        return
+    for entry in Path(profile_root).iterdir():
+        parts = entry.name.split("_")
+        if len(parts) == 3 and parts[0] == "soffice" and parts[1].isdigit() and not _pid_alive(int(parts[1])):
+            shutil.rmtree(entry, ignore_errors=True)
+
+
+def soffice_version(binary: str) -> str:
+    """``LibreOffice 7.4.7.2`` -> ``7.4.7.2`` (``unknown`` si no se puede leer)"""
+    try:
+        output = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=30).stdout
+        parts = output.split()
+        return parts[1] if len(parts) > 1 else "unknown"
+    except (OSError, subprocess.TimeoutExpired):
+        return "unknown"
+
+
+class SofficeInstance:
+    """🖨️ Un LibreOffice headless con perfil y puerto propios
+
+    El puerto UNO se pide al sistema en cada arranque: con varios workers de
+    uvicorn, cada uno con su pool, no pueden chocar. Con pyuno el proceso queda arrancado y cada conversión es una llamada
+    UNO (``loadComponentFromURL`` + ``storeToURL``), sin coste de arranque.
+    Sin pyuno cada conversión lanza ``soffice --convert-to`` reutilizando el
+    perfil ya inicializado, que es la parte más lenta de un arranque en frío.
+    """
+
+    def __init__(self, index: int, binary: str, profile_dir: Path, uno_module=None):
+        self.index = index
+        self.binary = binary
+        self.port: Optional[int] = None
+        self.profile_dir = Path(profile_dir)
+        self.uno = uno_module
+        self.process: Optional[subprocess.Popen] = None
+        self.desktop = None
+        self.jobs = 0
+        self.started_at: Optional[float] = None
+
+    @property
+    def profile_url(self) -> str:
+        return self.profile_dir.resolve().as_uri()
+
+    def _base_command(self) -> List[str]:
+        return [
+            self.binary, "--headless", "--invisible", "--nologo", "--nodefault",
+            "--norestore", "--nolockcheck", f"-env:UserInstallation={self.profile_url}",
+        ]
+
+    def alive(self) -> bool:
+        if self.uno is None:
+            return self.started_at is not None
+        return self.process is not None and self.process.poll() is None
+
+    def start(self, timeout: float):
+        """Arranca (o rearranca) la instancia y espera a que acepte conexiones"""
+        self.stop()
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+
+        if self.uno is None:
+            # Sólo inicializa el perfil: cada conversión es un proceso nuevo
+            subprocess.run(self._base_command() + ["--terminate_after_init"],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=timeout)
+        else:
+            self.port = free_port()
+            accept = f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"
+            self.process = subprocess.Popen(
+                self._base_command() + [accept],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+            )
+            deadline = time.monotonic() + timeout
+            while True:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"soffice terminó al arrancar (código {self.process.returncode})")
+                try:
+                    self._connect()
+                    break
+                except Exception:
+                    if time.monotonic() > deadline:
+                        self.stop()
+                        raise RuntimeError(f"soffice no aceptó conexiones en {timeout:.0f}s")
+                    time.sleep(0.25)
+
+        self.jobs = 0
+        self.started_at = time.time()
+        logger.info(f"🖨️ LibreOffice #{self.index} listo ({'uno' if self.uno else 'cli'}"
+                    + (f", puerto {self.port})" if self.uno else ")"))
+
+    def _connect(self):
+        local = self.uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        ctx = resolver.resolve(f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext")
+        self.desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+
+    def ping(self):
+        """Ida y vuelta UNO; lanza excepción si la instancia no responde"""
+        if not self.alive():
+            raise RuntimeError("soffice no está en ejecución")
+        if self.desktop is not None:
+            self.desktop.getComponents()
+
+    def _props(self, **values):
+        props = []
+        for name, value in values.items():
+            prop = self.uno.createUnoStruct("com.sun.star.beans.PropertyValue")
+            prop.Name = name
+            prop.Value = value
+            props.append(prop)
+        return tuple(props)
+
+    def convert(self, pdf_path: str, docx_path: str, timeout: float):
+        if self.uno is None:
+            self._convert_cli(pdf_path, docx_path, timeout)
+        else:
+            self._convert_uno(pdf_path, docx_path)
+        self.jobs += 1
+
+    def _convert_uno(self, pdf_path: str, docx_path: str):
+        source = self.uno.systemPathToFileUrl(os.path.abspath(pdf_path))
+        target = self.uno.systemPathToFileUrl(os.path.abspath(docx_path))
+        doc = self.desktop.loadComponentFromURL(
+            source, "_blank", 0, self._props(Hidden=True, ReadOnly=True, FilterName=PDF_IMPORT_FILTER)
+        )
+        if doc is None:
+            raise RuntimeError("LibreOffice no pudo abrir el PDF")
+        try:
+            doc.storeToURL(target, self._props(FilterName=DOCX_EXPORT_FILTER, Overwrite=True))
+        finally:
+            doc.close(True)
+
+    def _convert_cli(self, pdf_path: str, docx_path: str, timeout: float):
+        out_dir = tempfile.mkdtemp(prefix="lo_", dir=os.path.dirname(os.path.abspath(docx_path)))
+        try:
+            process = subprocess.Popen(
+                self._base_command() + [
+                    f"--infilter={PDF_IMPORT_FILTER}", "--convert-to", f"docx:{DOCX_EXPORT_FILTER}",
+                    "--outdir", out_dir, os.path.abspath(pdf_path),
+                ],
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, start_new_session=True
+            )
+            try:
+                _, stderr = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                _kill_group(process)
+                raise TimeoutError(f"LibreOffice no respondió en {timeout:.0f}s")
+            output = os.path.join(out_dir, f"{Path(pdf_path).stem}.docx")
+            if process.returncode != 0 or not os.path.exists(output):
+                detail = stderr.decode(errors="replace").strip()[-300:] if stderr else ""
+                raise RuntimeError(f"soffice --convert-to falló (código {process.returncode}) {detail}")
+            os.replace(output, docx_path)
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    def stop(self):
+        self.desktop = None
+        self.started_at = None
+        if self.process is not None:
+            _kill_group(self.process)
+            self.process = None
+
+
+class LibreOfficePool:
+    """🖨️ Pool de instancias de LibreOffice headless como motor de conversión
+
+    - Las instancias arrancan en segundo plano al iniciar la app y cada
+      conversión usa una libre (el resto espera en la cola del pool).
+    - Una conversión que supera ``timeout`` mata su instancia, que se
+      rearranca al volver a usarla; igual con las que mueren.
+    - Se reciclan tras ``max_jobs`` conversiones (crecimiento de memoria).
+    - Cada ``health_interval`` segundos se comprueban las instancias libres
+      con una llamada UNO y se rearrancan las que no responden.
+
+    Sin binario de LibreOffice el pool queda deshabilitado (``available``).
+    """
+
+    name = "libreoffice"
+
+    def __init__(self, size: int, profile_root: Path, binary: Optional[str] = None,
+                 timeout: float = 120, start_timeout: float = 60, max_jobs: int = 200):
+        self.binary = binary or shutil.which("soffice") or shutil.which("libreoffice")
+        self.max_workers = size if self.binary else 0
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.max_jobs = max_jobs
+        self.uno = _load_uno() if self.max_workers else None
+        # Un perfil por proceso e instancia: LibreOffice no admite dos procesos
+        # con el mismo perfil (workers de uvicorn)
+        self.profile_root = Path(profile_root)
+        pid = os.getpid()
+        self.instances = [
+            SofficeInstance(i, self.binary, Path(profile_root) / f"soffice_{pid}_{i}", self.uno)
+            for i in range(self.max_workers)
+        ]
+        self.version = "unknown"
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.recycles = 0
+        # observer(engine, operación, espera_s, ejecución_s, ok), como en WorkerEngine
+        self.observer: Optional[Callable[[str, str, float, float, bool], None]] = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def available(self) -> bool:
+        return bool(self.instances)
+
+    @property
+    def converter_version(self) -> str:
+        """Identifica el motor en las claves de la cache de resultados"""
+        return f"libreoffice-{self.version}"
+
+    async def start(self, health_interval: float):
+        if not self.available:
+            logger.info("🖨️ LibreOffice no disponible: motor alternativo deshabilitado")
+            return
+        self._idle = asyncio.Queue()
+        await asyncio.to_thread(remove_stale_profiles, self.profile_root)
+        self.version = await asyncio.to_thread(soffice_version, self.binary)
+        for instance in self.instances:
+            self._tasks.append(asyncio.create_task(self._start_instance(instance)))
+        if self.uno is not None and health_interval > 0:
+            self._tasks.append(asyncio.create_task(self._health_loop(health_interval)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.gather(*(asyncio.to_thread(i.stop) for i in self.instances), return_exceptions=True)
+        for instance in self.instances:
+            shutil.rmtree(instance.profile_dir, ignore_errors=True)
+
+    async def _start_instance(self, instance: SofficeInstance):
+        """Arranca la instancia y la deja libre (aunque falle: se reintenta al usarla)"""
+        try:
+            await asyncio.to_thread(instance.start, self.start_timeout)
+        except Exception as e:
+            logger.error(f"❌ LibreOffice #{instance.index} no arrancó: {e}")
+        finally:
+            self._idle.put_nowait(instance)
+
+    async def _restart(self, instance: SofficeInstance, reason: str):
+        logger.warning(f"🔁 Rearrancando LibreOffice #{instance.index}: {reason}")
+        await asyncio.to_thread(instance.start, self.start_timeout)
+
+    async def _checkout(self) -> SofficeInstance:
+        self.queued += 1
+        try:
+            instance = await self._idle.get()
+        finally:
+            self.queued -= 1
+        try:
+            if not instance.alive():
+                self.crashes += 1
+                await self._restart(instance, "no está en ejecución")
+            elif instance.jobs >= self.max_jobs:
+                self.recycles += 1
+                await self._restart(instance, f"{instance.jobs} conversiones")
+        except Exception as e:
+            self._idle.put_nowait(instance)
+            raise RuntimeError(f"LibreOffice no disponible: {e}")
+        return instance
+
+    async def convert(self, pdf_path: str, output_dir: str) -> str:
+        """Convierte ``pdf_path`` a DOCX en ``output_dir`` y devuelve su ruta"""
+        if not self.available or self._idle is None:
+            raise RuntimeError("LibreOffice no está disponible")
+
+        docx_path = os.path.join(output_dir, f"converted_{uuid.uuid4()}.docx")
+        queued_at = time.perf_counter()
+        instance = await self._checkout()
+        started = time.perf_counter()
+        ok = False
+        work: Optional[asyncio.Future] = None
+        self.active += 1
+        try:
+            with span("libreoffice.convert", instance=instance.index):
+                work = asyncio.ensure_future(asyncio.to_thread(instance.convert, pdf_path, docx_path, self.timeout))
+                # El margen cubre el modo cli, que aplica el timeout al subproceso.
+                # shield: cancelar la espera no cancela el thread, que sigue usando la instancia
+                await asyncio.wait_for(asyncio.shield(work), self.timeout + 10)
+            if not os.path.exists(docx_path) or os.path.getsize(docx_path) == 0:
+                raise RuntimeError("LibreOffice no generó el DOCX")
+            ok = True
+            self.completed += 1
+            return docx_path
+        except (asyncio.TimeoutError, TimeoutError):
+            self.timeouts += 1
+            # Matar el proceso desbloquea la llamada UNO colgada; se rearranca al reutilizarla
+            await asyncio.to_thread(instance.stop)
+            raise RuntimeError(f"LibreOffice no respondió en {self.timeout:.0f}s")
+        except asyncio.CancelledError:
+            if instance.uno is not None:
+                # La llamada UNO en curso termina en cuanto muere el proceso
+                asyncio.get_running_loop().run_in_executor(None, instance.stop)
+            raise
+        finally:
+            self.active -= 1
+            if not ok:
+                self.failures += 1
+            if work is not None and not work.done():
+                # Petición cancelada (o UNO colgado tras el timeout): la instancia
+                # vuelve al pool cuando termina su thread, no antes
+                work.add_done_callback(lambda done: self._release(instance, docx_path, ok, done))
+            else:
+                self._release(instance, docx_path, ok)
+            if self.observer:
+                self.observer(self.name, "convert", started - queued_at, time.perf_counter() - started, ok)
+
+    def _release(self, instance: SofficeInstance, docx_path: str, ok: bool,
+                 orphan: Optional[asyncio.Future] = None):
+        """Devuelve la instancia al pool y borra el DOCX de una conversión fallida"""
+        if orphan is not None and not orphan.cancelled() and orphan.exception():
+            logger.debug(f"Conversión abandonada en LibreOffice #{instance.index}: {orphan.exception()}")
+        if not ok and os.path.exists(docx_path):
+            os.remove(docx_path)
+        self._idle.put_nowait(instance)
+
+    async def _health_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            # Sólo las libres: las ocupadas las vigila el timeout de su conversión
+            for _ in range(self._idle.qsize()):
+                instance = self._idle.get_nowait()
+                try:
+                    await asyncio.wait_for(asyncio.to_thread(instance.ping), 10)
+                except Exception as e:
+                    self.crashes += 1
+                    await asyncio.to_thread(instance.stop)
+                    try:
+                        await self._restart(instance, f"no responde ({e or type(e).__name__})")
+                    except Exception as restart_error:
+                        logger.error(f"❌ LibreOffice #{instance.index} no rearrancó: {restart_error}")
+                finally:
+                    self._idle.put_nowait(instance)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "available": self.available,
+            "mode": "uno" if self.uno is not None else "cli",
+            "version": self.version,
+            "max_workers": self.max_workers,
+            "alive": sum(1 for i in self.instances if i.alive()),
+            "active": self.active,
+            "queued": self.queued,
+            "completed": self.completed,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "crashes": self.crashes,
+            "recycles": self.recycles,
+        }
+
+
+def libreoffice_pool_from_env(temp_dir: Path) -> LibreOfficePool:
+    """LIBREOFFICE_POOL_SIZE (0 = desactivado), LIBREOFFICE_BINARY, LIBREOFFICE_PROFILE_DIR,
+    LIBREOFFICE_TIMEOUT, LIBREOFFICE_START_TIMEOUT, LIBREOFFICE_MAX_JOBS"""
+    return LibreOfficePool(
+        size=int(os.getenv("LIBREOFFICE_POOL_SIZE", "1")),
+        profile_root=Path(os.getenv("LIBREOFFICE_PROFILE_DIR", str(Path(temp_dir) / "libreoffice"))),
+        binary=os.getenv("LIBREOFFICE_BINARY") or None,
+        timeout=float(os.getenv("LIBREOFFICE_TIMEOUT", "120")),
+        start_timeout=float(os.getenv("LIBREOFFICE_START_TIMEOUT", "60")),
+        max_jobs=int(os.getenv("LIBREOFFICE_MAX_JOBS", "200")),
+    )
@@ -1,25 +1,47 @@
 import os
 import json
+import hashlib
 from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Query, Form
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.background import BackgroundTasks
+from starlette.background import BackgroundTask
 import tempfile
-import subprocess
 import shutil
 from pathlib import Path
 import logging
 import uuid
-from pdf2docx import Converter
+import time
+import zipfile
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 import jwt
-import requests
 from datetime import datetime, timedelta
 
 # Importar nuestro motor PDF
 from pdf_tools import PDFToolsManager
+from converter import (
+    CONVERTER_VERSION, TEXT_CONVERTER_VERSION, convert_pdf_to_docx, convert_pdf_text_only,
+    count_pdf_pages, plan_page_chunks, should_convert_in_parallel, parse_pdf_chunk, make_docx_from_chunks
+)
+from engine import engine_from_env
+from uploads import MAX_REQUEST_BYTES, MAX_UPLOAD_BYTES, MULTIPART_OVERHEAD_BYTES, UploadLimitMiddleware, save_upload
+from loop_monitor import EventLoopLagMonitor
+from result_cache import ResultCache, MemoryCache, link_or_copy
+from document_store import DocumentStore
+from libreoffice_pool import libreoffice_pool_from_env
+from prescan import prescan_pdf, plan_route, CONVERSION_MODES, CONVERSION_MODE_PATTERN
+from zip_stream import stream_zip
+from job_queue import JobManager, JobQueueFull, JOB_DONE, JOB_FAILED
+from graph_client import AzureUserDirectory
+from email_outbox import email_outbox_from_env
+from email_service import EmailService
+from result_store import result_store_from_env
+from temp_janitor import InUseMiddleware, TempDirJanitor, track_in_use
+import file_responses
+from file_responses import ResumableFileResponse
+from batch import BatchItem, BATCH_MAX_FILES, BATCH_MAX_ZIP_BYTES, batch_report, docx_name, extract_pdfs_from_zip
+from metrics import Registry, MetricsMiddleware, record_phase, request_phase
+from tracing import TracingMiddleware, add_span_listener, profile_report
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -27,6 +49,18 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="PDF Tools Suite - César Loreth", version="2.0.0")
 
+# Límite por Content-Length antes de parsear el formulario: un archivo por
+# petición salvo en lotes y uniones (MAX_REQUEST_MB).
+# Se añade antes que CORS para que el 413 lleve sus cabeceras
+app.add_middleware(
+    UploadLimitMiddleware,
+    default_max_bytes=MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+    limits={path: MAX_REQUEST_BYTES for path in ("/convert/batch", "/pdf/merge", "/jobs/merge")}
+)
+
+# Archivos de TEMP_DIR retenidos por cada petición hasta que termina (janitor)
+app.add_middleware(InUseMiddleware)
+
 # CORS actualizado
 app.add_middleware(
     CORSMiddleware,
@@ -40,14 +74,252 @@ app.add_middleware(
 TEMP_DIR = Path("temp_files")
 TEMP_DIR.mkdir(exist_ok=True)
 
-# Executor para operaciones pesadas
-executor = ThreadPoolExecutor(max_workers=2)
+# Engine para operaciones pesadas (procesos por defecto para evitar el GIL)
+# CONVERSION_ENGINE=process|thread, CONVERSION_WORKERS (por defecto nº de CPUs),
+# CONVERSION_MAX_TASKS (trabajos antes de reciclar cada proceso)
+conversion_engine = engine_from_env("CONVERSION", "conversion")
 
-# Inicializar PDF Tools Manager
+# Inicializar PDF Tools Manager (PDF_BACKEND=pypdf|pymupdf)
 pdf_tools = PDFToolsManager(TEMP_DIR)
 
-# Almacenamiento temporal de archivos convertidos (para Azure)
-converted_files = {}
+# Pool propio para las operaciones pypdf (split/extract/merge/info), separado
+# del de conversión y con su propio límite: PDF_TOOLS_ENGINE, PDF_TOOLS_WORKERS
+pdf_engine = engine_from_env("PDF_TOOLS", "pdf-tools", default_workers=max(2, (os.cpu_count() or 2) // 2))
+if pdf_tools.backend.name == "pymupdf" and pdf_engine.kind == "thread":
+    logger.warning("⚠️ PyMuPDF no admite varios threads: usar PDF_TOOLS_ENGINE=process")
+
+# Motor alternativo: pool de LibreOffice headless siempre arrancado
+# (LIBREOFFICE_POOL_SIZE, 0 = desactivado). ENGINE elige motor por petición;
+# auto lo decide el pre-análisis (prescan.py);
+# CONVERSION_FALLBACK=libreoffice|none reintenta con LibreOffice si pdf2docx falla
+libreoffice_pool = libreoffice_pool_from_env(TEMP_DIR)
+LIBREOFFICE_HEALTH_INTERVAL = int(os.getenv("LIBREOFFICE_HEALTH_INTERVAL", "30"))
+CONVERSION_FALLBACK = os.getenv("CONVERSION_FALLBACK", "libreoffice").lower()
+CONVERSION_ENGINE_PATTERN = "^(auto|pdf2docx|libreoffice)$"
+
+# Cache de conversiones por contenido (SHA-256 del PDF + versión + opciones)
+conversion_cache = None
+if os.getenv("CONVERSION_CACHE_ENABLED", "true").lower() == "true":
+    conversion_cache = ResultCache(
+        TEMP_DIR / "cache",
+        max_bytes=int(os.getenv("CONVERSION_CACHE_MAX_MB", "1024")) * 1024 * 1024,
+        ttl=int(os.getenv("CONVERSION_CACHE_TTL", "86400"))
+    )
+
+# Cache de /pdf/info por contenido: (sha256, backend, modo, offset, limit) -> info
+pdf_info_cache = MemoryCache(
+    max_entries=int(os.getenv("PDF_INFO_CACHE_SIZE", "2000")),
+    ttl=int(os.getenv("PDF_INFO_CACHE_TTL", "3600"))
+)
+PDF_INFO_MAX_LIMIT = int(os.getenv("PDF_INFO_MAX_LIMIT", "1000"))
+
+# Conversiones de un lote en curso o pendientes de enviar a la vez
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", str(conversion_engine.max_workers * 2)))
+
+# Unión: hasta MERGE_IN_MEMORY_MAX_FILES archivos se une en memoria; por encima,
+# en streaming por tandas (guardado incremental) con memoria acotada
+MERGE_MAX_FILES = int(os.getenv("MERGE_MAX_FILES", "500"))
+MERGE_IN_MEMORY_MAX_FILES = int(os.getenv("MERGE_IN_MEMORY_MAX_FILES", "10"))
+MERGE_STREAM_BATCH_FILES = int(os.getenv("MERGE_STREAM_BATCH_FILES", "25"))
+MERGE_STREAM_BATCH_BYTES = int(os.getenv("MERGE_STREAM_BATCH_MB", "64")) * 1024 * 1024
+
+# Páginas que cada worker genera por lote al dividir en modo streaming
+SPLIT_STREAM_BATCH_PAGES = int(os.getenv("SPLIT_STREAM_BATCH_PAGES", "100"))
+
+# Monitor del retraso del event loop (expuesto en /health)
+loop_monitor = EventLoopLagMonitor()
+
+# Vida del token de descarga (y de los archivos que permite descargar)
+DOWNLOAD_TOKEN_TTL = 2 * 60 * 60
+
+# Archivos convertidos pendientes de descarga (para Azure), compartido entre
+# workers: RESULT_STORE=sqlite|memory, RESULT_STORE_PATH, RESULT_STORE_MAX_MB
+result_store = result_store_from_env(TEMP_DIR, DOWNLOAD_TOKEN_TTL)
+RESULT_STORE_SWEEP_INTERVAL = int(os.getenv("RESULT_STORE_SWEEP_INTERVAL", "300"))
+
+# Documentos subidos una vez y reutilizados por id (/documents), en disco para
+# que los vean todos los workers: DOCUMENT_TTL (segundos desde el último uso),
+# DOCUMENT_STORE_MAX_MB
+document_store = DocumentStore(
+    TEMP_DIR / "documents",
+    ttl=int(os.getenv("DOCUMENT_TTL", "1800")),
+    max_bytes=int(os.getenv("DOCUMENT_STORE_MAX_MB", "2048")) * 1024 * 1024
+)
+DOCUMENT_SWEEP_INTERVAL = int(os.getenv("DOCUMENT_SWEEP_INTERVAL", "300"))
+
+# Validación de usuarios de Azure AD (token reutilizado, pool HTTP y cache)
+azure_directory = AzureUserDirectory.from_env()
+
+# Correos: se encolan en una outbox en SQLite y un sender en segundo plano los
+# envía (EMAIL_TRANSPORT=log|graph) con el mismo cliente de Graph
+email_outbox = email_outbox_from_env(TEMP_DIR, azure_directory.graph)
+email_service = EmailService(email_outbox, os.getenv("FRONTEND_URL", "http://localhost:3000"))
+
+# Cola de trabajos de conversión asíncrona
+job_manager = JobManager(
+    max_queue_size=int(os.getenv("JOB_QUEUE_MAX_SIZE", "20")),
+    workers=int(os.getenv("JOB_WORKERS", str(conversion_engine.max_workers))),
+    result_ttl=int(os.getenv("JOB_RESULT_TTL", "3600"))
+)
+
+def job_temp_paths():
+    """Archivos de los trabajos de este proceso (los demás workers no los ven)"""
+    paths = set()
+    for job in list(job_manager.jobs.values()):
+        paths.update(job.cleanup_paths)
+    return paths
+
+def protected_temp_paths():
+    """Archivos de TEMP_DIR que siguen en uso: descargas pendientes y trabajos"""
+    return result_store.active_paths() | job_temp_paths()
+
+# Limpieza periódica de huérfanos en TEMP_DIR (no toca TEMP_DIR/cache)
+temp_janitor = TempDirJanitor(
+    TEMP_DIR,
+    max_age=int(os.getenv("TEMP_JANITOR_MAX_AGE", str(DOWNLOAD_TOKEN_TTL + 3600))),
+    max_bytes=int(os.getenv("TEMP_JANITOR_MAX_MB", "4096")) * 1024 * 1024,
+    min_age=int(os.getenv("TEMP_JANITOR_MIN_AGE", "300")),
+    protected=protected_temp_paths,
+    keepalive=job_temp_paths
+)
+TEMP_JANITOR_INTERVAL = int(os.getenv("TEMP_JANITOR_INTERVAL", "600"))
+
+# ============================================
+# 📊 MÉTRICAS (formato Prometheus en /metrics)
+# ============================================
+
+metrics = Registry()
+HTTP_REQUESTS = metrics.counter("pdf_http_requests_total", "Peticiones HTTP por endpoint", ("endpoint", "method", "status"))
+HTTP_DURATION = metrics.histogram("pdf_http_request_duration_seconds", "Duración total de la petición", ("endpoint",))
+HTTP_PHASES = metrics.histogram(
+    "pdf_http_request_phase_seconds", "Duración por fase: upload, validate, process, respond", ("endpoint", "phase")
+)
+HTTP_BYTES_IN = metrics.counter("pdf_http_request_bytes_total", "Bytes recibidos", ("endpoint",))
+HTTP_BYTES_OUT = metrics.counter("pdf_http_response_bytes_total", "Bytes enviados", ("endpoint",))
+PAGES_PROCESSED = metrics.counter("pdf_pages_processed_total", "Páginas procesadas por operación", ("operation",))
+CONVERSION_ROUTES = metrics.counter(
+    "pdf_conversion_routes_total", "Conversiones por perfil del pre-análisis y motor elegido", ("profile", "engine")
+)
+ENGINE_TASKS = metrics.histogram(
+    "pdf_engine_task_seconds", "Ejecución de cada operación en el engine (PDFToolsManager, conversión)",
+    ("engine", "operation", "outcome")
+)
+ENGINE_WAIT = metrics.histogram("pdf_engine_queue_wait_seconds", "Espera hasta obtener un worker", ("engine",))
+
+# Operaciones del engine que cuentan como fase "validate" de la petición
+VALIDATE_OPERATIONS = {"count_pages", "validate_pdf_file"}
+
+def observe_engine_task(engine: str, operation: str, wait: float, run: float, ok: bool):
+    ENGINE_TASKS.observe(run, engine=engine, operation=operation, outcome="ok" if ok else "error")
+    ENGINE_WAIT.observe(wait, engine=engine)
+    record_phase("validate" if operation in VALIDATE_OPERATIONS else "process", wait + run)
+
+conversion_engine.observer = observe_engine_task
+pdf_engine.observer = observe_engine_task
+libreoffice_pool.observer = observe_engine_task
+
+def engine_values(field: str):
+    return [({"engine": e.name}, getattr(e, field)) for e in (conversion_engine, pdf_engine, libreoffice_pool)]
+
+def cache_values(field: str):
+    values = [
+        ({"cache": "azure_users"}, azure_directory.cache.stats()[field]),
+        ({"cache": "pdf_info"}, pdf_info_cache.stats()[field]),
+        ({"cache": "download_etags"}, file_responses.etag_cache.stats()[field]),
+    ]
+    if conversion_cache:
+        values.append(({"cache": "conversion"}, conversion_cache.stats()[field]))
+    return values
+
+def temp_dir_usage():
+    files = 0
+    for entry in os.scandir(TEMP_DIR):
+        if entry.is_file(follow_symlinks=False):
+            try:
+                files += entry.stat(follow_symlinks=False).st_size
+            except FileNotFoundError:
+                pass
+    usage = [({"area": "files"}, files)]
+    if conversion_cache:
+        usage.append(({"area": "cache"}, conversion_cache.stats()["bytes"]))
+    return usage
+
+metrics.gauge("pdf_engine_workers", "Workers configurados", ("engine",), lambda: engine_values("max_workers"))
+metrics.gauge("pdf_engine_active", "Trabajos ejecutándose", ("engine",), lambda: engine_values("active"))
+metrics.gauge("pdf_engine_queued", "Trabajos esperando worker", ("engine",), lambda: engine_values("queued"))
+metrics.counter_callback("pdf_engine_crashes_total", "Workers caídos", ("engine",), lambda: engine_values("crashes"))
+metrics.gauge("pdf_job_queue_depth", "Trabajos asíncronos en cola", (), lambda: [({}, job_manager.queue_depth)])
+metrics.gauge("pdf_jobs_active", "Trabajos asíncronos en ejecución", (), lambda: [({}, job_manager.active_jobs)])
+metrics.counter_callback("pdf_cache_hits_total", "Aciertos de cache", ("cache",), lambda: cache_values("hits"))
+metrics.counter_callback("pdf_cache_misses_total", "Fallos de cache", ("cache",), lambda: cache_values("misses"))
+metrics.gauge("pdf_cache_hit_ratio", "Proporción de aciertos", ("cache",), lambda: cache_values("hit_rate"))
+metrics.gauge("pdf_cache_entries", "Entradas en cache", ("cache",), lambda: cache_values("entries"))
+metrics.gauge("pdf_temp_dir_bytes", "Uso de disco de TEMP_DIR", ("area",), temp_dir_usage)
+metrics.gauge("pdf_result_store_entries", "Resultados pendientes de descarga", (),
+              lambda: [({}, result_store.stats()["entries"])])
+metrics.counter_callback("pdf_temp_janitor_reclaimed_bytes_total", "Bytes recuperados por el janitor", (),
+                         lambda: [({}, temp_janitor.bytes_reclaimed)])
+metrics.gauge("pdf_email_outbox_messages", "Correos en la outbox por estado", ("status",),
+              lambda: [({"status": status}, n) for status, n in email_outbox.counts().items()])
+metrics.counter_callback("pdf_emails_sent_total", "Correos aceptados por Graph", (),
+                         lambda: [({}, email_outbox.sent)])
+metrics.gauge("pdf_event_loop_lag_p99_seconds", "Retraso p99 del event loop", (),
+              lambda: [({}, loop_monitor.stats()["p99_ms"] / 1000)])
+
+app.add_middleware(
+    MetricsMiddleware,
+    requests_total=HTTP_REQUESTS, duration=HTTP_DURATION, phases=HTTP_PHASES,
+    bytes_in=HTTP_BYTES_IN, bytes_out=HTTP_BYTES_OUT
+)
+
+# ============================================
+# 🔎 TRACING Y PERFILADO
+# ============================================
+
+# Cabecera X-Trace: 1 -> Server-Timing por etapa; X-Profile: 1 -> cProfile de la petición
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(TEMP_DIR / "profiles")))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+PROFILE_MAX_AGE = int(os.getenv("PROFILE_MAX_AGE", "86400"))
+TRACE_SLOW_SPAN_MS = float(os.getenv("TRACE_SLOW_SPAN_MS", "0"))
+
+if os.getenv("TRACING_METRICS", "false").lower() == "true":
+    SPAN_DURATION = metrics.histogram("pdf_span_seconds", "Duración de cada etapa instrumentada", ("span",))
+    add_span_listener(lambda record: SPAN_DURATION.observe(record.duration, span=record.name))
+
+if TRACE_SLOW_SPAN_MS > 0:
+    def log_slow_span(record):
+        if record.duration * 1000 >= TRACE_SLOW_SPAN_MS:
+            logger.warning(f"🐢 Etapa lenta {record.name}: {record.duration * 1000:.0f} ms {record.attributes}")
+    add_span_listener(log_slow_span)
+
+app.add_middleware(
+    TracingMiddleware, profile_dir=PROFILE_DIR, profiling_enabled=PROFILING_ENABLED,
+    profile_max_files=PROFILE_MAX_FILES, profile_max_age=PROFILE_MAX_AGE
+)
+
+@app.on_event("startup")
+async def start_background_services():
+    await job_manager.start()
+    await loop_monitor.start()
+    await result_store.start_sweeper(RESULT_STORE_SWEEP_INTERVAL)
+    await document_store.start_sweeper(DOCUMENT_SWEEP_INTERVAL)
+    await temp_janitor.start(TEMP_JANITOR_INTERVAL)
+    await libreoffice_pool.start(LIBREOFFICE_HEALTH_INTERVAL)
+    await email_outbox.start()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    await job_manager.stop()
+    await loop_monitor.stop()
+    await result_store.stop_sweeper()
+    await document_store.stop_sweeper()
+    await temp_janitor.stop()
+    await libreoffice_pool.stop()
+    await email_outbox.stop()
+    await azure_directory.aclose()
+    conversion_engine.shutdown(wait=False)
+    pdf_engine.shutdown(wait=False)
 
 def cleanup_file(file_path: str):
     """Limpia archivos temporales de forma segura"""
@@ -63,67 +335,143 @@ def cleanup_multiple_files(file_paths: List[str]):
     for file_path in file_paths:
         cleanup_file(file_path)
 
-def convert_pdf_with_pdf2docx(pdf_path: str, docx_path: str) -> bool:
-    """Convierte PDF a DOCX usando pdf2docx"""
+async def prescan(pdf_path: str, content_sha256: Optional[str] = None) -> Dict[str, Any]:
+    """🔍 Pre-análisis del PDF en el pdf_engine, cacheado por contenido"""
+    key = (content_sha256, "prescan") if content_sha256 else None
+    scan = pdf_info_cache.get(key) if key else None
+    if scan is None:
+        scan = await pdf_engine.run(prescan_pdf, pdf_path)
+        if key:
+            pdf_info_cache.put(key, scan)
+    return scan
+
+def prescan_report(scan: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Pre-análisis más el motor que elegiría ``engine=auto`` (para /pdf/info)"""
+    if scan is None:
+        return None
+    return {**scan, "route": plan_route(scan, "auto", libreoffice_pool.available)}
+
+async def route_conversion(pdf_path: str, content_sha256: Optional[str], engine: str,
+                           mode: str = "balanced") -> Dict[str, Any]:
+    """🧭 Motor y ajustes según el pre-análisis; rechaza (400/422) lo que no se puede convertir bien"""
+    scan = await prescan(pdf_path, content_sha256)
+    route = plan_route(scan, engine, libreoffice_pool.available, mode)
+    CONVERSION_ROUTES.inc(profile=scan["profile"], engine=route["engine"] or "rejected")
+    if not route["accepted"]:
+        logger.info(f"🚫 Conversión rechazada: {route['reason']}")
+        raise HTTPException(status_code=route["status_code"], detail=route["reason"])
+    logger.info(f"🧭 Perfil {scan['profile']}: {route['engine']} ({route['reason']})")
+    return route
+
+async def run_conversion(pdf_path: str, content_sha256: Optional[str] = None, progress=None,
+                         engine: str = "auto", route: Optional[Dict[str, Any]] = None,
+                         mode: str = "balanced") -> str:
+    """Convierte PDF a DOCX pasando primero por la cache de resultados
+
+    Antes de nada el pre-análisis decide motor y ajustes (o rechaza el
+    documento); ``route`` reutiliza una decisión ya tomada. Con ``content_sha256`` un acierto en cache se sirve sin tocar
+    el engine; si no, se convierte y el resultado se guarda en la cache.
+    Cada motor y cada juego de ajustes (y por tanto cada ``mode``) tiene
+    sus propias entradas. Si
+    pdf2docx falla y se recurre a LibreOffice, ese resultado se guarda con la
+    clave de pdf2docx para no repetir una conversión que ya falló.
+    """
+    route = route or await route_conversion(pdf_path, content_sha256, engine, mode)
+    engine, settings = route["engine"], route["settings"]
+    if conversion_cache is None or not content_sha256:
+        return await convert_with(engine, pdf_path, progress, settings)
+
+    version = {"pdf2docx": CONVERTER_VERSION, "text": TEXT_CONVERTER_VERSION}.get(engine, libreoffice_pool.converter_version)
+    cache_key = ResultCache.make_key(content_sha256, version, settings)
+    docx_path = conversion_cache.get(cache_key, str(TEMP_DIR / f"converted_{uuid.uuid4()}.docx"))
+    if docx_path:
+        return docx_path
+
+    docx_path = await convert_with(engine, pdf_path, progress, settings)
+    conversion_cache.put(cache_key, docx_path)
+    return docx_path
+
+async def convert_with(engine: str, pdf_path: str, progress=None, settings: Optional[dict] = None) -> str:
+    """Convierte con el motor pedido; si pdf2docx falla, prueba con LibreOffice"""
+    if engine == "libreoffice":
+        return await convert_with_libreoffice(pdf_path, progress)
+    if engine == "text":
+        return await convert_text_only(pdf_path)
     try:
-        cv = Converter(pdf_path)
-        cv.convert(docx_path, start=0, end=None)
-        cv.close()
-        return os.path.exists(docx_path) and os.path.getsize(docx_path) > 0
+        return await convert_in_engine(pdf_path, progress, settings)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error con pdf2docx: {e}")
-        return False
+        if CONVERSION_FALLBACK != "libreoffice" or not libreoffice_pool.available:
+            raise
+        logger.warning(f"⚠️ pdf2docx falló ({e}); reintentando con LibreOffice")
+        return await libreoffice_pool.convert(pdf_path, str(TEMP_DIR))
 
-def convert_pdf_to_docx(pdf_path: str, output_dir: str) -> str:
-    """Convierte PDF a DOCX usando pdf2docx"""
-    unique_id = str(uuid.uuid4())
-    docx_filename = f"converted_{unique_id}.docx"
-    docx_path = os.path.join(output_dir, docx_filename)
-    
-    logger.info("Iniciando conversión con pdf2docx...")
-    if convert_pdf_with_pdf2docx(pdf_path, docx_path):
-        logger.info("Conversión exitosa con pdf2docx")
-        return docx_path
-    
-    raise Exception("No se pudo convertir el archivo")
+async def convert_with_libreoffice(pdf_path: str, progress=None) -> str:
+    if not libreoffice_pool.available:
+        raise HTTPException(status_code=503, detail="El motor LibreOffice no está disponible en este servidor")
+    if progress:
+        progress(10, "convirtiendo con LibreOffice")
+    with request_phase("validate"):
+        total_pages = await asyncio.to_thread(count_pdf_pages, pdf_path)
+    PAGES_PROCESSED.inc(total_pages, operation="convert")
+    return await libreoffice_pool.convert(pdf_path, str(TEMP_DIR))
+
+async def convert_text_only(pdf_path: str) -> str:
+    """⚡ Modo fast: extracción de sólo texto en el engine (sin reparto por páginas)"""
+    with request_phase("validate"):
+        total_pages = await asyncio.to_thread(count_pdf_pages, pdf_path)
+    PAGES_PROCESSED.inc(total_pages, operation="convert")
+    return await conversion_engine.run(convert_pdf_text_only, pdf_path, str(TEMP_DIR))
+
+async def convert_in_engine(pdf_path: str, progress=None, settings: Optional[dict] = None) -> str:
+    """Convierte PDF a DOCX en el engine; los PDFs grandes se reparten por páginas
+
+    Por encima de PARALLEL_PAGE_THRESHOLD páginas el documento se divide en
+    bloques contiguos que se analizan en paralelo en distintos workers; luego
+    un worker une los layouts y genera un único DOCX.
+    ``progress(pct, etapa)`` es opcional y se llama al terminar cada bloque.
+    ``settings`` (del pre-análisis) sobrescribe los ajustes de pdf2docx.
+    """
+    with request_phase("validate"):
+        total_pages = await asyncio.to_thread(count_pdf_pages, pdf_path)
+    PAGES_PROCESSED.inc(total_pages, operation="convert")
+
+    if not should_convert_in_parallel(total_pages, conversion_engine.max_workers):
+        return await conversion_engine.run(convert_pdf_to_docx, pdf_path, str(TEMP_DIR), settings)
+
+    chunks = plan_page_chunks(total_pages, conversion_engine.max_workers)
+    logger.info(f"🔀 Conversión paralela: {total_pages} páginas en {len(chunks)} bloques")
+
+    chunk_id = uuid.uuid4().hex[:8]
+    json_paths = [str(TEMP_DIR / f"chunk_{chunk_id}_{i:03d}.json") for i in range(len(chunks))]
+    try:
+        tasks = [
+            asyncio.ensure_future(conversion_engine.run(parse_pdf_chunk, pdf_path, start, end, json_path, settings))
+            for (start, end), json_path in zip(chunks, json_paths)
+        ]
+        try:
+            for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+                await task
+                if progress:
+                    progress(10 + 80 * done / len(chunks), f"analizando páginas ({done}/{len(chunks)} bloques)")
+        except Exception:
+            # Esperar al resto de bloques antes de limpiar sus JSON
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        if progress:
+            progress(90, "generando DOCX")
+        return await conversion_engine.run(make_docx_from_chunks, pdf_path, json_paths, str(TEMP_DIR), settings)
+    finally:
+        cleanup_multiple_files(json_paths)
 
 # Funciones auxiliares para Azure (mantener las existentes)
 async def validate_azure_user(email: str) -> bool:
     """Valida usuario en Azure AD"""
-    try:
-        import msal
-        
-        app_msal = msal.ConfidentialClientApplication(
-            client_id=os.getenv('AZURE_CLIENT_ID'),
-            client_credential=os.getenv('AZURE_CLIENT_SECRET'),
-            authority=f"https://login.microsoftonline.com/{os.getenv('AZURE_TENANT_ID')}"
-        )
-        
-        token_response = app_msal.acquire_token_for_client(
-            scopes=["https://graph.microsoft.com/.default"]
-        )
-        
-        if "access_token" not in token_response:
-            print("No se pudo obtener token de Azure")
-            return False
-        
-        headers = {
-            'Authorization': f'Bearer {token_response["access_token"]}',
-            'Content-Type': 'application/json'
-        }
-        
-        response = requests.get(
-            f"https://graph.microsoft.com/v1.0/users/{email}",
-            headers=headers,
-            timeout=10
-        )
-        
-        print(f"Azure validation para {email}: {response.status_code}")
-        return response.status_code == 200
-        
-    except Exception as e:
-        print(f"Error validando Azure user: {e}")
-        return False
+    is_valid = await azure_directory.validate_user(email)
+    logger.info(f"Azure validation para {email}: {'ok' if is_valid else 'no encontrado'}")
+    return is_valid
 
 def generate_download_token(email: str, file_id: str) -> str:
     """Genera token JWT para descarga"""
@@ -131,7 +479,7 @@ def generate_download_token(email: str, file_id: str) -> str:
         'email': email,
         'file_id': file_id,
         'purpose': 'download',
-        'exp': datetime.utcnow() + timedelta(hours=2),
+        'exp': datetime.utcnow() + timedelta(seconds=DOWNLOAD_TOKEN_TTL),
         'iat': datetime.utcnow()
     }
     
@@ -154,19 +502,9 @@ def validate_download_token(token: str) -> dict:
         print(f"Token inválido: {e}")
         return None
 
-async def send_download_email(email: str, token: str, filename: str):
-    """Simula envío de correo"""
-    download_url = f"http://localhost:3000/download?token={token}"
-    
-    print("="*50)
-    print("📧 CORREO SIMULADO")
-    print(f"Para: {email}")
-    print(f"Asunto: Documento convertido: {filename}")
-    print(f"Link de descarga: {download_url}")
-    print("⏰ Expira en 2 horas")
-    print("="*50)
-    
-    return True
+async def send_download_email(email: str, token: str, filename: str) -> str:
+    """Encola el correo con el enlace de descarga (no espera a Graph) y devuelve su id"""
+    return await email_service.send_download_token(email, email.split("@")[0], token, filename)
 
 # ============================================
 # ENDPOINTS PRINCIPALES
@@ -184,19 +522,91 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Endpoint para verificar el estado del servicio"""
+    # result_store y email_outbox consultan SQLite y document_store recorre
+    # su directorio: fuera del event loop
+    result_store_stats, email_outbox_stats, document_store_stats = await asyncio.gather(
+        asyncio.to_thread(result_store.stats), asyncio.to_thread(email_outbox.stats),
+        asyncio.to_thread(document_store.stats)
+    )
     return {
         "status": "healthy", 
         "version": "2.0.0",
         "tools_available": 4,
-        "temp_dir": str(TEMP_DIR)
+        "temp_dir": str(TEMP_DIR),
+        "event_loop_lag": loop_monitor.stats(),
+        "conversion_cache": conversion_cache.stats() if conversion_cache else None,
+        "pdf_info_cache": pdf_info_cache.stats(),
+        "azure_directory": azure_directory.stats(),
+        "result_store": result_store_stats,
+        "document_store": document_store_stats,
+        "temp_janitor": temp_janitor.stats(),
+        "email_outbox": email_outbox_stats,
+        "downloads": file_responses.stats(),
+        "engines": [conversion_engine.stats(), pdf_engine.stats(), libreoffice_pool.stats()]
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """📊 Métricas en formato de texto de Prometheus"""
+    body = await asyncio.to_thread(metrics.render)
+    return Response(content=body, media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = Query("text", pattern="^(text|raw)$"),
+                      sort: str = Query("cumulative", pattern="^(cumulative|tottime|calls)$")):
+    """🔬 Perfil guardado por una petición con X-Profile: 1 (texto o .prof)"""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Perfilado deshabilitado")
+    try:
+        profile_id = uuid.UUID(hex=profile_id).hex
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Id de perfil inválido")
+    path = PROFILE_DIR / f"{profile_id}.prof"
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    if format == "raw":
+        return FileResponse(path, filename=path.name, media_type="application/octet-stream")
+    report = await asyncio.to_thread(profile_report, path, 40, sort)
+    return Response(content=report, media_type="text/plain")
+
 # ============================================
 # 🔄 PDF TO WORD (ENDPOINTS EXISTENTES)
 # ============================================
 
+async def convert_response(pdf_path: str, content_sha256: Optional[str], filename: str,
+                           engine: str = "pdf2docx", mode: str = "balanced") -> ResumableFileResponse:
+    """Convierte ``pdf_path`` y responde con el DOCX; ambos se borran al terminar"""
+    logger.info(f"🔄 Iniciando conversión PDF a DOCX ({engine}, modo {mode})...")
+    docx_path = await run_conversion(pdf_path, content_sha256, engine=engine, mode=mode)
+    
+    if not os.path.exists(docx_path) or os.path.getsize(docx_path) == 0:
+        raise HTTPException(status_code=500, detail="La conversión falló")
+    
+    logger.info(f"✅ Conversión exitosa. Archivo DOCX: {docx_path}")
+    
+    headers = {
+        "Content-Disposition": f"attachment; filename={filename.replace('.pdf', '.docx')}",
+        "Content-Type": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    }
+    
+    return ResumableFileResponse(
+        path=docx_path,
+        headers=headers,
+        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        background=BackgroundTask(cleanup_multiple_files, [pdf_path, docx_path])
+    )
+
+@app.get("/convert/modes")
+async def list_conversion_modes():
+    """⚡ Niveles de velocidad/calidad de ``mode`` con los tiempos por página medidos"""
+    return {"default": "balanced", "modes": CONVERSION_MODES}
+
 @app.post("/convert")
-async def convert_pdf(file: UploadFile = File(...)):
+async def convert_pdf(
+    file: UploadFile = File(...),
+    engine: str = Query("auto", pattern=CONVERSION_ENGINE_PATTERN, description="Motor: auto (según el pre-análisis), pdf2docx o libreoffice"),
+    mode: str = Query("balanced", pattern=CONVERSION_MODE_PATTERN, description="Velocidad/calidad: fast (sólo texto), balanced o full (ver /convert/modes)")
+):
     """🔄 Convierte un archivo PDF a formato DOCX - Endpoint original"""
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="El archivo debe ser un PDF")
@@ -210,40 +620,12 @@ async def convert_pdf(file: UploadFile = File(...)):
     
     try:
         logger.info(f"🔄 Guardando archivo PDF: {pdf_path}")
-        with open(pdf_path, "wb") as buffer:
-            content = await file.read()
-            if len(content) == 0:
-                raise HTTPException(status_code=400, detail="El archivo está vacío")
-            buffer.write(content)
+        upload = await save_upload(file, pdf_path)
         
         if not pdf_path.exists() or pdf_path.stat().st_size == 0:
             raise HTTPException(status_code=500, detail="Error al guardar el archivo PDF")
         
-        logger.info("🔄 Iniciando conversión PDF a DOCX...")
-        loop = asyncio.get_event_loop()
-        docx_path = await loop.run_in_executor(
-            executor, 
-            convert_pdf_to_docx, 
-            str(pdf_path), 
-            str(TEMP_DIR)
-        )
-        
-        if not os.path.exists(docx_path) or os.path.getsize(docx_path) == 0:
-            raise HTTPException(status_code=500, detail="La conversión falló")
-        
-        logger.info(f"✅ Conversión exitosa. Archivo DOCX: {docx_path}")
-        
-        headers = {
-            "Content-Disposition": f"attachment; filename={file.filename.replace('.pdf', '.docx')}",
-            "Content-Type": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-        }
-        
-        return FileResponse(
-            path=docx_path,
-            headers=headers,
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            background=BackgroundTasks([lambda: cleanup_file(str(pdf_path))])
-        )
+        return await convert_response(str(pdf_path), upload.sha256, file.filename, engine, mode)
         
     except HTTPException:
         cleanup_file(str(pdf_path))
@@ -256,7 +638,9 @@ async def convert_pdf(file: UploadFile = File(...)):
 @app.post("/convert-with-azure")
 async def convert_pdf_with_azure(
     file: UploadFile = File(...),
-    user_email: str = Query(..., description="Correo institucional del usuario")
+    user_email: str = Query(..., description="Correo institucional del usuario"),
+    engine: str = Query("auto", pattern=CONVERSION_ENGINE_PATTERN, description="Motor: auto (según el pre-análisis), pdf2docx o libreoffice"),
+    mode: str = Query("balanced", pattern=CONVERSION_MODE_PATTERN, description="Velocidad/calidad: fast (sólo texto), balanced o full (ver /convert/modes)")
 ):
     """🔄 Endpoint con autenticación Azure AD y token por correo"""
     
@@ -282,35 +666,23 @@ async def convert_pdf_with_azure(
     
     try:
         print(f"💾 Guardando archivo: {file.filename}")
-        with open(pdf_path, "wb") as buffer:
-            content = await file.read()
-            if len(content) == 0:
-                raise HTTPException(status_code=400, detail="Archivo vacío")
-            buffer.write(content)
+        upload = await save_upload(file, pdf_path)
         
         print("🔄 Iniciando conversión PDF a Word...")
-        loop = asyncio.get_event_loop()
-        docx_path = await loop.run_in_executor(
-            executor, 
-            convert_pdf_to_docx, 
-            str(pdf_path), 
-            str(TEMP_DIR)
-        )
+        docx_path = await run_conversion(str(pdf_path), upload.sha256, engine=engine, mode=mode)
         
         file_id = str(uuid.uuid4())
-        converted_files[file_id] = {
-            'path': docx_path,
-            'filename': file.filename.replace('.pdf', '.docx'),
-            'user_email': user_email,
-            'created_at': datetime.utcnow()
-        }
+        await asyncio.to_thread(
+            result_store.put, file_id, docx_path, file.filename.replace('.pdf', '.docx'), user_email
+        )
         
         print(f"💾 Archivo convertido guardado con ID: {file_id}")
         
         token = generate_download_token(user_email, file_id)
         print(f"🔑 Token generado para descarga")
         
-        await send_download_email(user_email, token, file.filename)
+        email_id = await send_download_email(user_email, token, file.filename)
+        logger.info(f"📮 Correo encolado: {email_id}")
         
         cleanup_file(str(pdf_path))
         print("🗑️ Archivo PDF original eliminado")
@@ -319,14 +691,136 @@ async def convert_pdf_with_azure(
             "message": f"Conversión exitosa. Token enviado a {user_email}",
             "user_email": user_email,
             "expires_in": "2 horas",
-            "file_id": file_id
+            "file_id": file_id,
+            "email_id": email_id
         }
         
+    except HTTPException:
+        cleanup_file(str(pdf_path))
+        raise
     except Exception as e:
         cleanup_file(str(pdf_path))
         print(f"❌ Error en conversión: {e}")
         raise HTTPException(status_code=500, detail=f"Error procesando archivo: {str(e)}")
 
+@app.post("/convert/batch")
+async def convert_batch(files: List[UploadFile] = File(...)):
+    """📚 Convierte muchos PDFs (o ZIPs de PDFs) y devuelve un ZIP de DOCX
+
+    Las conversiones se reparten entre los workers y cada DOCX se añade al
+    ZIP de la respuesta en cuanto termina. Los fallos se informan por
+    archivo en ``_report.json`` (última entrada del ZIP) sin cortar el lote.
+    """
+    items: List[BatchItem] = []
+
+    def discard_inputs():
+        cleanup_multiple_files([item.path for item in items if item.path])
+
+    try:
+        for file in files:
+            name = file.filename or "sin_nombre"
+            lower = name.lower()
+            if lower.endswith('.zip'):
+                zip_path = TEMP_DIR / f"batch_zip_{uuid.uuid4()}.zip"
+                try:
+                    await save_upload(file, zip_path, max_bytes=BATCH_MAX_ZIP_BYTES, require_pdf=False)
+                    extracted = await asyncio.to_thread(
+                        extract_pdfs_from_zip, str(zip_path), TEMP_DIR, BATCH_MAX_FILES - len(items)
+                    )
+                    for item in extracted:
+                        track_in_use(item.path)
+                    items += extracted
+                except zipfile.BadZipFile:
+                    items.append(BatchItem(name, error="ZIP corrupto o inválido"))
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+                finally:
+                    cleanup_file(str(zip_path))
+            elif lower.endswith('.pdf'):
+                pdf_path = TEMP_DIR / f"batch_input_{uuid.uuid4()}.pdf"
+                try:
+                    upload = await save_upload(file, pdf_path)
+                    items.append(BatchItem(name, str(pdf_path), upload.size, upload.sha256))
+                except HTTPException as e:
+                    items.append(BatchItem(name, error=e.detail))
+            else:
+                items.append(BatchItem(name, error="Solo se admiten archivos PDF o ZIP"))
+
+            if len(items) > BATCH_MAX_FILES:
+                raise HTTPException(status_code=400, detail=f"Máximo {BATCH_MAX_FILES} archivos por lote")
+    except BaseException:
+        discard_inputs()
+        raise
+
+    if not items:
+        raise HTTPException(status_code=400, detail="El lote no contiene archivos PDF")
+
+    logger.info(f"📚 Lote recibido: {len(items)} archivo(s)")
+    return batch_zip_response(items, f"converted_{len(items)}_files.zip")
+
+def batch_zip_response(items: List[BatchItem], zip_name: str) -> StreamingResponse:
+    """📦 ZIP en streaming con cada DOCX del lote en orden de finalización
+
+    Como mucho BATCH_CONCURRENCY documentos están convirtiéndose o esperando
+    a enviarse: si el cliente lee despacio, las conversiones se detienen en
+    vez de acumular DOCX en disco. Si el cliente se desconecta se cancela lo
+    pendiente y se limpian los temporales.
+    """
+    started_at = time.time()
+
+    async def converted_parts():
+        used_names = set()
+        finished = asyncio.Queue()
+        slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def convert_one(item: BatchItem):
+            docx_path = None
+            start = time.perf_counter()
+            try:
+                await slots.acquire()
+                docx_path = await run_conversion(item.path, item.sha256)
+            except Exception as e:
+                slots.release()
+                item.error = getattr(e, "detail", None) or "Archivo PDF corrupto o no convertible"
+                logger.warning(f"⚠️ Lote: {item.source} no se pudo convertir: {e}")
+            finally:
+                item.duration = time.perf_counter() - start
+                cleanup_file(item.path)
+            await finished.put((item, docx_path))
+
+        tasks = [asyncio.ensure_future(convert_one(item)) for item in items if item.error is None]
+        try:
+            for _ in range(len(tasks)):
+                item, docx_path = await finished.get()
+                if docx_path is None:
+                    continue
+                try:
+                    data = await asyncio.to_thread(Path(docx_path).read_bytes)
+                finally:
+                    cleanup_file(docx_path)
+                    slots.release()
+                item.output = docx_name(item.source, used_names)
+                yield item.output, data
+
+            report = batch_report(items, started_at)
+            logger.info(f"✅ Lote terminado: {report['converted']} convertidos, {report['failed']} con error")
+            yield "_report.json", json.dumps(report, ensure_ascii=False, indent=2).encode("utf-8")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            while not finished.empty():
+                _, docx_path = finished.get_nowait()
+                if docx_path:
+                    cleanup_file(docx_path)
+            cleanup_multiple_files([item.path for item in items if item.path])
+
+    return StreamingResponse(
+        stream_zip(converted_parts()),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{zip_name}"', "X-Batch-Files": str(len(items))}
+    )
+
 @app.get("/download")
 async def download_with_token(token: str = Query(...)):
     """📥 Descarga archivo usando token del correo"""
@@ -341,25 +835,24 @@ async def download_with_token(token: str = Query(...)):
     print(f"✅ Token válido para: {token_data.get('email')}")
     
     file_id = token_data['file_id']
-    if file_id not in converted_files:
+    file_info = await asyncio.to_thread(result_store.get, file_id)
+    if file_info is None:
         print(f"❌ Archivo {file_id} no encontrado")
         raise HTTPException(status_code=404, detail="Archivo no encontrado o expirado")
     
-    file_info = converted_files[file_id]
-    
     if file_info['user_email'] != token_data['email']:
         print(f"❌ Usuario no autorizado: {token_data['email']}")
         raise HTTPException(status_code=403, detail="No autorizado para este archivo")
     
     if not os.path.exists(file_info['path']):
         print(f"❌ Archivo físico no encontrado: {file_info['path']}")
-        del converted_files[file_id]
+        await asyncio.to_thread(result_store.delete, file_id)
         raise HTTPException(status_code=404, detail="Archivo no disponible")
     
     print(f"📥 Enviando archivo: {file_info['filename']}")
     
     try:
-        return FileResponse(
+        return ResumableFileResponse(
             path=file_info['path'],
             filename=file_info['filename'],
             media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
@@ -368,15 +861,234 @@ async def download_with_token(token: str = Query(...)):
         print(f"❌ Error enviando archivo: {e}")
         raise HTTPException(status_code=500, detail="Error descargando archivo")
 
+# ============================================
+# ⏳ CONVERSIÓN ASÍNCRONA - Cola de trabajos
+# ============================================
+
+@app.post("/jobs/convert", status_code=202)
+async def submit_conversion_job(
+    file: UploadFile = File(...),
+    engine: str = Query("auto", pattern=CONVERSION_ENGINE_PATTERN, description="Motor: auto (según el pre-análisis), pdf2docx o libreoffice"),
+    mode: str = Query("balanced", pattern=CONVERSION_MODE_PATTERN, description="Velocidad/calidad: fast (sólo texto), balanced o full (ver /convert/modes)")
+):
+    """⏳ Encola una conversión PDF a DOCX y devuelve el ID del trabajo"""
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="El archivo debe ser un PDF")
+
+    if job_manager.queue_depth >= job_manager.max_queue_size:
+        retry_after = job_manager.estimate_retry_after()
+        raise HTTPException(
+            status_code=429,
+            detail="Cola de conversión llena, intenta más tarde",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    unique_id = str(uuid.uuid4())
+    pdf_path = TEMP_DIR / f"job_input_{unique_id}.pdf"
+
+    upload = await save_upload(file, pdf_path)
+
+    # Lo que no se puede convertir bien se rechaza aquí, sin ocupar la cola
+    try:
+        route = await route_conversion(str(pdf_path), upload.sha256, engine, mode)
+    except BaseException:
+        cleanup_file(str(pdf_path))
+        raise
+
+    output_filename = file.filename.replace('.pdf', '.docx')
+
+    async def work(job):
+        job.set_progress(10, "convirtiendo")
+        try:
+            docx_path = await run_conversion(str(pdf_path), upload.sha256, progress=job.set_progress, route=route)
+        finally:
+            cleanup_file(str(pdf_path))
+        job.cleanup_paths.append(docx_path)
+        return {"path": docx_path, "filename": output_filename}
+
+    try:
+        job = job_manager.submit(
+            "convert", work,
+            meta={"filename": file.filename, "size": upload.size, "sha256": upload.sha256,
+                  "engine": route["engine"], "mode": mode},
+            cleanup_paths=[str(pdf_path)]
+        )
+    except JobQueueFull as e:
+        cleanup_file(str(pdf_path))
+        raise HTTPException(
+            status_code=429,
+            detail="Cola de conversión llena, intenta más tarde",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "result_url": f"/jobs/{job.id}/result",
+        "queue_depth": job_manager.queue_depth
+    }
+
+@app.post("/jobs/merge", status_code=202)
+async def submit_merge_job(files: List[UploadFile] = File(...)):
+    """⏳ Encola la unión en streaming de muchos PDFs (hasta MERGE_MAX_FILES)
+
+    ``/jobs/{job_id}`` muestra el estado de cada archivo (pendiente o unido,
+    con su página inicial) a medida que avanzan las tandas.
+    """
+    validate_merge_files(files)
+
+    if job_manager.queue_depth >= job_manager.max_queue_size:
+        raise HTTPException(
+            status_code=429,
+            detail="Cola de trabajos llena, intenta más tarde",
+            headers={"Retry-After": str(job_manager.estimate_retry_after())}
+        )
+
+    unique_id = str(uuid.uuid4())
+    saved_files = []
+    try:
+        for i, file in enumerate(files):
+            pdf_path = TEMP_DIR / f"merge_{unique_id}_{i:04d}.pdf"
+            await save_upload(file, pdf_path)
+            saved_files.append(str(pdf_path))
+    except BaseException:
+        cleanup_multiple_files(saved_files)
+        raise
+
+    names = [f.filename for f in files]
+    merged_path = str(TEMP_DIR / f"merged_document_{len(files)}_files_{unique_id[:8]}.pdf")
+    file_status = [{"name": name, "status": "pending", "pages": None, "start_page": None} for name in names]
+
+    async def work(job):
+        done = 0
+
+        def progress(batch, added):
+            nonlocal done
+            for i, entry in zip(batch, added):
+                file_status[i].update(status="merged", pages=entry['pages'], start_page=entry['start_page'])
+            done += len(batch)
+            job.meta["merged_files"] = done
+            job.set_progress(5 + 90 * done / len(names), f"uniendo archivos ({done}/{len(names)})")
+
+        job.cleanup_paths.append(merged_path)
+        try:
+            total_pages = await merge_streaming(saved_files, names, merged_path, progress)
+        finally:
+            cleanup_multiple_files(saved_files)
+        job.meta["total_pages"] = total_pages
+        return {"path": merged_path, "filename": "merged_document.pdf", "media_type": "application/pdf"}
+
+    try:
+        job = job_manager.submit(
+            "merge", work,
+            meta={"total_files": len(names), "merged_files": 0, "files": file_status},
+            cleanup_paths=list(saved_files)
+        )
+    except JobQueueFull as e:
+        cleanup_multiple_files(saved_files)
+        raise HTTPException(
+            status_code=429,
+            detail="Cola de trabajos llena, intenta más tarde",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "result_url": f"/jobs/{job.id}/result",
+        "queue_depth": job_manager.queue_depth
+    }
+
+def get_job_or_404(job_id: str):
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o expirado")
+    return job
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """📋 Estado completo de un trabajo"""
+    return get_job_or_404(job_id).to_dict()
+
+@app.get("/jobs/{job_id}/progress")
+async def get_job_progress(job_id: str):
+    """📈 Progreso de un trabajo (respuesta ligera para polling)"""
+    job = get_job_or_404(job_id)
+    return {"job_id": job.id, "status": job.status, "progress": job.progress, "stage": job.stage}
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """📥 Descarga el resultado de un trabajo terminado"""
+    job = get_job_or_404(job_id)
+
+    if job.status == JOB_FAILED:
+        raise HTTPException(status_code=job.error_status, detail=job.error)
+
+    if job.status != JOB_DONE:
+        return JSONResponse(
+            status_code=409,
+            content={"detail": "El trabajo aún no ha terminado", **job.to_dict()},
+            headers={"Retry-After": "2"}
+        )
+
+    result = job.result
+    if not os.path.exists(result['path']):
+        raise HTTPException(status_code=404, detail="Resultado no disponible")
+
+    return ResumableFileResponse(
+        path=result['path'],
+        filename=result['filename'],
+        media_type=result.get(
+            'media_type', "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        )
+    )
+
 # ============================================
 # 📊 PDF INFO - Obtener información del PDF
 # ============================================
 
+def pdf_info_key(sha256: str, mode: str, offset: int, limit: Optional[int]):
+    return (sha256, pdf_tools.backend.name, mode, offset if mode == "full" else 0, limit if mode == "full" else None)
+
+def pdf_info_etag(key) -> str:
+    return '"' + hashlib.sha256(repr(key).encode()).hexdigest()[:32] + '"'
+
+def check_pdf_info_limit(limit: Optional[int]):
+    if limit is not None and limit > PDF_INFO_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit máximo: {PDF_INFO_MAX_LIMIT}")
+
+async def compute_pdf_info(pdf_path: str, key) -> Dict[str, Any]:
+    """Analiza el PDF en el pdf_engine según el modo de ``key`` y lo guarda en cache"""
+    _, _, mode, offset, limit = key
+    if mode == "summary":
+        info = await pdf_engine.run(pdf_tools.get_pdf_summary, pdf_path)
+    else:
+        info = await pdf_engine.run(pdf_tools.get_pdf_info, pdf_path, offset, limit)
+        PAGES_PROCESSED.inc(len(info['pages_info']), operation="info")
+    pdf_info_cache.put(key, info)
+    return info
+
 @app.post("/pdf/info")
-async def get_pdf_info(file: UploadFile = File(...)):
-    """📊 Obtiene información completa del PDF"""
+async def get_pdf_info(
+    response: Response,
+    file: UploadFile = File(...),
+    mode: str = Query("full", pattern="^(full|summary)$", description="summary: sin recorrer las páginas"),
+    offset: int = Query(0, ge=0, description="Primera página (0-based) de pages_info"),
+    limit: Optional[int] = Query(None, ge=1, description="Páginas de pages_info (por defecto, todas)")
+):
+    """📊 Obtiene información del PDF
+    
+    ``mode=summary`` devuelve páginas, metadata y tamaño leyendo sólo el
+    trailer y la raíz del árbol de páginas. En ``full`` los detalles por
+    página se paginan con ``offset``/``limit``. La respuesta se cachea por
+    SHA-256 del contenido: ``GET /pdf/info/{sha256}`` la devuelve sin volver
+    a subir el archivo.
+    """
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Debe ser un archivo PDF")
+    check_pdf_info_limit(limit)
     
     unique_id = str(uuid.uuid4())
     pdf_path = TEMP_DIR / f"info_{unique_id}.pdf"
@@ -385,22 +1097,34 @@ async def get_pdf_info(file: UploadFile = File(...)):
         logger.info(f"📊 Analizando PDF: {file.filename}")
         
         # Guardar archivo temporal
-        with open(pdf_path, "wb") as buffer:
-            content = await file.read()
-            if len(content) == 0:
-                raise HTTPException(status_code=400, detail="El archivo está vacío")
-            buffer.write(content)
-        
-        # Validar que sea un PDF válido
-        if not pdf_tools.validate_pdf_file(str(pdf_path)):
-            raise HTTPException(status_code=400, detail="Archivo PDF corrupto o inválido")
+        upload = await save_upload(file, pdf_path)
         
-        # Obtener información
-        info = pdf_tools.get_pdf_info(str(pdf_path))
+        # Obtener información y pre-análisis (o reutilizarlos si ya se analizó este contenido)
+        key = pdf_info_key(upload.sha256, mode, offset, limit)
+        info = pdf_info_cache.get(key)
+        if info is None:
+            tasks = [
+                asyncio.ensure_future(compute_pdf_info(str(pdf_path), key)),
+                asyncio.ensure_future(prescan(str(pdf_path), upload.sha256))
+            ]
+            try:
+                info, scan = await asyncio.gather(*tasks)
+            except BaseException:
+                # Que ninguno siga (o llegue a empezar) con el archivo ya borrado
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+        else:
+            scan = await prescan(str(pdf_path), upload.sha256)
         
+        response.headers["ETag"] = pdf_info_etag(key)
         return {
             "filename": file.filename,
+            "sha256": upload.sha256,
+            "mode": mode,
             "info": info,
+            "prescan": prescan_report(scan),
             "message": "Información obtenida exitosamente",
             "status": "success"
         }
@@ -413,51 +1137,118 @@ async def get_pdf_info(file: UploadFile = File(...)):
     finally:
         cleanup_file(str(pdf_path))
 
+@app.get("/pdf/info/{sha256}")
+async def get_cached_pdf_info(
+    sha256: str,
+    request: Request,
+    mode: str = Query("full", pattern="^(full|summary)$"),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1)
+):
+    """⚡ Info ya calculada para un contenido (SHA-256), sin subir el PDF
+    
+    404 si no está en cache: entonces hay que usar ``POST /pdf/info``.
+    Admite ``If-None-Match`` con el ETag de una respuesta anterior.
+    """
+    key = pdf_info_key(sha256.lower(), mode, offset, limit)
+    info = pdf_info_cache.get(key)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Información no disponible en cache; usa POST /pdf/info")
+    
+    etag = pdf_info_etag(key)
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=3600"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    scan = pdf_info_cache.get((key[0], "prescan"))
+    return JSONResponse(
+        content={"sha256": key[0], "mode": mode, "info": info, "prescan": prescan_report(scan), "status": "success"},
+        headers=headers
+    )
+
 # ============================================
 # 📄 DIVIDIR PDF - Split PDF por páginas
 # ============================================
 
-@app.post("/pdf/split/pages")
-async def split_pdf_by_pages(file: UploadFile = File(...)):
-    """📄 Divide PDF en archivos separados por página"""
-    if not file.filename.lower().endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Debe ser un archivo PDF")
-    
+def split_zip_response(pdf_path: str, parts, batches, first_batch, zip_name: str,
+                       compress: bool = False) -> StreamingResponse:
+    """📦 Responde con un ZIP generado al vuelo con cada parte de la división
+
+    Las partes se generan en memoria por lotes en el pdf_engine (el siguiente
+    lote se prepara mientras se envía el actual) y van directas al ZIP. El
+    primer lote ya viene generado por ``pdf_tools.start_split``.
+    El PDF de entrada se elimina al terminar la respuesta.
+    """
+    PAGES_PROCESSED.inc(sum(len(page_indexes) for _, page_indexes in parts), operation="split")
+
+    async def rendered_parts():
+        pending = None
+        try:
+            for i in range(len(batches)):
+                rendered = first_batch if i == 0 else await pending
+                if i + 1 < len(batches):
+                    pending = asyncio.ensure_future(pdf_engine.run(pdf_tools.render_parts, pdf_path, batches[i + 1]))
+                for item in rendered:
+                    yield item
+            logger.info(f"✅ ZIP enviado: {zip_name} ({len(parts)} partes)")
+        finally:
+            # Cliente desconectado a mitad: no dejar el lote siguiente huérfano
+            if pending is not None:
+                pending.cancel()
+                pending.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+    compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    return StreamingResponse(
+        stream_zip(rendered_parts(), compression),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{zip_name}"'},
+        background=BackgroundTask(cleanup_file, pdf_path)
+    )
+
+async def split_response(pdf_path: str, filename: str, ranges_tuples=None,
+                         stream: bool = True, compress: bool = False):
+    """📄 Divide ``pdf_path`` por páginas (o por ``ranges_tuples``) y responde con un ZIP
+
+    ``pdf_path`` pasa a ser de esta función: se elimina al terminar la
+    respuesta o en cuanto falla algo.
+    """
     unique_id = str(uuid.uuid4())
-    pdf_path = TEMP_DIR / f"split_{unique_id}.pdf"
+    kind = "split_ranges" if ranges_tuples else "split_pages"
+    streaming = False
     
     try:
-        logger.info(f"📄 Dividiendo PDF por páginas: {file.filename}")
-        
-        # Guardar archivo temporal
-        with open(pdf_path, "wb") as buffer:
-            content = await file.read()
-            if len(content) == 0:
-                raise HTTPException(status_code=400, detail="El archivo está vacío")
-            buffer.write(content)
+        filename_prefix = filename.replace('.pdf', '').replace(' ', '_')
+        zip_name = f"{kind}_{filename_prefix}_{unique_id[:8]}.zip"
         
-        # Validar PDF
-        if not pdf_tools.validate_pdf_file(str(pdf_path)):
-            raise HTTPException(status_code=400, detail="Archivo PDF corrupto o inválido")
+        if stream:
+            parts, batches, first_batch = await pdf_engine.run(
+                pdf_tools.start_split, pdf_path, filename_prefix, ranges_tuples, SPLIT_STREAM_BATCH_PAGES
+            )
+            streaming = True
+            return split_zip_response(pdf_path, parts, batches, first_batch, zip_name, compress)
         
-        # Dividir PDF
-        filename_prefix = file.filename.replace('.pdf', '').replace(' ', '_')
-        output_files = pdf_tools.split_pdf_by_pages(str(pdf_path), filename_prefix)
+        if ranges_tuples:
+            output_files = await pdf_engine.run(pdf_tools.split_pdf_by_ranges, pdf_path, ranges_tuples, filename_prefix)
+        else:
+            output_files = await pdf_engine.run(pdf_tools.split_pdf_by_pages, pdf_path, filename_prefix)
         
         if not output_files:
             raise HTTPException(status_code=500, detail="No se pudieron generar archivos")
         
         # Crear ZIP con todos los archivos
-        zip_name = f"split_pages_{filename_prefix}_{unique_id[:8]}.zip"
-        zip_path = pdf_tools.create_zip_from_files(output_files, zip_name)
+        zip_path = await pdf_engine.run(pdf_tools.create_zip_from_files, output_files, zip_name)
         
-        logger.info(f"✅ PDF dividido en {len(output_files)} páginas")
+        if ranges_tuples:
+            PAGES_PROCESSED.inc(sum(end - start + 1 for start, end in ranges_tuples), operation="split")
+            logger.info(f"✅ PDF dividido en {len(output_files)} rangos")
+        else:
+            PAGES_PROCESSED.inc(len(output_files), operation="split")
+            logger.info(f"✅ PDF dividido en {len(output_files)} páginas")
         
-        return FileResponse(
+        return ResumableFileResponse(
             path=zip_path,
             filename=zip_name,
             media_type="application/zip",
-            background=BackgroundTasks([lambda: cleanup_multiple_files(output_files + [str(pdf_path), zip_path])])
+            background=BackgroundTask(cleanup_multiple_files, output_files + [zip_path])
         )
         
     except HTTPException:
@@ -466,16 +1257,11 @@ async def split_pdf_by_pages(file: UploadFile = File(...)):
         logger.error(f"❌ Error dividiendo PDF: {e}")
         raise HTTPException(status_code=500, detail=f"Error dividiendo PDF: {str(e)}")
     finally:
-        if os.path.exists(pdf_path):
-            cleanup_file(str(pdf_path))
+        if not streaming:
+            cleanup_file(pdf_path)
 
-@app.post("/pdf/split/ranges")
-async def split_pdf_by_ranges(file: UploadFile = File(...), ranges: str = Form(...)):
-    """📊 Divide PDF por rangos especificados"""
-    if not file.filename.lower().endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Debe ser un archivo PDF")
-    
-    # Parsear rangos desde string JSON
+def parse_split_ranges(ranges: str):
+    """Rangos ``[[1,5], [6,10]]`` (JSON) -> lista de tuplas; 400 si no son válidos"""
     try:
         ranges_list = json.loads(ranges)
         if not isinstance(ranges_list, list):
@@ -496,64 +1282,52 @@ async def split_pdf_by_ranges(file: UploadFile = File(...), ranges: str = Form(.
             status_code=400, 
             detail=f"Formato de rangos inválido: {str(e)}. Usar: [[1,5], [6,10]]"
         )
+    return ranges_tuples
+
+@app.post("/pdf/split/pages")
+async def split_pdf_by_pages(
+    file: UploadFile = File(...),
+    stream: bool = Query(True, description="Generar el ZIP al vuelo sin archivos intermedios"),
+    compress: bool = Query(False, description="Comprimir (ZIP_DEFLATED) en lugar de ZIP_STORED")
+):
+    """📄 Divide PDF en archivos separados por página"""
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Debe ser un archivo PDF")
     
-    unique_id = str(uuid.uuid4())
-    pdf_path = TEMP_DIR / f"split_ranges_{unique_id}.pdf"
+    pdf_path = TEMP_DIR / f"split_{uuid.uuid4()}.pdf"
+    logger.info(f"📄 Dividiendo PDF por páginas: {file.filename}")
     
-    try:
-        logger.info(f"📊 Dividiendo PDF por {len(ranges_tuples)} rangos: {file.filename}")
-        
-        # Guardar archivo temporal
-        with open(pdf_path, "wb") as buffer:
-            content = await file.read()
-            if len(content) == 0:
-                raise HTTPException(status_code=400, detail="El archivo está vacío")
-            buffer.write(content)
-        
-        # Validar PDF
-        if not pdf_tools.validate_pdf_file(str(pdf_path)):
-            raise HTTPException(status_code=400, detail="Archivo PDF corrupto o inválido")
-        
-        # Dividir por rangos
-        filename_prefix = file.filename.replace('.pdf', '').replace(' ', '_')
-        output_files = pdf_tools.split_pdf_by_ranges(str(pdf_path), ranges_tuples, filename_prefix)
-        
-        if not output_files:
-            raise HTTPException(status_code=500, detail="No se pudieron generar archivos")
-        
-        # Crear ZIP
-        zip_name = f"split_ranges_{filename_prefix}_{unique_id[:8]}.zip"
-        zip_path = pdf_tools.create_zip_from_files(output_files, zip_name)
-        
-        logger.info(f"✅ PDF dividido en {len(output_files)} rangos")
-        
-        return FileResponse(
-            path=zip_path,
-            filename=zip_name,
-            media_type="application/zip",
-            background=BackgroundTasks([lambda: cleanup_multiple_files(output_files + [str(pdf_path), zip_path])])
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"❌ Error dividiendo PDF por rangos: {e}")
-        raise HTTPException(status_code=500, detail=f"Error dividiendo PDF: {str(e)}")
-    finally:
-        if os.path.exists(pdf_path):
-            cleanup_file(str(pdf_path))
+    # Guardar archivo temporal
+    await save_upload(file, pdf_path)
+    return await split_response(str(pdf_path), file.filename, None, stream, compress)
+
+@app.post("/pdf/split/ranges")
+async def split_pdf_by_ranges(
+    file: UploadFile = File(...),
+    ranges: str = Form(...),
+    stream: bool = Query(True, description="Generar el ZIP al vuelo sin archivos intermedios"),
+    compress: bool = Query(False, description="Comprimir (ZIP_DEFLATED) en lugar de ZIP_STORED")
+):
+    """📊 Divide PDF por rangos especificados"""
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Debe ser un archivo PDF")
+    
+    # Parsear rangos desde string JSON
+    ranges_tuples = parse_split_ranges(ranges)
+    
+    pdf_path = TEMP_DIR / f"split_ranges_{uuid.uuid4()}.pdf"
+    logger.info(f"📊 Dividiendo PDF por {len(ranges_tuples)} rangos: {file.filename}")
+    
+    # Guardar archivo temporal
+    await save_upload(file, pdf_path)
+    return await split_response(str(pdf_path), file.filename, ranges_tuples, stream, compress)
 
 # ============================================
 # ✂️ EXTRAER PÁGINAS - Extract specific pages
 # ============================================
 
-@app.post("/pdf/extract/pages")
-async def extract_specific_pages(file: UploadFile = File(...), pages: str = Form(...)):
-    """✂️ Extrae páginas específicas en un solo PDF"""
-    if not file.filename.lower().endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Debe ser un archivo PDF")
-    
-    # Parsear páginas desde string JSON
+def parse_page_list(pages: str) -> List[int]:
+    """Páginas ``[1, 3, 5]`` (JSON) -> lista de enteros; 400 si no son válidas"""
     try:
         pages_list = json.loads(pages)
         if not isinstance(pages_list, list):
@@ -575,36 +1349,28 @@ async def extract_specific_pages(file: UploadFile = File(...), pages: str = Form
             status_code=400, 
             detail=f"Formato de páginas inválido: {str(e)}. Usar: [1, 3, 5, 7]"
         )
-    
+    return pages_int
+
+async def extract_response(pdf_path: str, filename: str, pages_int: List[int]) -> ResumableFileResponse:
+    """✂️ Extrae ``pages_int`` de ``pdf_path`` (que se elimina al terminar) en un PDF"""
     unique_id = str(uuid.uuid4())
-    pdf_path = TEMP_DIR / f"extract_{unique_id}.pdf"
     
     try:
-        logger.info(f"✂️ Extrayendo {len(pages_int)} páginas de: {file.filename}")
-        
-        # Guardar archivo temporal
-        with open(pdf_path, "wb") as buffer:
-            content = await file.read()
-            if len(content) == 0:
-                raise HTTPException(status_code=400, detail="El archivo está vacío")
-            buffer.write(content)
-        
-        # Validar PDF
-        if not pdf_tools.validate_pdf_file(str(pdf_path)):
-            raise HTTPException(status_code=400, detail="Archivo PDF corrupto o inválido")
+        logger.info(f"✂️ Extrayendo {len(pages_int)} páginas de: {filename}")
         
         # Extraer páginas
-        filename_base = file.filename.replace('.pdf', '').replace(' ', '_')
+        filename_base = filename.replace('.pdf', '').replace(' ', '_')
         output_filename = f"extracted_{filename_base}_{unique_id[:8]}.pdf"
-        output_path = pdf_tools.extract_specific_pages(str(pdf_path), pages_int, output_filename)
+        output_path = await pdf_engine.run(pdf_tools.extract_specific_pages, pdf_path, pages_int, output_filename)
         
+        PAGES_PROCESSED.inc(len(set(pages_int)), operation="extract")
         logger.info(f"✅ {len(set(pages_int))} páginas extraídas exitosamente")
         
-        return FileResponse(
+        return ResumableFileResponse(
             path=output_path,
-            filename=f"extracted_pages_{file.filename}",
+            filename=f"extracted_pages_{filename}",
             media_type="application/pdf",
-            background=BackgroundTasks([lambda: cleanup_multiple_files([str(pdf_path), output_path])])
+            background=BackgroundTask(cleanup_file, output_path)
         )
         
     except HTTPException:
@@ -613,21 +1379,33 @@ async def extract_specific_pages(file: UploadFile = File(...), pages: str = Form
         logger.error(f"❌ Error extrayendo páginas: {e}")
         raise HTTPException(status_code=500, detail=f"Error extrayendo páginas: {str(e)}")
     finally:
-        if os.path.exists(pdf_path):
-            cleanup_file(str(pdf_path))
+        cleanup_file(pdf_path)
+
+@app.post("/pdf/extract/pages")
+async def extract_specific_pages(file: UploadFile = File(...), pages: str = Form(...)):
+    """✂️ Extrae páginas específicas en un solo PDF"""
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Debe ser un archivo PDF")
+    
+    # Parsear páginas desde string JSON
+    pages_int = parse_page_list(pages)
+    
+    pdf_path = TEMP_DIR / f"extract_{uuid.uuid4()}.pdf"
+    
+    # Guardar archivo temporal
+    await save_upload(file, pdf_path)
+    return await extract_response(str(pdf_path), file.filename, pages_int)
 
 # ============================================
 # 🔗 UNIR PDFs - Merge multiple PDFs
 # ============================================
 
-@app.post("/pdf/merge")
-async def merge_multiple_pdfs(files: List[UploadFile] = File(...)):
-    """🔗 Une múltiples PDFs en uno solo"""
+def validate_merge_files(files: List[UploadFile]):
     if len(files) < 2:
         raise HTTPException(status_code=400, detail="Se requieren al menos 2 archivos PDF")
     
-    if len(files) > 10:
-        raise HTTPException(status_code=400, detail="Máximo 10 archivos PDF permitidos")
+    if len(files) > MERGE_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Máximo {MERGE_MAX_FILES} archivos PDF permitidos")
     
     # Validar que todos sean PDFs
     for file in files:
@@ -636,6 +1414,87 @@ async def merge_multiple_pdfs(files: List[UploadFile] = File(...)):
                 status_code=400, 
                 detail=f"Todos los archivos deben ser PDF. '{file.filename}' no es válido"
             )
+
+def plan_merge_batches(paths: List[str]) -> List[List[int]]:
+    """Agrupa los archivos en tandas de MERGE_STREAM_BATCH_FILES o MERGE_STREAM_BATCH_MB"""
+    batches, current, current_bytes = [], [], 0
+    for i, path in enumerate(paths):
+        size = os.path.getsize(path)
+        if current and (len(current) >= MERGE_STREAM_BATCH_FILES or current_bytes + size > MERGE_STREAM_BATCH_BYTES):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(i)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+async def merge_streaming(paths: List[str], names: List[str], output_path: str, progress=None) -> int:
+    """🔗 Une muchos PDFs por tandas con guardado incremental y un índice por archivo
+
+    Cada tanda es un trabajo del pdf_engine que añade sus archivos al final
+    de ``output_path``; la memoria depende de la tanda, no del total.
+    ``progress(indices, añadidos)`` se llama al terminar cada tanda.
+    Devuelve el total de páginas.
+    """
+    outline = []
+    for batch in plan_merge_batches(paths):
+        added = await pdf_engine.run(
+            pdf_tools.merge_append, output_path, [paths[i] for i in batch], [names[i] for i in batch]
+        )
+        for entry in added:
+            outline.extend(entry.pop('outline'))
+        if progress:
+            progress(batch, added)
+    total_pages = await pdf_engine.run(pdf_tools.finish_merge, output_path, outline)
+    PAGES_PROCESSED.inc(total_pages, operation="merge")
+    return total_pages
+
+async def merge_response(saved_files: List[str], names: List[str]) -> ResumableFileResponse:
+    """🔗 Une ``saved_files`` (que se eliminan al terminar) y responde con el PDF"""
+    unique_id = str(uuid.uuid4())
+    
+    try:
+        # Unir PDFs
+        output_filename = f"merged_document_{len(saved_files)}_files_{unique_id[:8]}.pdf"
+        if len(saved_files) > MERGE_IN_MEMORY_MAX_FILES:
+            merged_path = str(TEMP_DIR / output_filename)
+            try:
+                await merge_streaming(saved_files, names, merged_path)
+            except BaseException:
+                cleanup_file(merged_path)
+                raise
+        else:
+            # Cada PDF se valida al abrirlo dentro de la unión (un solo parseo)
+            merged_path = await pdf_engine.run(pdf_tools.merge_pdfs, saved_files, output_filename, names)
+        
+        logger.info(f"🎉 {len(saved_files)} PDFs unidos exitosamente")
+        
+        return ResumableFileResponse(
+            path=merged_path,
+            filename="merged_document.pdf",
+            media_type="application/pdf",
+            background=BackgroundTask(cleanup_file, merged_path)
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error uniendo PDFs: {e}")
+        raise HTTPException(status_code=500, detail=f"Error uniendo PDFs: {str(e)}")
+    finally:
+        cleanup_multiple_files(saved_files)
+
+@app.post("/pdf/merge")
+async def merge_multiple_pdfs(files: List[UploadFile] = File(...)):
+    """🔗 Une múltiples PDFs en uno solo
+    
+    Con más de MERGE_IN_MEMORY_MAX_FILES archivos la unión se hace en
+    streaming (memoria acotada) y el PDF resultante lleva un marcador por
+    archivo de origen. Para cientos de archivos mejor /jobs/merge, que
+    informa del progreso.
+    """
+    validate_merge_files(files)
     
     saved_files = []
     unique_id = str(uuid.uuid4())
@@ -645,45 +1504,219 @@ async def merge_multiple_pdfs(files: List[UploadFile] = File(...)):
         
         # Guardar todos los archivos temporalmente
         for i, file in enumerate(files):
-            pdf_path = TEMP_DIR / f"merge_{unique_id}_{i:02d}.pdf"
-            
-            with open(pdf_path, "wb") as buffer:
-                content = await file.read()
-                if len(content) == 0:
-                    raise HTTPException(status_code=400, detail=f"Archivo vacío: {file.filename}")
-                buffer.write(content)
-            
-            # Validar cada PDF
-            if not pdf_tools.validate_pdf_file(str(pdf_path)):
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Archivo PDF corrupto o inválido: {file.filename}"
-                )
+            pdf_path = TEMP_DIR / f"merge_{unique_id}_{i:04d}.pdf"
             
+            await save_upload(file, pdf_path)
             saved_files.append(str(pdf_path))
+            
             logger.info(f"✅ Archivo {i+1}/{len(files)} guardado: {file.filename}")
+    except BaseException:
+        cleanup_multiple_files(saved_files)
+        raise
+    
+    return await merge_response(saved_files, [f.filename for f in files])
+
+# ============================================
+# 📁 DOCUMENTOS - Subir una vez y operar por id
+# ============================================
+
+async def get_document_or_404(document_id: str) -> Dict[str, Any]:
+    # get lee el JSON del documento y renueva su mtime: fuera del event loop
+    entry = await asyncio.to_thread(document_store.get, document_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Documento no encontrado o caducado")
+    return entry
+
+async def document_working_copy(entry: Dict[str, Any], prefix: str) -> str:
+    """Hard link del documento en TEMP_DIR para una operación
+
+    Las operaciones eliminan su PDF de entrada al terminar: así el documento
+    sigue intacto y, si caduca a mitad de una operación, ésta no se entera.
+    El enlace comparte el mtime del documento, así que se marca en uso para
+    el janitor.
+    """
+    path = TEMP_DIR / f"{prefix}_{uuid.uuid4()}.pdf"
+    try:
+        # Sin soporte de hard links es una copia completa: en un thread
+        await asyncio.to_thread(link_or_copy, document_store.path(entry['document_id']), str(path))
+        track_in_use(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Documento no encontrado o caducado")
+    return str(path)
+
+@app.post("/documents", status_code=201)
+async def create_document(file: UploadFile = File(...)):
+    """📁 Sube un PDF una sola vez y devuelve su ``document_id``
+    
+    Info, división, extracción, conversión y unión aceptan después ese id
+    (``/documents/{id}/...``, ``/documents/merge``) sin volver a subir ni
+    validar el archivo. La respuesta incluye la info resumida del PDF. El
+    documento se elimina tras DOCUMENT_TTL segundos sin uso.
+    """
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Debe ser un archivo PDF")
+    
+    pdf_path = TEMP_DIR / f"input_{uuid.uuid4()}.pdf"
+    
+    try:
+        upload = await save_upload(file, pdf_path)
         
-        # Unir PDFs
-        output_filename = f"merged_document_{len(files)}_files_{unique_id[:8]}.pdf"
-        merged_path = pdf_tools.merge_pdfs(saved_files, output_filename)
-        
-        logger.info(f"🎉 {len(files)} PDFs unidos exitosamente")
+        # Valida el PDF y deja su info resumida en cache
+        key = pdf_info_key(upload.sha256, "summary", 0, None)
+        info = pdf_info_cache.get(key) or await compute_pdf_info(str(pdf_path), key)
+        scan = await prescan(str(pdf_path), upload.sha256)
         
-        return FileResponse(
-            path=merged_path,
-            filename="merged_document.pdf",
-            media_type="application/pdf",
-            background=BackgroundTasks([lambda: cleanup_multiple_files(saved_files + [merged_path])])
+        entry = await asyncio.to_thread(
+            document_store.create, str(pdf_path), file.filename, upload.size, upload.sha256, info
         )
+        logger.info(f"📁 Documento {entry['document_id']}: {file.filename} ({info['total_pages']} páginas)")
+        return {**entry, "prescan": prescan_report(scan), "status": "success"}
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Error uniendo PDFs: {e}")
-        raise HTTPException(status_code=500, detail=f"Error uniendo PDFs: {str(e)}")
+        logger.error(f"❌ Error registrando documento: {e}")
+        raise HTTPException(status_code=500, detail=f"Error procesando PDF: {str(e)}")
     finally:
-        # Limpiar archivos en caso de error
+        cleanup_file(str(pdf_path))
+
+@app.get("/documents/{document_id}")
+async def get_document(document_id: str):
+    """📁 Datos de un documento subido (renueva su caducidad)"""
+    return {**await get_document_or_404(document_id), "status": "success"}
+
+@app.delete("/documents/{document_id}", status_code=204)
+async def delete_document(document_id: str):
+    """🗑️ Elimina un documento antes de que caduque"""
+    if not await asyncio.to_thread(document_store.delete, document_id):
+        raise HTTPException(status_code=404, detail="Documento no encontrado o caducado")
+    return Response(status_code=204)
+
+@app.get("/documents/{document_id}/info")
+async def get_document_info(
+    document_id: str,
+    response: Response,
+    mode: str = Query("full", pattern="^(full|summary)$"),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1)
+):
+    """📊 Info del documento (misma respuesta y cache que POST /pdf/info)"""
+    entry = await get_document_or_404(document_id)
+    check_pdf_info_limit(limit)
+    
+    key = pdf_info_key(entry['sha256'], mode, offset, limit)
+    info = pdf_info_cache.get(key)
+    scan = pdf_info_cache.get((entry['sha256'], "prescan"))
+    if info is None or scan is None:
+        pdf_path = await document_working_copy(entry, "info")
+        try:
+            if info is None:
+                info = await compute_pdf_info(pdf_path, key)
+            if scan is None:
+                scan = await prescan(pdf_path, entry['sha256'])
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error obteniendo info PDF: {e}")
+            raise HTTPException(status_code=500, detail=f"Error procesando PDF: {str(e)}")
+        finally:
+            cleanup_file(pdf_path)
+    
+    response.headers["ETag"] = pdf_info_etag(key)
+    return {
+        "document_id": document_id,
+        "filename": entry['filename'],
+        "sha256": entry['sha256'],
+        "mode": mode,
+        "info": info,
+        "prescan": prescan_report(scan),
+        "status": "success"
+    }
+
+@app.post("/documents/{document_id}/convert")
+async def convert_document(
+    document_id: str,
+    engine: str = Query("auto", pattern=CONVERSION_ENGINE_PATTERN, description="Motor: auto (según el pre-análisis), pdf2docx o libreoffice"),
+    mode: str = Query("balanced", pattern=CONVERSION_MODE_PATTERN, description="Velocidad/calidad: fast (sólo texto), balanced o full (ver /convert/modes)")
+):
+    """🔄 Convierte a DOCX un documento ya subido"""
+    entry = await get_document_or_404(document_id)
+    pdf_path = await document_working_copy(entry, "input")
+    
+    try:
+        return await convert_response(pdf_path, entry['sha256'], entry['filename'], engine, mode)
+    except HTTPException:
+        cleanup_file(pdf_path)
+        raise
+    except Exception as e:
+        cleanup_file(pdf_path)
+        logger.error(f"❌ Error durante la conversión: {e}")
+        raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
+
+@app.post("/documents/{document_id}/split/pages")
+async def split_document_by_pages(
+    document_id: str,
+    stream: bool = Query(True, description="Generar el ZIP al vuelo sin archivos intermedios"),
+    compress: bool = Query(False, description="Comprimir (ZIP_DEFLATED) en lugar de ZIP_STORED")
+):
+    """📄 Divide un documento ya subido en archivos separados por página"""
+    entry = await get_document_or_404(document_id)
+    logger.info(f"📄 Dividiendo documento por páginas: {entry['filename']}")
+    pdf_path = await document_working_copy(entry, "split")
+    return await split_response(pdf_path, entry['filename'], None, stream, compress)
+
+@app.post("/documents/{document_id}/split/ranges")
+async def split_document_by_ranges(
+    document_id: str,
+    ranges: str = Form(...),
+    stream: bool = Query(True, description="Generar el ZIP al vuelo sin archivos intermedios"),
+    compress: bool = Query(False, description="Comprimir (ZIP_DEFLATED) en lugar de ZIP_STORED")
+):
+    """📊 Divide un documento ya subido por rangos"""
+    ranges_tuples = parse_split_ranges(ranges)
+    entry = await get_document_or_404(document_id)
+    logger.info(f"📊 Dividiendo documento por {len(ranges_tuples)} rangos: {entry['filename']}")
+    pdf_path = await document_working_copy(entry, "split_ranges")
+    return await split_response(pdf_path, entry['filename'], ranges_tuples, stream, compress)
+
+@app.post("/documents/{document_id}/extract/pages")
+async def extract_document_pages(document_id: str, pages: str = Form(...)):
+    """✂️ Extrae páginas de un documento ya subido"""
+    pages_int = parse_page_list(pages)
+    entry = await get_document_or_404(document_id)
+    pdf_path = await document_working_copy(entry, "extract")
+    return await extract_response(pdf_path, entry['filename'], pages_int)
+
+@app.post("/documents/merge")
+async def merge_documents(document_ids: str = Form(..., description='Ids en orden, JSON: ["id1", "id2"]')):
+    """🔗 Une documentos ya subidos, en el orden indicado"""
+    try:
+        ids = json.loads(document_ids)
+        if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+            raise ValueError("Debe ser una lista de ids")
+    except (json.JSONDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Formato de document_ids inválido: {str(e)}")
+    
+    if len(ids) < 2:
+        raise HTTPException(status_code=400, detail="Se requieren al menos 2 documentos")
+    if len(ids) > MERGE_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Máximo {MERGE_MAX_FILES} documentos permitidos")
+    
+    entries = await asyncio.to_thread(lambda: [document_store.get(doc_id) for doc_id in ids])
+    missing = [doc_id for doc_id, entry in zip(ids, entries) if entry is None]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Documentos no encontrados o caducados: {', '.join(missing)}")
+    
+    logger.info(f"🔗 Uniendo {len(entries)} documentos...")
+    saved_files = []
+    try:
+        for entry in entries:
+            saved_files.append(await document_working_copy(entry, "merge"))
+    except BaseException:
         cleanup_multiple_files(saved_files)
+        raise
+    
+    return await merge_response(saved_files, [entry['filename'] for entry in entries])
 
 # ============================================
 # 📈 ESTADÍSTICAS Y UTILIDADES
@@ -701,6 +1734,27 @@ async def get_available_tools():
                 "endpoint": "/convert",
                 "method": "POST"
             },
+            {
+                "name": "convert_async",
+                "title": "PDF a Word (asíncrono)",
+                "description": "Encola la conversión y consulta el estado en /jobs/{job_id}",
+                "endpoint": "/jobs/convert",
+                "method": "POST"
+            },
+            {
+                "name": "convert_batch",
+                "title": "PDF a Word por lotes",
+                "description": "Convierte muchos PDFs (o un ZIP de PDFs) y devuelve un ZIP de DOCX",
+                "endpoint": "/convert/batch",
+                "method": "POST"
+            },
+            {
+                "name": "merge_async",
+                "title": "Unir muchos PDFs (asíncrono)",
+                "description": "Une cientos de PDFs con un marcador por archivo y progreso en /jobs/{job_id}",
+                "endpoint": "/jobs/merge",
+                "method": "POST"
+            },
             {
                 "name": "split_pages",
                 "title": "Dividir PDF por páginas",
@@ -735,9 +1789,16 @@ async def get_available_tools():
                 "description": "Obtiene información detallada del PDF",
                 "endpoint": "/pdf/info",
                 "method": "POST"
+            },
+            {
+                "name": "documents",
+                "title": "Subir una vez",
+                "description": "Sube el PDF una vez y usa su id en /documents/{id}/info, split, extract, convert y /documents/merge",
+                "endpoint": "/documents",
+                "method": "POST"
             }
         ],
-        "total_tools": 6,
+        "total_tools": 10,
         "version": "2.0.0",
         "developer": "César Loreth"
     }
@@ -0,0 +1,257 @@
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Buckets de latencia (segundos): desde peticiones triviales hasta conversiones largas
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    """Contador monótono con etiquetas"""
+
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """Histograma de buckets fijos (acumulados al exponer, no al observar)"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [conteo por bucket (+Inf al final), suma, total]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        lines = self.header()
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Métrica cuyo valor se lee al exponer: ``collect()`` -> [(etiquetas, valor)]
+
+    Sirve para publicar contadores y estados que ya llevan otros componentes
+    (engines, caches, colas) sin duplicarlos.
+    """
+
+    def __init__(self, name, documentation, labelnames, collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+                 type_name: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+        self.type_name = type_name
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, self._key(labels))} {_format_value(value)}"
+            for labels, value in self.collect()
+        ]
+
+
+class Registry:
+    """📊 Conjunto de métricas expuestas en formato de texto de Prometheus"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, labelnames, collect) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, labelnames, collect))
+
+    def counter_callback(self, name, documentation, labelnames, collect) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, labelnames, collect, "counter"))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class RequestMetrics:
+    """Fases medidas de la petición en curso (upload/validate/process/respond)"""
+
+    __slots__ = ("phases",)
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+current_request: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar(
+    "current_request_metrics", default=None
+)
+
+
+def record_phase(phase: str, seconds: float):
+    """Suma ``seconds`` a la fase ``phase`` de la petición actual (si la hay)"""
+    request = current_request.get()
+    if request is not None:
+        request.add(phase, seconds)
+
+
+@contextmanager
+def request_phase(phase: str):
+    """Suma la duración del bloque a la fase ``phase`` de la petición actual"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - start)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: peticiones, latencia por fase y bytes por endpoint
+
+    El endpoint se etiqueta con el nombre de la función que lo atiende
+    (``convert_pdf``, ``split_pdf_by_pages``...), así las rutas con
+    parámetros no multiplican las series. ``upload`` incluye la recepción
+    del cuerpo y ``respond`` el envío de la respuesta (incluido el
+    streaming de archivos).
+    """
+
+    def __init__(self, app, requests_total: Counter, duration: Histogram, phases: Histogram,
+                 bytes_in: Counter, bytes_out: Counter, skip_paths: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.requests_total = requests_total
+        self.duration = duration
+        self.phases = phases
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestMetrics()
+        token = current_request.set(request)
+        start = time.perf_counter()
+        received = 0
+        sent = 0
+        status = 500
+        respond_start = None
+
+        async def receive_wrapper():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    request.add("upload", time.perf_counter() - start)
+            return message
+
+        async def send_wrapper(message):
+            nonlocal sent, status, respond_start
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                respond_start = time.perf_counter()
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            current_request.reset(token)
+            end = time.perf_counter()
+            endpoint = scope.get("endpoint")
+            name = getattr(endpoint, "__name__", "not_found")
+            if respond_start is not None:
+                request.add("respond", end - respond_start)
+
+            self.requests_total.inc(endpoint=name, method=scope["method"], status=str(status))
+            self.duration.observe(end - start, endpoint=name)
+            for phase, seconds in request.phases.items():
+                self.phases.observe(seconds, endpoint=name, phase=phase)
+            if received:
+                self.bytes_in.inc(received, endpoint=name)
+            if sent:
+                self.bytes_out.inc(sent, endpoint=name)
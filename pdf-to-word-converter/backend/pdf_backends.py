@@ -0,0 +1,284 @@
+import os
+import re
+import logging
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DictionaryObject, NameObject
+
+logger = logging.getLogger(__name__)
+
+# Campos de metadata comunes a todos los backends
+METADATA_FIELDS = ('title', 'author', 'subject', 'creator', 'producer', 'creation_date')
+
+Destination = Union[str, BinaryIO]
+
+# Categorías de /Resources que el contenido referencia por nombre
+RESOURCE_CATEGORIES = ('/XObject', '/Font', '/ExtGState', '/Pattern', '/Shading', '/ColorSpace', '/Properties')
+_NAME_TOKEN = re.compile(rb"/([^\s/\[\]<>(){}%]+)")
+# Por debajo de esta cantidad de recursos no compensa analizar el contenido
+PRUNE_MIN_RESOURCES = 16
+
+
+def _used_resources(page) -> Optional[DictionaryObject]:
+    """/Resources de la página reducido a lo que usa su contenido
+
+    Muchos PDF escaneados cuelgan un único diccionario de recursos con todas
+    las imágenes del árbol de páginas; copiarlo tal cual mete el documento
+    entero en cada página separada. Devuelve None si no hace falta o no se
+    puede podar con seguridad (se copia entonces completo).
+    """
+    resources = page.get('/Resources')
+    if resources is None:
+        return None
+    resources = resources.get_object()
+    named = 0
+    for category in RESOURCE_CATEGORIES:
+        entries = resources.get(category)
+        entries = entries.get_object() if entries is not None else None
+        if isinstance(entries, DictionaryObject):
+            named += len(entries)
+    if named <= PRUNE_MIN_RESOURCES:
+        return None
+    try:
+        contents = page.get_contents()
+        used = set(_NAME_TOKEN.findall(contents.get_data())) if contents is not None else set()
+    except Exception:
+        return None
+
+    pruned = DictionaryObject()
+    for category, value in resources.items():
+        entries = value.get_object()
+        if category not in RESOURCE_CATEGORIES or not isinstance(entries, DictionaryObject):
+            pruned[category] = value
+            continue
+        kept = DictionaryObject()
+        for name, ref in entries.items():
+            raw = name[1:]
+            # Nombres con escapes (#xx) o no ASCII: no se comparan, se conservan
+            if not raw.isascii() or '#' in raw or raw.encode() in used:
+                if category == '/XObject' and '/Resources' not in ref.get_object() \
+                        and ref.get_object().get('/Subtype') == '/Form':
+                    # Form antiguo que hereda los recursos de la página
+                    return None
+                kept[name] = ref
+        pruned[category] = kept
+    return pruned
+
+
+class PypdfBackend:
+    """📚 Backend basado en pypdf (Python puro, sin dependencias nativas)"""
+
+    name = "pypdf"
+
+    def open(self, pdf_path: str) -> Tuple[PdfReader, int]:
+        reader = PdfReader(pdf_path)
+        total_pages = len(reader.pages)
+        if total_pages == 0:
+            raise ValueError("El PDF no tiene páginas")
+        # Intentar leer al menos la primera página
+        _ = reader.pages[0]
+        return reader, total_pages
+
+    def close(self, handle: PdfReader) -> None:
+        pass
+
+    def summary(self, pdf_path: str) -> Tuple[int, Dict[str, Optional[str]]]:
+        """Páginas y metadata leyendo sólo el trailer y la raíz del árbol de páginas
+
+        ``len(reader.pages)`` recorre el árbol completo; /Count de la raíz no.
+        """
+        reader = PdfReader(pdf_path)
+        total_pages = int(reader.trailer['/Root'].get_object()['/Pages'].get_object()['/Count'])
+        if total_pages <= 0:
+            raise ValueError("El PDF no tiene páginas")
+        return total_pages, self.metadata(reader)
+
+    def metadata(self, handle: PdfReader) -> Dict[str, Optional[str]]:
+        raw = handle.metadata or {}
+        keys = {
+            'title': '/Title', 'author': '/Author', 'subject': '/Subject',
+            'creator': '/Creator', 'producer': '/Producer', 'creation_date': '/CreationDate'
+        }
+        return {field: (str(raw[key]) if raw.get(key) else None) for field, key in keys.items()}
+
+    def page_info(self, handle: PdfReader, index: int) -> Dict[str, float]:
+        page = handle.pages[index]
+        return {
+            'width': float(page.mediabox.width) if page.mediabox else 0,
+            'height': float(page.mediabox.height) if page.mediabox else 0,
+            'rotation': page.rotation if hasattr(page, 'rotation') else 0
+        }
+
+    def new_writer(self) -> PdfWriter:
+        return PdfWriter()
+
+    def append_pages(self, writer: PdfWriter, handle: PdfReader, page_indexes: List[int]) -> None:
+        # Los objetos compartidos se clonan una sola vez por writer; si sólo se
+        # copia parte del documento, cada página se lleva únicamente sus recursos
+        prune = len(page_indexes) < len(handle.pages)
+        for index in page_indexes:
+            page = handle.pages[index]
+            resources = _used_resources(page) if prune else None
+            if resources is None:
+                writer.add_page(page)
+                continue
+            new_page = writer.add_page(page, excluded_keys=('/Resources',))
+            new_page[NameObject('/Resources')] = resources.clone(writer)
+
+    def save(self, writer: PdfWriter, dest: Destination) -> None:
+        if isinstance(dest, (str, os.PathLike)):
+            with open(dest, 'wb') as output_file:
+                writer.write(output_file)
+        else:
+            writer.write(dest)
+
+
+class PyMuPDFBackend:
+    """⚡ Backend basado en PyMuPDF (MuPDF nativo, mucho más rápido en split/merge)
+
+    PyMuPDF no admite usarse desde varios threads a la vez: con este backend
+    el pdf_engine debe ser de procesos (PDF_TOOLS_ENGINE=process).
+    """
+
+    name = "pymupdf"
+
+    def __init__(self):
+        import fitz
+        self._fitz = fitz
+
+    def __getstate__(self):
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def open(self, pdf_path: str):
+        doc = self._fitz.open(pdf_path)
+        if doc.page_count == 0:
+            doc.close()
+            raise ValueError("El PDF no tiene páginas")
+        # Intentar leer al menos la primera página
+        doc.load_page(0)
+        return doc, doc.page_count
+
+    def close(self, handle) -> None:
+        handle.close()
+
+    def summary(self, pdf_path: str) -> Tuple[int, Dict[str, Optional[str]]]:
+        """Páginas y metadata sin cargar ninguna página (MuPDF lee /Count de la raíz)"""
+        with self._fitz.open(pdf_path) as doc:
+            if doc.page_count == 0:
+                raise ValueError("El PDF no tiene páginas")
+            return doc.page_count, self.metadata(doc)
+
+    def metadata(self, handle) -> Dict[str, Optional[str]]:
+        raw = handle.metadata or {}
+        keys = {
+            'title': 'title', 'author': 'author', 'subject': 'subject',
+            'creator': 'creator', 'producer': 'producer', 'creation_date': 'creationDate'
+        }
+        return {field: (raw.get(key) or None) for field, key in keys.items()}
+
+    def page_info(self, handle, index: int) -> Dict[str, float]:
+        page = handle.load_page(index)
+        return {
+            'width': float(page.mediabox.width),
+            'height': float(page.mediabox.height),
+            'rotation': page.rotation
+        }
+
+    def new_writer(self):
+        return self._fitz.open()
+
+    def append_pages(self, writer, handle, page_indexes: List[int]) -> None:
+        # insert_pdf copia rangos contiguos de una vez
+        runs = []
+        for index in page_indexes:
+            if runs and index == runs[-1][1] + 1:
+                runs[-1][1] = index
+            else:
+                runs.append([index, index])
+        first_new = writer.page_count
+        for start, end in runs:
+            writer.insert_pdf(handle, from_page=start, to_page=end)
+        if len(page_indexes) < handle.page_count:
+            # Quita de /Resources lo que la página no usa (save con garbage
+            # descarta después los objetos que quedan huérfanos)
+            for number in range(first_new, writer.page_count):
+                page = writer[number]
+                if self._resource_count(writer, page.xref) > PRUNE_MIN_RESOURCES:
+                    page.clean_contents()
+
+    def _resource_count(self, doc, page_xref: int) -> int:
+        """Número aproximado de entradas con nombre en /Resources de la página"""
+        count = 0
+        for category in RESOURCE_CATEGORIES:
+            kind, value = doc.xref_get_key(page_xref, f"Resources{category}")
+            if kind == 'xref':
+                count += len(doc.xref_get_keys(int(value.split()[0])))
+            elif kind == 'dict':
+                count += value.count(' R')
+        return count
+
+    def save(self, writer, dest: Destination) -> None:
+        try:
+            writer.save(dest, garbage=1, deflate=True)
+        finally:
+            writer.close()
+
+
+class IncrementalAppender:
+    """📎 Añade PDFs al final de un archivo con guardado incremental (PyMuPDF)
+
+    Cada tanda abre el PDF de salida (carga perezosa: no lee las páginas ya
+    escritas), inserta los documentos nuevos y guarda sólo lo añadido, así
+    la memoria depende de la tanda y no del tamaño total de la unión.
+    Se usa PyMuPDF sea cual sea PDF_BACKEND: pypdf 4.x no sabe escribir
+    actualizaciones incrementales.
+    """
+
+    def __init__(self, output_path: str):
+        import fitz
+        self._fitz = fitz
+        self.output_path = output_path
+        self._exists = os.path.exists(output_path)
+        self._doc = fitz.open(output_path) if self._exists else fitz.open()
+
+    @property
+    def page_count(self) -> int:
+        return self._doc.page_count
+
+    def append(self, pdf_path: str) -> Tuple[int, List[list]]:
+        """Inserta ``pdf_path``; devuelve (páginas, marcadores del origen [nivel, título, página])"""
+        with self._fitz.open(pdf_path) as src:
+            if src.page_count == 0:
+                raise ValueError("El PDF no tiene páginas")
+            self._doc.insert_pdf(src)
+            return src.page_count, src.get_toc(simple=True)
+
+    def set_outline(self, toc: List[list]) -> None:
+        self._doc.set_toc(toc)
+
+    def commit(self) -> None:
+        if self._exists:
+            self._doc.saveIncr()
+        else:
+            self._doc.save(self.output_path, garbage=1, deflate=True)
+            self._exists = True
+
+    def close(self) -> None:
+        self._doc.close()
+
+
+PDF_BACKENDS = {
+    PypdfBackend.name: PypdfBackend,
+    PyMuPDFBackend.name: PyMuPDFBackend,
+}
+
+
+def get_pdf_backend(name: str = None):
+    """Instancia el backend indicado (por defecto PDF_BACKEND o pypdf)"""
+    name = (name or os.getenv("PDF_BACKEND", PypdfBackend.name)).lower()
+    if name not in PDF_BACKENDS:
+        raise ValueError(f"Backend PDF desconocido: {name}. Opciones: {', '.join(PDF_BACKENDS)}")
+    return PDF_BACKENDS[name]()
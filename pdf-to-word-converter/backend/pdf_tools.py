@@ -1,192 +1,345 @@
+import io
 import os
+import time
 import uuid
 import zipfile
 import logging
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
-from typing import List, Tuple, Dict, Any
-from pypdf import PdfReader, PdfWriter
+from typing import List, Tuple, Dict, Any, Iterator, Optional, Union
 from fastapi import HTTPException
+from pdf_backends import get_pdf_backend, IncrementalAppender
+from tracing import span
 
 logger = logging.getLogger(__name__)
 
+class PDFDocument:
+    """📄 PDF abierto y validado una sola vez, reutilizable entre operaciones
+    
+    ``handle`` es el objeto del backend (PdfReader de pypdf o Document de PyMuPDF).
+    """
+    
+    def __init__(self, path: str, handle: Any, total_pages: int):
+        self.path = path
+        self.handle = handle
+        self.total_pages = total_pages
+        self.file_size = os.path.getsize(path)
+        self.opened_at = time.time()
+        # Operaciones usándolo ahora mismo; al expulsarlo de la cache se
+        # cierra cuando termina la última
+        self.users = 0
+        self.evicted = False
+
+PDFSource = Union[str, PDFDocument]
+
+# Manager de cada proceso (ver PDFToolsManager.__reduce__)
+_process_managers: Dict[tuple, "PDFToolsManager"] = {}
+
+def _process_manager(temp_dir: str, backend: str, document_cache_size: int,
+                     document_cache_ttl: float) -> "PDFToolsManager":
+    """Manager único por proceso: en los workers la cache de lectores sobrevive entre trabajos"""
+    key = (temp_dir, backend, document_cache_size, document_cache_ttl)
+    manager = _process_managers.get(key)
+    if manager is None:
+        manager = PDFToolsManager(Path(temp_dir), backend, document_cache_size, document_cache_ttl)
+        _process_managers[key] = manager
+    return manager
+
+def batch_split_parts(parts, max_pages: int):
+    """Agrupa partes consecutivas en lotes de ~max_pages páginas"""
+    batch, pages = [], 0
+    for part in parts:
+        batch.append(part)
+        pages += len(part[1])
+        if pages >= max_pages:
+            yield batch
+            batch, pages = [], 0
+    if batch:
+        yield batch
+
 class PDFToolsManager:
     """🎯 Manager completo para todas las operaciones PDF"""
     
-    def __init__(self, temp_dir: Path):
+    def __init__(self, temp_dir: Path, backend: str = None, document_cache_size: int = 4,
+                 document_cache_ttl: float = 30.0):
         self.temp_dir = temp_dir
         self.temp_dir.mkdir(exist_ok=True)
-        logger.info(f"PDF Tools Manager inicializado en: {temp_dir}")
+        # pypdf o pymupdf (variable PDF_BACKEND si no se indica)
+        self.backend = get_pdf_backend(backend)
+        self.document_cache_size = document_cache_size
+        self.document_cache_ttl = document_cache_ttl
+        self._documents = OrderedDict()
+        self._documents_lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+        logger.info(f"PDF Tools Manager inicializado en: {temp_dir} (backend: {self.backend.name})")
     
-    def get_pdf_info(self, pdf_path: str) -> Dict[str, Any]:
-        """📊 Obtiene información completa del PDF"""
+    def __reduce__(self):
+        # Cada trabajo del pdf_engine serializa el manager; al deserializarlo
+        # en el worker se reutiliza el de ese proceso, con su cache de lectores
+        return (_process_manager, (str(self.temp_dir), self.backend.name,
+                                   self.document_cache_size, self.document_cache_ttl))
+    
+    def _close(self, doc: PDFDocument) -> None:
         try:
-            reader = PdfReader(pdf_path)
-            file_size = os.path.getsize(pdf_path)
-            
-            # Información básica
-            info = {
-                'total_pages': len(reader.pages),
-                'file_size': file_size,
-                'file_size_mb': round(file_size / 1024 / 1024, 2),
-                'pages_info': []
-            }
-            
-            # Metadata del PDF
-            if reader.metadata:
-                info.update({
-                    'title': reader.metadata.get('/Title', 'Sin título'),
-                    'author': reader.metadata.get('/Author', 'Sin autor'),
-                    'subject': reader.metadata.get('/Subject', ''),
-                    'creator': reader.metadata.get('/Creator', ''),
-                    'producer': reader.metadata.get('/Producer', ''),
-                    'creation_date': str(reader.metadata.get('/CreationDate', ''))
-                })
-            else:
-                info.update({
-                    'title': 'Sin título',
-                    'author': 'Sin autor',
-                    'subject': '',
-                    'creator': '',
-                    'producer': '',
-                    'creation_date': ''
-                })
-            
-            # Información de cada página
-            for i, page in enumerate(reader.pages):
-                try:
-                    page_info = {
-                        'page_number': i + 1,
-                        'width': float(page.mediabox.width) if page.mediabox else 0,
-                        'height': float(page.mediabox.height) if page.mediabox else 0,
-                        'rotation': page.rotation if hasattr(page, 'rotation') else 0
-                    }
-                    info['pages_info'].append(page_info)
-                except Exception as e:
-                    logger.warning(f"Error obteniendo info de página {i+1}: {e}")
-                    info['pages_info'].append({
-                        'page_number': i + 1,
-                        'width': 0,
-                        'height': 0,
-                        'rotation': 0
-                    })
-            
-            logger.info(f"Información PDF obtenida: {info['total_pages']} páginas, {info['file_size_mb']} MB")
-            return info
+            self.backend.close(doc.handle)
+        except Exception as e:
+            logger.warning(f"No se pudo cerrar {doc.path}: {e}")
+    
+    def _discard(self, doc: PDFDocument) -> None:
+        """Saca ``doc`` de la cache (con el lock tomado); se cierra si nadie lo usa"""
+        doc.evicted = True
+        if doc.users == 0:
+            self._close(doc)
+    
+    def _purge_expired(self) -> None:
+        """Cierra los lectores caducados (con el lock tomado)"""
+        now = time.time()
+        for old_key in [k for k, d in self._documents.items() if now - d.opened_at > self.document_cache_ttl]:
+            self._discard(self._documents.pop(old_key))
+    
+    def _sweep(self) -> None:
+        # En los workers nadie llama a release_document (la limpieza de los
+        # archivos va por el proceso principal): sin este barrido un worker
+        # ocioso mantendría abiertos sus lectores, y con PyMuPDF el espacio
+        # de los temporales ya borrados no se liberaría
+        while True:
+            time.sleep(self.document_cache_ttl)
+            with self._documents_lock:
+                self._purge_expired()
+                if not self._documents:
+                    self._sweeper = None
+                    return
+    
+    def _ensure_sweeper(self) -> None:
+        """Arranca el barrido de caducados si no está en marcha (con el lock tomado)"""
+        if self._sweeper is None:
+            self._sweeper = threading.Thread(target=self._sweep, name="pdf-reader-sweeper", daemon=True)
+            self._sweeper.start()
+    
+    def _open(self, pdf_path: str, claim: bool) -> PDFDocument:
+        stat = os.stat(pdf_path)
+        key = (os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns)
+        
+        with self._documents_lock:
+            self._purge_expired()
+            doc = self._documents.get(key)
+            if doc:
+                self._documents.move_to_end(key)
+                doc.users += claim
+                return doc
+        
+        try:
+            with span("pdf.open", backend=self.backend.name):
+                handle, total_pages = self.backend.open(pdf_path)
+        except Exception as e:
+            logger.error(f"❌ Archivo PDF inválido: {e}")
+            raise HTTPException(status_code=400, detail="Archivo PDF corrupto o inválido")
+        
+        doc = PDFDocument(pdf_path, handle, total_pages)
+        doc.users += claim
+        with self._documents_lock:
+            previous = self._documents.pop(key, None)
+            if previous:
+                self._discard(previous)
+            self._documents[key] = doc
+            while len(self._documents) > self.document_cache_size:
+                self._discard(self._documents.popitem(last=False)[1])
+            self._ensure_sweeper()
+        return doc
+    
+    def open_document(self, pdf_path: str) -> PDFDocument:
+        """🔍 Abre y valida el PDF una sola vez; reutiliza el lector si sigue vigente
+        
+        La cache es pequeña y de TTL corto: basta para que validar y operar
+        sobre el mismo archivo no lo parseen dos veces. Los lectores
+        expulsados o caducados se cierran (PyMuPDF mantiene abierto el
+        descriptor del archivo); un thread los barre aunque el proceso
+        no reciba más trabajos.
+        """
+        return self._open(pdf_path, claim=False)
+    
+    def release_document(self, pdf_path: str) -> None:
+        """Olvida (y cierra) los lectores abiertos de ``pdf_path``"""
+        path = os.path.abspath(pdf_path)
+        with self._documents_lock:
+            for key in [k for k in self._documents if k[0] == path]:
+                self._discard(self._documents.pop(key))
+    
+    @contextmanager
+    def _using(self, source: PDFSource) -> Iterator[PDFDocument]:
+        """Documento de ``source`` que no se cierra mientras dura el bloque"""
+        if isinstance(source, PDFDocument):
+            yield source
+            return
+        doc = self._open(source, claim=True)
+        try:
+            yield doc
+        finally:
+            with self._documents_lock:
+                doc.users -= 1
+                if doc.evicted and doc.users == 0:
+                    self._close(doc)
+    
+    def _write_pages(self, doc: PDFDocument, page_indexes: List[int], dest) -> None:
+        """Escribe en ``dest`` (ruta o stream) un PDF con las páginas indicadas (0-based)"""
+        writer = self.backend.new_writer()
+        with span("pdf.append_pages", pages=len(page_indexes)):
+            self.backend.append_pages(writer, doc.handle, page_indexes)
+        with span("pdf.save"):
+            self.backend.save(writer, dest)
+    
+    def _info_header(self, total_pages: int, file_size: int, metadata: Dict[str, Optional[str]]) -> Dict[str, Any]:
+        return {
+            'total_pages': total_pages,
+            'file_size': file_size,
+            'file_size_mb': round(file_size / 1024 / 1024, 2),
+            'title': metadata['title'] or 'Sin título',
+            'author': metadata['author'] or 'Sin autor',
+            'subject': metadata['subject'] or '',
+            'creator': metadata['creator'] or '',
+            'producer': metadata['producer'] or '',
+            'creation_date': metadata['creation_date'] or ''
+        }
+    
+    def get_pdf_summary(self, pdf_path: str) -> Dict[str, Any]:
+        """⚡ Páginas, metadata y tamaño sin recorrer el árbol de páginas"""
+        try:
+            with span("pdf.summary", backend=self.backend.name):
+                total_pages, metadata = self.backend.summary(pdf_path)
+        except Exception as e:
+            logger.error(f"❌ Archivo PDF inválido: {e}")
+            raise HTTPException(status_code=400, detail="Archivo PDF corrupto o inválido")
+        
+        info = self._info_header(total_pages, os.path.getsize(pdf_path), metadata)
+        logger.info(f"Resumen PDF obtenido: {total_pages} páginas, {info['file_size_mb']} MB")
+        return info
+    
+    def get_pdf_info(self, source: PDFSource, offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+        """📊 Obtiene información completa del PDF
+        
+        ``pages_info`` incluye las páginas [offset, offset + limit); sin
+        ``limit``, todas desde ``offset``.
+        """
+        try:
+            with self._using(source) as doc:
+            
+                # Metadata del PDF
+                with span("pdf.metadata"):
+                    metadata = self.backend.metadata(doc.handle)
+                info = self._info_header(doc.total_pages, doc.file_size, metadata)
+                info['pages_info'] = []
+            
+                start = min(offset, doc.total_pages)
+                end = doc.total_pages if limit is None else min(doc.total_pages, start + limit)
+            
+                # Información de cada página (redondeada: los backends difieren en precisión)
+                with span("pdf.pages_info", pages=end - start):
+                    for i in range(start, end):
+                        try:
+                            page = self.backend.page_info(doc.handle, i)
+                            page_info = {
+                                'page_number': i + 1,
+                                'width': round(page['width'], 2),
+                                'height': round(page['height'], 2),
+                                'rotation': page['rotation']
+                            }
+                            info['pages_info'].append(page_info)
+                        except Exception as e:
+                            logger.warning(f"Error obteniendo info de página {i+1}: {e}")
+                            info['pages_info'].append({
+                                'page_number': i + 1,
+                                'width': 0,
+                                'height': 0,
+                                'rotation': 0
+                            })
+            
+                info['pagination'] = {
+                    'offset': start,
+                    'limit': limit,
+                    'returned': end - start,
+                    'next_offset': end if end < doc.total_pages else None
+                }
+            
+                logger.info(f"Información PDF obtenida: {info['total_pages']} páginas, {info['file_size_mb']} MB")
+                return info
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error obteniendo información del PDF: {e}")
             raise HTTPException(status_code=500, detail=f"Error leyendo PDF: {str(e)}")
     
-    def split_pdf_by_pages(self, pdf_path: str, filename_prefix: str = "page") -> List[str]:
+    def split_pdf_by_pages(self, source: PDFSource, filename_prefix: str = "page") -> List[str]:
         """📄 Divide PDF en archivos individuales por página"""
-        try:
-            reader = PdfReader(pdf_path)
-            output_files = []
-            total_pages = len(reader.pages)
-            
-            logger.info(f"Dividiendo PDF en {total_pages} páginas individuales...")
-            
-            for page_num in range(total_pages):
-                writer = PdfWriter()
-                writer.add_page(reader.pages[page_num])
-                
-                # Nombre del archivo con número de página formateado
-                page_str = str(page_num + 1).zfill(len(str(total_pages)))
-                output_filename = f"{filename_prefix}_{page_str}_{uuid.uuid4().hex[:8]}.pdf"
-                output_path = self.temp_dir / output_filename
-                
-                with open(output_path, 'wb') as output_file:
-                    writer.write(output_file)
-                
-                output_files.append(str(output_path))
-                logger.info(f"✅ Página {page_num + 1}/{total_pages} extraída: {output_filename}")
-            
-            logger.info(f"🎉 PDF dividido exitosamente en {len(output_files)} archivos")
-            return output_files
-            
-        except Exception as e:
-            logger.error(f"❌ Error dividiendo PDF: {e}")
-            raise HTTPException(status_code=500, detail=f"Error dividiendo PDF: {str(e)}")
+        with self._using(source) as doc:
+            logger.info(f"Dividiendo PDF en {doc.total_pages} páginas individuales...")
+            parts = self.plan_split_parts(doc.total_pages, filename_prefix)
+            return self._write_part_files(doc, parts, "Error dividiendo PDF")
     
-    def split_pdf_by_ranges(self, pdf_path: str, ranges: List[Tuple[int, int]], filename_prefix: str = "range") -> List[str]:
+    def split_pdf_by_ranges(self, source: PDFSource, ranges: List[Tuple[int, int]], filename_prefix: str = "range") -> List[str]:
         """📊 Divide PDF por rangos especificados"""
+        with self._using(source) as doc:
+            logger.info(f"Dividiendo PDF por {len(ranges)} rangos...")
+            parts = self.plan_split_parts(doc.total_pages, filename_prefix, ranges)
+            return self._write_part_files(doc, parts, "Error procesando rangos")
+    
+    def _write_part_files(self, doc: PDFDocument, parts: List[Tuple[str, List[int]]], error_detail: str) -> List[str]:
+        """Escribe cada parte en temp_dir a medida que se genera"""
         try:
-            reader = PdfReader(pdf_path)
             output_files = []
-            total_pages = len(reader.pages)
-            
-            logger.info(f"Dividiendo PDF por {len(ranges)} rangos...")
+            total_bytes = 0
             
-            for i, (start, end) in enumerate(ranges):
-                # Validar rangos
-                if start < 1 or end > total_pages or start > end:
-                    raise HTTPException(
-                        status_code=400, 
-                        detail=f"Rango inválido: {start}-{end}. PDF tiene {total_pages} páginas (1-{total_pages})"
-                    )
-                
-                writer = PdfWriter()
-                
-                # Agregar páginas al rango (convertir a índice 0-based)
-                for page_num in range(start - 1, end):
-                    writer.add_page(reader.pages[page_num])
-                
-                # Nombre del archivo
-                output_filename = f"{filename_prefix}_{start}-{end}_{uuid.uuid4().hex[:8]}.pdf"
-                output_path = self.temp_dir / output_filename
-                
+            for name, data in self.iter_parts(doc, parts):
+                output_path = self.temp_dir / f"{Path(name).stem}_{uuid.uuid4().hex[:8]}.pdf"
                 with open(output_path, 'wb') as output_file:
-                    writer.write(output_file)
-                
+                    output_file.write(data)
                 output_files.append(str(output_path))
-                logger.info(f"✅ Rango {start}-{end} extraído: {output_filename}")
+                total_bytes += len(data)
             
-            logger.info(f"🎉 PDF dividido exitosamente en {len(output_files)} rangos")
+            logger.info(f"🎉 PDF dividido exitosamente en {len(output_files)} archivos ({total_bytes / 1024 / 1024:.2f} MB)")
             return output_files
             
         except HTTPException:
             raise
         except Exception as e:
-            logger.error(f"❌ Error dividiendo PDF por rangos: {e}")
-            raise HTTPException(status_code=500, detail=f"Error procesando rangos: {str(e)}")
+            logger.error(f"❌ {error_detail}: {e}")
+            raise HTTPException(status_code=500, detail=f"{error_detail}: {str(e)}")
     
-    def extract_specific_pages(self, pdf_path: str, pages: List[int], output_filename: str = None) -> str:
+    def extract_specific_pages(self, source: PDFSource, pages: List[int], output_filename: str = None) -> str:
         """✂️ Extrae páginas específicas en un solo PDF"""
         try:
-            reader = PdfReader(pdf_path)
-            writer = PdfWriter()
-            total_pages = len(reader.pages)
+            with self._using(source) as doc:
+                total_pages = doc.total_pages
             
-            # Validar páginas
-            invalid_pages = [p for p in pages if p < 1 or p > total_pages]
-            if invalid_pages:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Páginas inválidas: {invalid_pages}. PDF tiene {total_pages} páginas (1-{total_pages})"
-                )
+                # Validar páginas
+                invalid_pages = [p for p in pages if p < 1 or p > total_pages]
+                if invalid_pages:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Páginas inválidas: {invalid_pages}. PDF tiene {total_pages} páginas (1-{total_pages})"
+                    )
             
-            logger.info(f"Extrayendo {len(pages)} páginas específicas: {sorted(pages)}")
+                logger.info(f"Extrayendo {len(pages)} páginas específicas...")
             
-            # Agregar páginas seleccionadas (eliminar duplicados y ordenar)
-            unique_pages = sorted(set(pages))
-            for page_num in unique_pages:
-                writer.add_page(reader.pages[page_num - 1])  # Convertir a índice 0-based
-                logger.info(f"✅ Página {page_num} agregada")
+                # Páginas seleccionadas (eliminar duplicados y ordenar)
+                unique_pages = sorted(set(pages))
             
-            # Crear archivo de salida
-            if not output_filename:
-                pages_str = "_".join(map(str, unique_pages[:5]))  # Primeras 5 páginas en el nombre
-                if len(unique_pages) > 5:
-                    pages_str += f"_and_{len(unique_pages)-5}_more"
-                output_filename = f"extracted_pages_{pages_str}_{uuid.uuid4().hex[:8]}.pdf"
+                # Crear archivo de salida
+                if not output_filename:
+                    pages_str = "_".join(map(str, unique_pages[:5]))  # Primeras 5 páginas en el nombre
+                    if len(unique_pages) > 5:
+                        pages_str += f"_and_{len(unique_pages)-5}_more"
+                    output_filename = f"extracted_pages_{pages_str}_{uuid.uuid4().hex[:8]}.pdf"
             
-            output_path = self.temp_dir / output_filename
+                output_path = self.temp_dir / output_filename
             
-            with open(output_path, 'wb') as output_file:
-                writer.write(output_file)
+                # Convertir a índices 0-based
+                self._write_pages(doc, [page_num - 1 for page_num in unique_pages], str(output_path))
             
-            logger.info(f"🎉 {len(unique_pages)} páginas extraídas exitosamente: {output_filename}")
-            return str(output_path)
+                logger.info(f"🎉 {len(unique_pages)} páginas extraídas exitosamente: {output_filename}")
+                return str(output_path)
             
         except HTTPException:
             raise
@@ -194,43 +347,54 @@ class PDFToolsManager:
             logger.error(f"❌ Error extrayendo páginas: {e}")
             raise HTTPException(status_code=500, detail=f"Error extrayendo páginas: {str(e)}")
     
-    def merge_pdfs(self, pdf_paths: List[str], output_filename: str = None) -> str:
-        """🔗 Une múltiples PDFs en uno solo"""
+    def merge_pdfs(self, pdf_paths: List[PDFSource], output_filename: str = None, display_names: List[str] = None) -> str:
+        """🔗 Une múltiples PDFs en uno solo
+        
+        ``display_names`` (opcional) son los nombres originales para los mensajes de error.
+        """
         try:
-            writer = PdfWriter()
-            total_pages = 0
-            
-            logger.info(f"Uniendo {len(pdf_paths)} archivos PDF...")
-            
-            for i, pdf_path in enumerate(pdf_paths):
-                if not os.path.exists(pdf_path):
-                    raise HTTPException(status_code=404, detail=f"Archivo no encontrado: {os.path.basename(pdf_path)}")
+            # Los documentos siguen en uso hasta guardar: el writer puede referenciarlos
+            with ExitStack() as stack:
+                writer = self.backend.new_writer()
+                total_pages = 0
+            
+                logger.info(f"Uniendo {len(pdf_paths)} archivos PDF...")
+            
+                for i, source in enumerate(pdf_paths):
+                    pdf_path = source.path if isinstance(source, PDFDocument) else source
+                    name = display_names[i] if display_names else os.path.basename(pdf_path)
+                    if not os.path.exists(pdf_path):
+                        raise HTTPException(status_code=404, detail=f"Archivo no encontrado: {name}")
                 
-                try:
-                    reader = PdfReader(pdf_path)
-                    pages_in_file = len(reader.pages)
+                    try:
+                        doc = stack.enter_context(self._using(source))
+                    except HTTPException:
+                        raise HTTPException(status_code=400, detail=f"Archivo PDF corrupto o inválido: {name}")
+                
+                    try:
+                        pages_in_file = doc.total_pages
                     
-                    for page in reader.pages:
-                        writer.add_page(page)
+                        with span("pdf.append_pages", pages=pages_in_file, file=name):
+                            self.backend.append_pages(writer, doc.handle, list(range(pages_in_file)))
                     
-                    total_pages += pages_in_file
-                    logger.info(f"✅ PDF {i+1}/{len(pdf_paths)} agregado: {os.path.basename(pdf_path)} ({pages_in_file} páginas)")
+                        total_pages += pages_in_file
+                        logger.info(f"✅ PDF {i+1}/{len(pdf_paths)} agregado: {name} ({pages_in_file} páginas)")
                     
-                except Exception as e:
-                    logger.error(f"❌ Error procesando {os.path.basename(pdf_path)}: {e}")
-                    raise HTTPException(status_code=400, detail=f"Error en archivo {os.path.basename(pdf_path)}: {str(e)}")
+                    except Exception as e:
+                        logger.error(f"❌ Error procesando {name}: {e}")
+                        raise HTTPException(status_code=400, detail=f"Error en archivo {name}: {str(e)}")
             
-            # Crear archivo de salida
-            if not output_filename:
-                output_filename = f"merged_document_{len(pdf_paths)}_files_{uuid.uuid4().hex[:8]}.pdf"
+                # Crear archivo de salida
+                if not output_filename:
+                    output_filename = f"merged_document_{len(pdf_paths)}_files_{uuid.uuid4().hex[:8]}.pdf"
             
-            output_path = self.temp_dir / output_filename
+                output_path = self.temp_dir / output_filename
             
-            with open(output_path, 'wb') as output_file:
-                writer.write(output_file)
+                with span("pdf.save", pages=total_pages):
+                    self.backend.save(writer, str(output_path))
             
-            logger.info(f"🎉 {len(pdf_paths)} PDFs unidos exitosamente: {output_filename} ({total_pages} páginas totales)")
-            return str(output_path)
+                logger.info(f"🎉 {len(pdf_paths)} PDFs unidos exitosamente: {output_filename} ({total_pages} páginas totales)")
+                return str(output_path)
             
         except HTTPException:
             raise
@@ -238,6 +402,116 @@ class PDFToolsManager:
             logger.error(f"❌ Error uniendo PDFs: {e}")
             raise HTTPException(status_code=500, detail=f"Error uniendo PDFs: {str(e)}")
     
+    def merge_append(self, output_path: str, pdf_paths: List[str], display_names: List[str]) -> List[Dict[str, Any]]:
+        """🔗 Añade una tanda de PDFs al final de ``output_path`` (unión en streaming)
+        
+        Crea ``output_path`` en la primera tanda. Devuelve, por archivo, su
+        página inicial, sus páginas y sus entradas del índice: una con el
+        nombre del archivo y, anidados, sus propios marcadores.
+        """
+        appender = IncrementalAppender(output_path)
+        added = []
+        try:
+            for pdf_path, name in zip(pdf_paths, display_names):
+                start_page = appender.page_count + 1
+                try:
+                    with span("pdf.append_pages", file=name):
+                        pages, bookmarks = appender.append(pdf_path)
+                except Exception as e:
+                    logger.error(f"❌ Error procesando {name}: {e}")
+                    raise HTTPException(status_code=400, detail=f"Archivo PDF corrupto o inválido: {name}")
+                
+                outline = [[1, name, start_page]] + [
+                    [level + 1, title, start_page + page - 1 if page > 0 else start_page]
+                    for level, title, page in bookmarks
+                ]
+                added.append({'name': name, 'start_page': start_page, 'pages': pages, 'outline': outline})
+            
+            with span("pdf.save", files=len(added)):
+                appender.commit()
+            total_pages = appender.page_count
+        finally:
+            appender.close()
+        
+        logger.info(f"✅ {len(added)} PDF(s) añadidos a {os.path.basename(output_path)} ({total_pages} páginas)")
+        return added
+    
+    def finish_merge(self, output_path: str, outline: List[list]) -> int:
+        """📑 Escribe el índice de la unión en streaming y devuelve el total de páginas"""
+        appender = IncrementalAppender(output_path)
+        try:
+            if outline:
+                with span("pdf.outline", entries=len(outline)):
+                    appender.set_outline(outline)
+                    appender.commit()
+            return appender.page_count
+        finally:
+            appender.close()
+    
+    def count_pages(self, source: PDFSource) -> int:
+        """🔢 Valida el PDF y devuelve su número de páginas"""
+        with self._using(source) as doc:
+            return doc.total_pages
+    
+    def plan_split_parts(self, total_pages: int, filename_prefix: str,
+                         ranges: List[Tuple[int, int]] = None) -> List[Tuple[str, List[int]]]:
+        """🧩 Define las partes de una división: (nombre, índices de página 0-based)
+        
+        Sin ``ranges`` se genera una parte por página.
+        """
+        if not ranges:
+            width = len(str(total_pages))
+            return [
+                (f"{filename_prefix}_{str(page_num + 1).zfill(width)}.pdf", [page_num])
+                for page_num in range(total_pages)
+            ]
+        
+        parts = []
+        for start, end in ranges:
+            if start < 1 or end > total_pages or start > end:
+                raise HTTPException(
+                    status_code=400, 
+                    detail=f"Rango inválido: {start}-{end}. PDF tiene {total_pages} páginas (1-{total_pages})"
+                )
+            parts.append((f"{filename_prefix}_{start}-{end}.pdf", list(range(start - 1, end))))
+        return parts
+    
+    def iter_parts(self, source: PDFSource, parts: List[Tuple[str, List[int]]]) -> Iterator[Tuple[str, bytes]]:
+        """🧩 Genera en memoria el PDF de cada parte, de una en una
+        
+        El documento se abre una sola vez y cada parte se produce cuando se
+        pide, así que la memoria no crece con el número de partes.
+        """
+        with self._using(source) as doc:
+            for name, page_indexes in parts:
+                buffer = io.BytesIO()
+                self._write_pages(doc, page_indexes, buffer)
+                logger.debug(f"Parte generada: {name} ({len(page_indexes)} páginas, {buffer.tell()} bytes)")
+                yield name, buffer.getvalue()
+    
+    def render_parts(self, source: PDFSource, parts: List[Tuple[str, List[int]]]) -> List[Tuple[str, bytes]]:
+        """🧩 Genera en memoria el PDF de cada parte, sin pasar por disco"""
+        try:
+            return list(self.iter_parts(source, parts))
+            
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Error generando partes: {e}")
+            raise HTTPException(status_code=500, detail=f"Error dividiendo PDF: {str(e)}")
+    
+    def start_split(self, source: PDFSource, filename_prefix: str, ranges: List[Tuple[int, int]] = None,
+                    max_pages: int = 50) -> Tuple[List[Tuple[str, List[int]]], List[list], List[Tuple[str, bytes]]]:
+        """✂️ Valida, planifica y genera el primer lote de una división en streaming
+        
+        Todo en una sola llamada al worker, sobre el mismo lector. Devuelve
+        (partes, lotes, primer lote generado).
+        """
+        with self._using(source) as doc:
+            parts = self.plan_split_parts(doc.total_pages, filename_prefix, ranges)
+            batches = list(batch_split_parts(parts, max_pages))
+            return parts, batches, self.render_parts(doc, batches[0]) if batches else []
+    
     def create_zip_from_files(self, file_paths: List[str], zip_name: str = None) -> str:
         """📦 Crea un ZIP con múltiples archivos"""
         try:
@@ -248,12 +522,12 @@ class PDFToolsManager:
             
             logger.info(f"Creando ZIP con {len(file_paths)} archivos...")
             
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            with span("zip.write", files=len(file_paths)), zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
                 for file_path in file_paths:
                     if os.path.exists(file_path):
                         filename = os.path.basename(file_path)
                         zip_file.write(file_path, filename)
-                        logger.info(f"✅ Archivo agregado al ZIP: {filename}")
+                        logger.debug(f"Archivo agregado al ZIP: {filename}")
                     else:
                         logger.warning(f"⚠️ Archivo no encontrado: {file_path}")
             
@@ -266,27 +540,27 @@ class PDFToolsManager:
             raise HTTPException(status_code=500, detail=f"Error creando ZIP: {str(e)}")
     
     def validate_pdf_file(self, pdf_path: str) -> bool:
-        """🔍 Valida que el archivo sea un PDF válido"""
+        """🔍 Valida que el archivo sea un PDF válido (el lector queda en cache)"""
         try:
-            reader = PdfReader(pdf_path)
-            # Intentar leer al menos la primera página
-            if len(reader.pages) > 0:
-                _ = reader.pages[0]
-                return True
-            return False
-        except Exception as e:
-            logger.error(f"❌ Archivo PDF inválido: {e}")
+            self.open_document(pdf_path)
+            return True
+        except Exception:
             return False
     
     def cleanup_files(self, file_paths: List[str]) -> None:
         """🧹 Limpia archivos temporales"""
+        removed = 0
         for file_path in file_paths:
             try:
+                self.release_document(file_path)
                 if os.path.exists(file_path):
                     os.remove(file_path)
-                    logger.info(f"🗑️ Archivo temporal eliminado: {os.path.basename(file_path)}")
+                    removed += 1
+                    logger.debug(f"Archivo temporal eliminado: {os.path.basename(file_path)}")
             except Exception as e:
                 logger.warning(f"⚠️ No se pudo eliminar {file_path}: {e}")
+        if removed:
+            logger.info(f"🗑️ {removed} archivo(s) temporal(es) eliminado(s)")
     
     def get_operation_summary(self, operation: str, input_files: int, output_files: int, total_pages: int = None) -> Dict[str, Any]:
         """📈 Genera resumen de la operación realizada"""
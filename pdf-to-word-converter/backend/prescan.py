@@ -0,0 +1,178 @@
+import os
+import time
+import logging
+from typing import Any, Dict, List
+import fitz
+
+logger = logging.getLogger(__name__)
+
+# Páginas que se analizan como máximo (repartidas por todo el documento)
+PRESCAN_SAMPLE_PAGES = int(os.getenv("PRESCAN_SAMPLE_PAGES", "8"))
+# Caracteres por página por debajo de los cuales una página "no tiene texto"
+PRESCAN_MIN_TEXT_CHARS = int(os.getenv("PRESCAN_MIN_TEXT_CHARS", "20"))
+# Fracción de la página cubierta por imágenes a partir de la que se considera escaneada
+PRESCAN_SCAN_COVERAGE = float(os.getenv("PRESCAN_SCAN_COVERAGE", "0.6"))
+# Con PRESCAN_LIBREOFFICE_ROUTING=true (desactivado por defecto: cambia el
+# motor que reciben los clientes de engine=auto), los documentos sólo de
+# texto con al menos PRESCAN_LIBREOFFICE_MIN_PAGES páginas van a LibreOffice
+# si está disponible
+PRESCAN_LIBREOFFICE_ROUTING = os.getenv("PRESCAN_LIBREOFFICE_ROUTING", "false").lower() == "true"
+PRESCAN_LIBREOFFICE_MIN_PAGES = int(os.getenv("PRESCAN_LIBREOFFICE_MIN_PAGES", "50"))
+# Límite de páginas por conversión (0 = sin límite)
+CONVERSION_MAX_PAGES = int(os.getenv("CONVERSION_MAX_PAGES", "2000"))
+# Rechazar PDFs escaneados sin capa de texto (pdf2docx sólo devolvería las imágenes)
+PRESCAN_REJECT_SCANNED = os.getenv("PRESCAN_REJECT_SCANNED", "true").lower() == "true"
+
+# Ajustes de pdf2docx para documentos con muchas imágenes: recortar a menor
+# resolución ahorra ~30% del tiempo sin cambiar el tamaño del DOCX
+IMAGE_HEAVY_SETTINGS = {"clip_image_res_ratio": float(os.getenv("PRESCAN_IMAGE_RES_RATIO", "1.5"))}
+
+# Niveles velocidad/calidad de ``mode``. ``ms_per_page`` medido con un
+# worker (pdf2docx 0.5.8, PyMuPDF 1.26) sobre PDFs de prueba: texto corrido
+# de 40 páginas, 20 páginas con imágenes y 20 páginas con tablas con bordes
+CONVERSION_MODES: Dict[str, Dict[str, Any]] = {
+    "fast": {
+        "description": "Sólo texto editable (PyMuPDF): un párrafo por bloque, sin tablas, imágenes ni estilos",
+        "ms_per_page": {"text": 8, "image_heavy": 4, "tables": 6},
+    },
+    "balanced": {
+        "description": "pdf2docx con los ajustes del pre-análisis: imágenes a menor resolución"
+                       + (" y documentos largos de sólo texto a LibreOffice si está disponible"
+                          if PRESCAN_LIBREOFFICE_ROUTING else ""),
+        "ms_per_page": {"text": 263, "image_heavy": 111, "tables": 2430},
+    },
+    "full": {
+        "description": "pdf2docx con sus ajustes por defecto: máxima fidelidad de maquetación, tablas e imágenes",
+        "ms_per_page": {"text": 263, "image_heavy": 156, "tables": 2430},
+    },
+}
+CONVERSION_MODE_PATTERN = f"^({'|'.join(CONVERSION_MODES)})$"
+
+
+def sample_page_indexes(page_count: int, samples: int = PRESCAN_SAMPLE_PAGES) -> List[int]:
+    """Índices repartidos uniformemente, incluyendo la primera y la última página"""
+    if page_count <= samples:
+        return list(range(page_count))
+    step = (page_count - 1) / (samples - 1)
+    return sorted({round(i * step) for i in range(samples)})
+
+
+def _image_coverage(page: "fitz.Page") -> float:
+    """Fracción del área de la página cubierta por imágenes (solapes sumados, máx. 1)"""
+    page_rect = page.rect
+    area = abs(page_rect) or 1.0
+    covered = 0.0
+    for info in page.get_image_info():
+        covered += abs(fitz.Rect(info["bbox"]) & page_rect)
+    return min(1.0, covered / area)
+
+
+def classify(text_chars_per_page: float, text_pages_ratio: float, image_coverage: float,
+             images_per_page: float) -> str:
+    """text, mixed, image_heavy, scanned (imágenes sin capa de texto) o empty"""
+    if text_pages_ratio == 0 and image_coverage >= PRESCAN_SCAN_COVERAGE:
+        return "scanned"
+    if text_chars_per_page == 0 and images_per_page == 0:
+        return "empty"
+    if image_coverage >= PRESCAN_SCAN_COVERAGE or images_per_page >= 2:
+        return "image_heavy"
+    if images_per_page > 0:
+        return "mixed"
+    return "text"
+
+
+def prescan_pdf(pdf_path: str, samples: int = PRESCAN_SAMPLE_PAGES) -> Dict[str, Any]:
+    """🔍 Análisis rápido con PyMuPDF sobre una muestra de páginas
+
+    Mide densidad de texto, cobertura de imágenes y fuentes para decidir
+    motor y ajustes de conversión sin recorrer todo el documento.
+    """
+    start = time.perf_counter()
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception as e:
+        logger.error(f"❌ Pre-análisis: no se pudo abrir el PDF: {e}")
+        return {"readable": False, "encrypted": False, "page_count": 0, "profile": "empty"}
+
+    with doc:
+        if doc.needs_pass:
+            return {"readable": True, "encrypted": True, "page_count": doc.page_count, "profile": "empty"}
+
+        indexes = sample_page_indexes(doc.page_count, samples)
+        fonts = set()
+        chars, text_pages, coverage, images = [], 0, [], []
+        for index in indexes:
+            page = doc.load_page(index)
+            page_chars = len(page.get_text("text").strip())
+            chars.append(page_chars)
+            text_pages += page_chars >= PRESCAN_MIN_TEXT_CHARS
+            coverage.append(_image_coverage(page))
+            images.append(len(page.get_images()))
+            fonts.update(font[3] for font in page.get_fonts())
+
+        sampled = len(indexes) or 1
+        text_pages_ratio = text_pages / sampled
+        image_coverage = sum(coverage) / sampled
+        images_per_page = sum(images) / sampled
+        return {
+            "readable": True,
+            "encrypted": False,
+            "page_count": doc.page_count,
+            "sampled_pages": [i + 1 for i in indexes],
+            "text_chars_per_page": round(sum(chars) / sampled, 1),
+            "text_pages_ratio": round(text_pages_ratio, 3),
+            "image_coverage": round(image_coverage, 3),
+            "images_per_page": round(images_per_page, 2),
+            "fonts": len(fonts),
+            "profile": classify(sum(chars) / sampled, text_pages_ratio, image_coverage, images_per_page),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+
+def plan_route(scan: Dict[str, Any], engine: str = "auto", libreoffice_available: bool = False,
+               mode: str = "balanced") -> Dict[str, Any]:
+    """🧭 Motor y ajustes para una conversión según el pre-análisis
+
+    ``engine="auto"`` elige el motor (pdf2docx, o LibreOffice para texto
+    largo si PRESCAN_LIBREOFFICE_ROUTING está activado); con ``pdf2docx`` o ``libreoffice`` se
+    respeta el pedido y sólo se ajustan los parámetros. Los documentos que
+    no se pueden convertir bien se rechazan (``accepted: False``).
+
+    ``mode`` (ver CONVERSION_MODES): ``fast`` sustituye pdf2docx por la
+    extracción de sólo texto (motor ``text``), ``balanced`` aplica los ajustes
+    del pre-análisis y ``full`` usa pdf2docx tal cual.
+    """
+    def reject(reason: str, status_code: int = 422) -> Dict[str, Any]:
+        return {"accepted": False, "engine": None, "settings": {}, "reason": reason, "status_code": status_code}
+
+    if not scan.get("readable"):
+        return reject("Archivo PDF corrupto o inválido", 400)
+    if scan.get("encrypted"):
+        return reject("El PDF está protegido con contraseña")
+    if CONVERSION_MAX_PAGES and scan["page_count"] > CONVERSION_MAX_PAGES:
+        return reject(f"El PDF tiene {scan['page_count']} páginas; máximo {CONVERSION_MAX_PAGES} por conversión")
+    if scan["page_count"] == 0:
+        return reject("El PDF no tiene páginas")
+    profile = scan["profile"]
+    if profile == "scanned" and PRESCAN_REJECT_SCANNED:
+        return reject("PDF escaneado sin capa de texto: necesita OCR antes de convertirlo a Word")
+
+    if mode == "fast" and engine != "libreoffice":
+        return {"accepted": True, "engine": "text", "settings": {}, "reason": "modo fast"}
+
+    balanced = mode == "balanced"
+    settings = dict(IMAGE_HEAVY_SETTINGS) if balanced and profile in ("image_heavy", "scanned") else {}
+    if engine == "auto":
+        if (balanced and PRESCAN_LIBREOFFICE_ROUTING and profile == "text" and libreoffice_available
+                and scan["page_count"] >= PRESCAN_LIBREOFFICE_MIN_PAGES):
+            return {"accepted": True, "engine": "libreoffice", "settings": {},
+                    "reason": f"sólo texto, {scan['page_count']} páginas"}
+        engine = "pdf2docx"
+        reason = f"perfil {profile}"
+    else:
+        reason = "motor pedido"
+    if not balanced:
+        reason += f", modo {mode}"
+    if engine == "libreoffice":
+        settings = {}
+    return {"accepted": True, "engine": engine, "settings": settings, "reason": reason}
@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def link_or_copy(src: str, dst: str):
+    """Crea ``dst`` como hard link de ``src`` (copia si el FS no lo permite)"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class ResultCache:
+    """🗃️ Cache en disco de resultados direccionada por contenido
+
+    La clave es el SHA-256 del PDF más la versión del conversor y las
+    opciones usadas, así que el mismo documento con otra configuración
+    no colisiona. Las entradas caducan a los ``ttl`` segundos y, si el
+    total supera ``max_bytes``, se expulsan las menos usadas (LRU).
+
+    Los archivos se entregan como hard links: quien recibe una ruta
+    puede borrarla sin afectar a la cache y viceversa.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int, ttl: int, suffix: str = ".docx"):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (tamaño, creado_en); el orden refleja el uso (LRU al principio)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._total_bytes = 0
+        self._load()
+
+    @staticmethod
+    def make_key(content_sha256: str, version: str, options: Optional[Dict[str, Any]] = None) -> str:
+        raw = json.dumps({"sha256": content_sha256, "version": version, "options": options or {}}, sort_keys=True)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{self.suffix}"
+
+    def _load(self):
+        """Reconstruye el índice desde disco (orden por fecha de modificación)"""
+        files = []
+        for path in self.cache_dir.glob(f"*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, path.stem, stat.st_size))
+        for mtime, key, size in sorted(files):
+            self._entries[key] = (size, mtime)
+            self._total_bytes += size
+        if files:
+            logger.info(f"🗃️ Cache cargada: {len(files)} entradas, {self._total_bytes / 1024 / 1024:.1f} MB")
+
+    def _drop(self, key: str):
+        size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"No se pudo eliminar la entrada de cache {key}: {e}")
+
+    def get(self, key: str, dest: str) -> Optional[str]:
+        """Si hay entrada vigente la enlaza en ``dest`` y devuelve esa ruta"""
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[1] > self.ttl:
+            self._drop(key)
+            entry = None
+
+        if entry is not None:
+            try:
+                link_or_copy(str(self._path(key)), dest)
+            except FileNotFoundError:
+                # Borrado desde fuera (otro worker, limpieza manual)
+                self._drop(key)
+                entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        logger.info(f"🗃️ Cache hit: {key[:12]}")
+        return dest
+
+    def put(self, key: str, src: str):
+        """Guarda una copia (hard link) de ``src`` bajo ``key``"""
+        if key in self._entries:
+            self._drop(key)
+
+        size = os.path.getsize(src)
+        if size > self.max_bytes:
+            return
+
+        path = self._path(key)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        try:
+            link_or_copy(src, str(tmp_path))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar en cache {key[:12]}: {e}")
+            return
+
+        self._entries[key] = (size, time.time())
+        self._total_bytes += size
+        self._evict()
+
+    def _evict(self):
+        now = time.time()
+        for key in [k for k, (_, created) in self._entries.items() if now - created > self.ttl]:
+            self._drop(key)
+            self.evictions += 1
+        while self._total_bytes > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class MemoryCache:
+    """🧠 Cache LRU en memoria con TTL para respuestas pequeñas (p. ej. JSON)
+
+    Pensada para resultados direccionados por contenido que se piden una y
+    otra vez (la info de un PDF antes de cada operación).
+    """
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+
+    def get(self, key) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None and time.time() > entry[0]:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value: Any):
+        self._entries[key] = (time.time() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,284 @@
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def _remove(path: str) -> int:
+    """Borra ``path`` y devuelve los bytes liberados (0 si ya no existía)"""
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
+    except OSError as e:
+        logger.warning(f"No se pudo eliminar {path}: {e}")
+        return 0
+
+
+class ResultStore(ABC):
+    """🗄️ Registro de archivos convertidos pendientes de descarga
+
+    Cada entrada apunta a un DOCX en disco y caduca a los ``ttl`` segundos
+    (el mismo tiempo de vida que el token de descarga). Si el total supera
+    ``max_bytes`` se eliminan primero las entradas más antiguas. El barrido
+    periódico borra las entradas caducadas y sus archivos.
+    """
+
+    def __init__(self, ttl: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.swept = 0
+        self.evicted = 0
+        self._sweeper: Optional[asyncio.Task] = None
+
+    # Operaciones que implementa cada backend
+    @abstractmethod
+    def _insert(self, entry: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    def _fetch(self, file_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def _pop(self, file_ids: List[str]) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def _expired_ids(self, now: float) -> List[str]:
+        ...
+
+    @abstractmethod
+    def _oldest_over_quota(self) -> List[str]:
+        ...
+
+    @abstractmethod
+    def _totals(self) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def active_paths(self) -> Set[str]:
+        """Rutas de todos los archivos registrados (vigentes o por barrer)"""
+        ...
+
+    def put(self, file_id: str, path: str, filename: str, user_email: str, ttl: Optional[int] = None) -> Dict[str, Any]:
+        now = time.time()
+        entry = {
+            'file_id': file_id,
+            'path': path,
+            'filename': filename,
+            'user_email': user_email,
+            'size': os.path.getsize(path),
+            'created_at': now,
+            'expires_at': now + (ttl or self.ttl),
+        }
+        self._insert(entry)
+        evicted = self._discard(self._oldest_over_quota())
+        if evicted:
+            self.evicted += len(evicted)
+            logger.info(f"🗄️ Límite de disco: {len(evicted)} resultado(s) antiguo(s) eliminado(s)")
+        return entry
+
+    def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Entrada vigente o None; las caducadas se eliminan al consultarlas"""
+        entry = self._fetch(file_id)
+        if entry is not None and entry['expires_at'] <= time.time():
+            self._discard([file_id])
+            return None
+        return entry
+
+    def delete(self, file_id: str) -> None:
+        self._discard([file_id])
+
+    def _discard(self, file_ids: List[str]) -> List[Dict[str, Any]]:
+        if not file_ids:
+            return []
+        entries = self._pop(file_ids)
+        for entry in entries:
+            _remove(entry['path'])
+        return entries
+
+    def sweep(self) -> Dict[str, int]:
+        """Elimina las entradas caducadas y sus archivos"""
+        entries = self._discard(self._expired_ids(time.time()))
+        freed = sum(entry['size'] for entry in entries)
+        if entries:
+            self.swept += len(entries)
+            logger.info(f"🧹 {len(entries)} resultado(s) caducado(s) eliminado(s) ({freed / 1024 / 1024:.2f} MB)")
+        return {'removed': len(entries), 'bytes_freed': freed}
+
+    async def start_sweeper(self, interval: float):
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_forever(interval))
+
+    async def stop_sweeper(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+            await asyncio.gather(self._sweeper, return_exceptions=True)
+            self._sweeper = None
+
+    async def _sweep_forever(self, interval: float):
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"❌ Error barriendo resultados: {e}")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'backend': self.name,
+            **self._totals(),
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+            'swept': self.swept,
+            'evicted': self.evicted,
+        }
+
+
+class MemoryResultStore(ResultStore):
+    """Registro en memoria: sólo válido con un único proceso"""
+
+    name = "memory"
+
+    def __init__(self, ttl: int, max_bytes: int):
+        super().__init__(ttl, max_bytes)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+
+    def _insert(self, entry):
+        self._entries[entry['file_id']] = entry
+
+    def _fetch(self, file_id):
+        return self._entries.get(file_id)
+
+    def _pop(self, file_ids):
+        return [entry for entry in (self._entries.pop(f, None) for f in file_ids) if entry]
+
+    def _expired_ids(self, now):
+        return [f for f, entry in self._entries.items() if entry['expires_at'] <= now]
+
+    def _oldest_over_quota(self):
+        excess = sum(entry['size'] for entry in self._entries.values()) - self.max_bytes
+        victims = []
+        for entry in sorted(self._entries.values(), key=lambda e: e['created_at']):
+            if excess <= 0:
+                break
+            victims.append(entry['file_id'])
+            excess -= entry['size']
+        return victims
+
+    def active_paths(self):
+        return {entry['path'] for entry in self._entries.values()}
+
+    def _totals(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': sum(entry['size'] for entry in self._entries.values()),
+        }
+
+
+class SQLiteResultStore(ResultStore):
+    """Registro en SQLite (modo WAL), compartido por todos los workers de uvicorn"""
+
+    name = "sqlite"
+    COLUMNS = ('file_id', 'path', 'filename', 'user_email', 'size', 'created_at', 'expires_at')
+
+    def __init__(self, db_path: Path, ttl: int, max_bytes: int):
+        super().__init__(ttl, max_bytes)
+        self.db_path = str(db_path)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    file_id TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    user_email TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS results_expires_at ON results (expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Conexión corta por operación: segura entre threads y procesos
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _run(self, sql: str, params=()) -> List[sqlite3.Row]:
+        conn = self._connect()
+        try:
+            with conn:
+                return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def _insert(self, entry):
+        self._run(
+            f"INSERT OR REPLACE INTO results ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+            [entry[c] for c in self.COLUMNS]
+        )
+
+    def _fetch(self, file_id):
+        rows = self._run("SELECT * FROM results WHERE file_id = ?", (file_id,))
+        return dict(rows[0]) if rows else None
+
+    def _pop(self, file_ids):
+        # RETURNING: si dos workers barren a la vez cada fila la borra uno solo
+        placeholders = ', '.join('?' * len(file_ids))
+        rows = self._run(f"DELETE FROM results WHERE file_id IN ({placeholders}) RETURNING *", file_ids)
+        return [dict(row) for row in rows]
+
+    def _expired_ids(self, now):
+        return [row['file_id'] for row in self._run("SELECT file_id FROM results WHERE expires_at <= ?", (now,))]
+
+    def _oldest_over_quota(self):
+        # Entradas más antiguas cuyo tamaño acumulado cubre el exceso
+        rows = self._run("""
+            SELECT file_id FROM (
+                SELECT file_id, size, SUM(size) OVER (ORDER BY created_at, file_id) AS running
+                FROM results
+            )
+            WHERE running - size < (SELECT COALESCE(SUM(size), 0) FROM results) - ?
+        """, (self.max_bytes,))
+        return [row['file_id'] for row in rows]
+
+    def active_paths(self):
+        return {row['path'] for row in self._run("SELECT path FROM results")}
+
+    def _totals(self):
+        row = self._run("SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes FROM results")[0]
+        return {'entries': row['entries'], 'bytes': row['bytes']}
+
+
+RESULT_STORES = {
+    MemoryResultStore.name: MemoryResultStore,
+    SQLiteResultStore.name: SQLiteResultStore,
+}
+
+
+def result_store_from_env(temp_dir: Path, ttl: int) -> ResultStore:
+    """RESULT_STORE=sqlite|memory, RESULT_STORE_PATH, RESULT_STORE_MAX_MB"""
+    name = os.getenv("RESULT_STORE", SQLiteResultStore.name).lower()
+    max_bytes = int(os.getenv("RESULT_STORE_MAX_MB", "2048")) * 1024 * 1024
+    if name not in RESULT_STORES:
+        raise ValueError(f"Result store desconocido: {name}. Opciones: {', '.join(RESULT_STORES)}")
+    if name == SQLiteResultStore.name:
+        db_path = os.getenv("RESULT_STORE_PATH", str(Path(temp_dir) / "results.db"))
+        return SQLiteResultStore(db_path, ttl, max_bytes)
+    return MemoryResultStore(ttl, max_bytes)
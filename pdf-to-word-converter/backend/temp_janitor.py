@@ -0,0 +1,253 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Prefijos de los archivos temporales que generan los endpoints y el engine
+TEMP_PREFIXES = (
+    "input_", "azure_input_", "job_input_", "info_", "split_", "extract_",
+    "extracted_", "merge_", "merged_", "converted_", "chunk_", "pdf_files_", "batch_input_", "batch_zip_",
+)
+
+
+class InUsePaths:
+    """📌 Archivos de TEMP_DIR que usa alguna petición en curso
+
+    Cuenta referencias: la misma ruta puede estar retenida por varias
+    peticiones. El janitor no los toca aunque superen ``min_age`` (una
+    conversión larga de una subida antigua).
+    """
+
+    def __init__(self):
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, path: str) -> None:
+        with self._lock:
+            self._counts[os.path.abspath(path)] += 1
+
+    def discard(self, path: str) -> None:
+        path = os.path.abspath(path)
+        with self._lock:
+            self._counts[path] -= 1
+            if self._counts[path] <= 0:
+                del self._counts[path]
+
+    def snapshot(self) -> Set[str]:
+        with self._lock:
+            return set(self._counts)
+
+
+in_use_paths = InUsePaths()
+
+# Rutas retenidas por la petición actual (las fija InUseMiddleware)
+_request_paths: ContextVar[Optional[List[str]]] = ContextVar("request_temp_paths", default=None)
+
+
+def track_in_use(path) -> None:
+    """Marca ``path`` como en uso hasta que termine la petición actual (incluida la respuesta)
+
+    Fuera de una petición no hace nada: los trabajos en cola se protegen
+    con ``protected()``.
+    """
+    paths = _request_paths.get()
+    if paths is not None:
+        in_use_paths.add(str(path))
+        paths.append(str(path))
+
+
+class InUseMiddleware:
+    """Middleware ASGI: libera al terminar cada petición las rutas de ``track_in_use``
+
+    Termina después de enviar la respuesta y de sus tareas de fondo, así
+    que cubre también las descargas en streaming.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        paths: List[str] = []
+        token = _request_paths.set(paths)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_paths.reset(token)
+            for path in paths:
+                in_use_paths.discard(path)
+
+
+class TempDirJanitor:
+    """🧹 Limpieza periódica de archivos huérfanos en TEMP_DIR
+
+    Cada pasada (en un thread, sin bloquear el event loop) revisa sólo los
+    archivos de primer nivel con alguno de los ``prefixes``:
+
+    - borra los que tienen más de ``max_age`` segundos;
+    - si lo que queda supera ``max_bytes``, borra los más antiguos primero.
+
+    Nunca toca subdirectorios (p. ej. la cache de conversiones), archivos
+    más recientes que ``min_age``, los que retiene una petición en curso
+    (``in_use``) ni las rutas que devuelva ``protected()`` (resultados
+    pendientes de descarga, trabajos vigentes).
+
+    Con varios workers de uvicorn cada uno tiene su janitor y no ve las
+    peticiones ni los trabajos de los demás. Por eso cada proceso refresca
+    el mtime de lo que usa (``in_use`` y ``keepalive()``) cada
+    ``min_age / 3`` segundos (``heartbeat``). Para los janitors de los demás
+    workers esos archivos nunca superan ``min_age``.
+    """
+
+    def __init__(self, temp_dir: Path, max_age: float, max_bytes: int, min_age: float = 300,
+                 prefixes: Iterable[str] = TEMP_PREFIXES,
+                 protected: Optional[Callable[[], Set[str]]] = None,
+                 keepalive: Optional[Callable[[], Set[str]]] = None,
+                 in_use: Optional[InUsePaths] = None):
+        self.temp_dir = Path(temp_dir)
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        self.prefixes = tuple(prefixes)
+        self.protected = protected
+        self.keepalive = keepalive
+        self.in_use = in_use if in_use is not None else in_use_paths
+        self.heartbeat_interval = max(1.0, min_age / 3)
+        self.touched = 0
+        self.runs = 0
+        self.removed = 0
+        self.bytes_reclaimed = 0
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+    def heartbeat(self) -> int:
+        """Refresca el mtime de los archivos que usa este proceso; devuelve cuántos"""
+        paths = self.in_use.snapshot()
+        if self.keepalive:
+            paths |= {os.path.abspath(p) for p in self.keepalive() if p}
+        touched = 0
+        for path in paths:
+            try:
+                os.utime(path)
+                touched += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"No se pudo refrescar {path}: {e}")
+        self.touched += touched
+        return touched
+
+    def _candidates(self):
+        now = time.time()
+        for entry in os.scandir(self.temp_dir):
+            if not entry.name.startswith(self.prefixes) or not entry.is_file(follow_symlinks=False):
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            yield entry.path, now - stat.st_mtime, stat.st_size
+
+    def _delete(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"No se pudo eliminar {path}: {e}")
+            return False
+
+    def run_once(self) -> Dict[str, Any]:
+        """Una pasada completa; devuelve lo que se ha liberado"""
+        start = time.perf_counter()
+        protected = {os.path.abspath(p) for p in (self.protected() if self.protected else set()) if p}
+        protected |= self.in_use.snapshot()
+        report = {"scanned": 0, "expired": 0, "evicted": 0, "bytes_reclaimed": 0, "bytes_remaining": 0}
+
+        kept = []
+        for path, age, size in self._candidates():
+            report["scanned"] += 1
+            if age < self.min_age or os.path.abspath(path) in protected:
+                report["bytes_remaining"] += size
+                continue
+            if age > self.max_age and self._delete(path):
+                report["expired"] += 1
+                report["bytes_reclaimed"] += size
+                continue
+            kept.append((age, path, size))
+            report["bytes_remaining"] += size
+
+        # Cuota: los más antiguos primero
+        for age, path, size in sorted(kept, reverse=True):
+            if report["bytes_remaining"] <= self.max_bytes:
+                break
+            if self._delete(path):
+                report["evicted"] += 1
+                report["bytes_reclaimed"] += size
+                report["bytes_remaining"] -= size
+
+        report["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        self.runs += 1
+        self.removed += report["expired"] + report["evicted"]
+        self.bytes_reclaimed += report["bytes_reclaimed"]
+        self.last_run = report
+
+        if report["expired"] or report["evicted"]:
+            logger.info(
+                f"🧹 TEMP_DIR: {report['expired']} caducados y {report['evicted']} por cuota eliminados, "
+                f"{report['bytes_reclaimed'] / 1024 / 1024:.2f} MB recuperados "
+                f"({report['bytes_remaining'] / 1024 / 1024:.2f} MB en uso)"
+            )
+        if report["bytes_remaining"] > self.max_bytes:
+            logger.warning(f"⚠️ TEMP_DIR sigue por encima de la cuota: {report['bytes_remaining'] / 1024 / 1024:.2f} MB")
+        return report
+
+    async def start(self, interval: float):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval))
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        tasks = [t for t in (self._task, self._heartbeat_task) if t]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = self._heartbeat_task = None
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await asyncio.to_thread(self.heartbeat)
+            except Exception as e:
+                logger.error(f"❌ Error refrescando archivos en uso: {e}")
+
+    async def _run(self, interval: float):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.error(f"❌ Error limpiando TEMP_DIR: {e}")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "touched": self.touched,
+            "removed": self.removed,
+            "bytes_reclaimed": self.bytes_reclaimed,
+            "max_bytes": self.max_bytes,
+            "max_age": self.max_age,
+            "last_run": self.last_run,
+        }
@@ -0,0 +1,9 @@
+"""Configuración de pytest: los módulos del backend se importan desde backend/
+
+Uso (desde backend/):
+    python -m pytest tests
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
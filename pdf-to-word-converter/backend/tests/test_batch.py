@@ -0,0 +1,70 @@
+import zipfile
+
+import pytest
+
+from batch import extract_pdfs_from_zip
+
+PDF = b"%PDF-1.4\n" + b"0" * 2048 + b"\n%%EOF\n"
+
+
+def make_zip(path, members):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return str(path)
+
+
+def extracted(tmp_path):
+    return sorted(p.name for p in tmp_path.glob("batch_input_*"))
+
+
+def test_extracts_pdfs_and_skips_the_rest(tmp_path):
+    zip_path = make_zip(tmp_path / "lote.zip", {
+        "a.pdf": PDF,
+        "docs/b.PDF": PDF,
+        "falso.pdf": b"no soy un pdf",
+        "notas.txt": b"texto",
+        "__MACOSX/._a.pdf": PDF,
+        ".oculto.pdf": PDF,
+        "../fuera.pdf": PDF,
+    })
+    items = extract_pdfs_from_zip(zip_path, tmp_path, max_files=10)
+
+    by_source = {item.source: item for item in items}
+    assert set(by_source) == {"a.pdf", "docs/b.PDF", "falso.pdf"}
+    assert by_source["falso.pdf"].error == "No es un PDF válido"
+    assert by_source["falso.pdf"].path is None
+    for name in ("a.pdf", "docs/b.PDF"):
+        assert by_source[name].error is None
+        assert open(by_source[name].path, "rb").read() == PDF
+    assert len(extracted(tmp_path)) == 2
+
+
+def test_max_files_is_checked_before_writing(tmp_path):
+    zip_path = make_zip(tmp_path / "lote.zip", {f"{i}.pdf": PDF for i in range(4)})
+    with pytest.raises(ValueError, match="máximo de 3 archivos"):
+        extract_pdfs_from_zip(zip_path, tmp_path, max_files=3)
+    assert extracted(tmp_path) == []
+
+
+def test_uncompressed_limit_is_checked_before_writing(tmp_path):
+    zip_path = make_zip(tmp_path / "lote.zip", {"a.pdf": PDF, "b.pdf": PDF})
+    with pytest.raises(ValueError, match="descomprimido"):
+        extract_pdfs_from_zip(zip_path, tmp_path, max_files=10, max_uncompressed=len(PDF) * 2 - 1)
+    assert extracted(tmp_path) == []
+
+
+def test_corrupt_member_removes_partial_copies(tmp_path):
+    zip_path = tmp_path / "lote.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED) as archive:
+        archive.writestr("a.pdf", PDF)
+        archive.writestr("b.pdf", PDF.replace(b"0", b"1"))
+    # Corromper los datos del segundo miembro (falla su CRC al leerlo)
+    data = bytearray(zip_path.read_bytes())
+    offset = data.rindex(b"1" * 64)
+    data[offset] = ord("2")
+    zip_path.write_bytes(bytes(data))
+
+    with pytest.raises(zipfile.BadZipFile):
+        extract_pdfs_from_zip(str(zip_path), tmp_path, max_files=10)
+    assert extracted(tmp_path) == []
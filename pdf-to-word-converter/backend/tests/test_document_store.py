@@ -0,0 +1,81 @@
+import os
+import time
+
+from document_store import DocumentStore
+
+
+def upload(tmp_path, name, size=100):
+    path = tmp_path / name
+    path.write_bytes(b"%PDF-" + b"x" * (size - 5))
+    return str(path)
+
+
+def age(store, doc_id, seconds):
+    mtime = time.time() - seconds
+    os.utime(store._meta(doc_id), (mtime, mtime))
+
+
+def test_create_moves_the_upload_into_the_store(tmp_path):
+    store = DocumentStore(tmp_path / "documents", ttl=60, max_bytes=1000)
+    src = upload(tmp_path, "input.pdf")
+
+    entry = store.create(src, "informe.pdf", 100, "abc", info={"pages": 3})
+
+    assert not os.path.exists(src)
+    assert os.path.exists(store.path(entry["document_id"]))
+    found = store.get(entry["document_id"])
+    assert found["filename"] == "informe.pdf"
+    assert found["info"] == {"pages": 3}
+    assert found["expires_at"] > time.time()
+
+
+def test_invalid_or_unknown_ids(tmp_path):
+    store = DocumentStore(tmp_path / "documents", ttl=60, max_bytes=1000)
+    assert store.get("../../etc/passwd") is None
+    assert store.get("0" * 32) is None
+    assert not store.delete("../input")
+
+
+def test_access_renews_the_ttl(tmp_path):
+    store = DocumentStore(tmp_path / "documents", ttl=60, max_bytes=1000)
+    doc_id = store.create(upload(tmp_path, "input.pdf"), "a.pdf", 100, "abc")["document_id"]
+
+    age(store, doc_id, 50)
+    assert store.get(doc_id) is not None
+    # El acceso anterior renovó el último uso
+    assert store.sweep()["removed"] == 0
+
+    age(store, doc_id, 61)
+    assert store.get(doc_id) is None
+    assert not os.path.exists(store.path(doc_id))
+    assert store.stats()["expired"] == 1
+
+
+def test_sweep_removes_unused_documents(tmp_path):
+    store = DocumentStore(tmp_path / "documents", ttl=60, max_bytes=1000)
+    old = store.create(upload(tmp_path, "old.pdf"), "old.pdf", 100, "a")["document_id"]
+    new = store.create(upload(tmp_path, "new.pdf"), "new.pdf", 100, "b")["document_id"]
+    age(store, old, 120)
+
+    assert store.sweep() == {"removed": 1, "bytes_freed": 100}
+    assert store.get(old) is None
+    assert store.get(new) is not None
+
+
+def test_quota_evicts_least_recently_used(tmp_path):
+    store = DocumentStore(tmp_path / "documents", ttl=600, max_bytes=250)
+    first = store.create(upload(tmp_path, "a.pdf"), "a.pdf", 100, "a")["document_id"]
+    second = store.create(upload(tmp_path, "b.pdf"), "b.pdf", 100, "b")["document_id"]
+    age(store, first, 20)
+    age(store, second, 30)
+    # Usar el primero lo convierte en el más reciente
+    assert store.get(first) is not None
+
+    third = store.create(upload(tmp_path, "c.pdf"), "c.pdf", 100, "c")["document_id"]
+
+    assert store.get(second) is None
+    assert store.get(first) is not None
+    assert store.get(third) is not None
+    stats = store.stats()
+    assert stats["documents"] == 2
+    assert stats["evicted"] == 1
@@ -0,0 +1,152 @@
+import asyncio
+import time
+
+import pytest
+
+from email_outbox import EmailOutbox, RateLimiter, SendResult
+
+
+class ScriptedTransport:
+    """Responde a cada mensaje con el estado indicado (202 por defecto)"""
+
+    name = "scripted"
+
+    def __init__(self, status=202, retry_after=None, error=None):
+        self.status = status
+        self.retry_after = retry_after
+        self.error = error
+        self.batches = []
+
+    async def send(self, messages):
+        self.batches.append(sorted(messages))
+        if self.error:
+            raise self.error
+        return {message_id: SendResult(self.status, self.retry_after) for message_id in messages}
+
+
+def message(recipient="user@example.com"):
+    return {"message": {"subject": "Tu archivo", "toRecipients": [{"emailAddress": {"address": recipient}}]}}
+
+
+@pytest.fixture
+def make_outbox(tmp_path):
+    def make(transport, **kwargs):
+        kwargs.setdefault("rate_per_minute", 600)
+        return EmailOutbox(tmp_path / "outbox.db", transport, **kwargs)
+    return make
+
+
+def enqueue(outbox, count):
+    async def scenario():
+        return [await outbox.enqueue("user@example.com", message()) for _ in range(count)]
+    return asyncio.run(scenario())
+
+
+def flush(outbox):
+    return asyncio.run(outbox.flush())
+
+
+def make_due(outbox):
+    outbox._run("UPDATE outbox SET next_attempt_at = ?", (time.time() - 1,))
+
+
+def test_sent_messages_are_removed_in_one_batch(make_outbox):
+    transport = ScriptedTransport()
+    outbox = make_outbox(transport)
+    ids = enqueue(outbox, 3)
+
+    assert flush(outbox) == 3
+    assert transport.batches == [sorted(ids)]
+    assert outbox.counts() == {"pending": 0, "sending": 0, "failed": 0}
+    assert outbox.stats()["sent"] == 3
+
+
+def test_retryable_errors_back_off_until_max_attempts(make_outbox):
+    transport = ScriptedTransport(status=503)
+    outbox = make_outbox(transport, max_attempts=2, backoff_base=60)
+    enqueue(outbox, 1)
+
+    assert flush(outbox) == 1
+    row = outbox._run("SELECT status, attempts, next_attempt_at FROM outbox")[0]
+    assert (row["status"], row["attempts"]) == ("pending", 1)
+    assert row["next_attempt_at"] > time.time() + 25
+    # Aún no vence
+    assert flush(outbox) == 0
+
+    make_due(outbox)
+    assert flush(outbox) == 1
+    assert outbox.counts()["failed"] == 1
+    assert outbox.stats()["retried"] == 1
+
+
+def test_permanent_errors_fail_immediately(make_outbox):
+    outbox = make_outbox(ScriptedTransport(status=400))
+    enqueue(outbox, 2)
+
+    assert flush(outbox) == 2
+    assert outbox.counts() == {"pending": 0, "sending": 0, "failed": 2}
+
+
+def test_transport_exception_counts_as_an_attempt(make_outbox):
+    outbox = make_outbox(ScriptedTransport(error=RuntimeError("caído")), backoff_base=60)
+    enqueue(outbox, 1)
+
+    assert flush(outbox) == 1
+    row = outbox._run("SELECT status, attempts, last_error FROM outbox")[0]
+    assert (row["status"], row["attempts"], row["last_error"]) == ("pending", 1, "caído")
+
+
+def test_throttling_pauses_the_sender(make_outbox):
+    transport = ScriptedTransport(status=429, retry_after=30)
+    outbox = make_outbox(transport)
+    enqueue(outbox, 1)
+
+    assert flush(outbox) == 1
+    row = outbox._run("SELECT next_attempt_at FROM outbox")[0]
+    assert row["next_attempt_at"] >= time.time() + 29
+    make_due(outbox)
+    assert flush(outbox) == 0
+    assert len(transport.batches) == 1
+    assert outbox.stats()["throttled"] == 1
+
+
+def test_claims_of_dead_workers_are_recovered(make_outbox):
+    outbox = make_outbox(ScriptedTransport(), claim_timeout=60, backoff_base=0)
+    enqueue(outbox, 2)
+    # Otro proceso reclamó los mensajes y murió antes de enviarlos
+    other = make_outbox(ScriptedTransport())
+    assert len(other._claim(10)) == 2
+    assert flush(outbox) == 0
+
+    outbox._run("UPDATE outbox SET claimed_at = ?", (time.time() - 120,))
+    assert outbox._recover() == 2
+    row = outbox._run("SELECT status, attempts FROM outbox LIMIT 1")[0]
+    assert (row["status"], row["attempts"]) == ("pending", 1)
+    make_due(outbox)
+    assert flush(outbox) == 2
+
+
+def test_rate_limiter_refills_over_time(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    limiter = RateLimiter(per_minute=60, burst=5)
+
+    assert limiter.available() == 5
+    limiter.take(5)
+    assert limiter.available() == 0
+    assert limiter.wait_time() == pytest.approx(1.0)
+
+    now[0] += 2.5
+    assert limiter.available() == 2
+    now[0] += 60
+    assert limiter.available() == 5
+
+
+def test_flush_respects_the_rate_limit(make_outbox):
+    transport = ScriptedTransport()
+    outbox = make_outbox(transport, rate_per_minute=1, batch_size=3)
+    enqueue(outbox, 5)
+
+    assert flush(outbox) == 3
+    assert flush(outbox) == 0
+    assert outbox.counts()["pending"] == 2
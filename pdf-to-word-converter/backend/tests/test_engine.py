@@ -0,0 +1,64 @@
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from engine import WorkerCrashed, WorkerEngine
+
+
+def reject(status_code):
+    raise HTTPException(status_code=status_code, detail="PDF inválido")
+
+
+def test_http_errors_keep_their_status():
+    engine = WorkerEngine("test", kind="thread", max_workers=1)
+    observed = []
+    engine.observer = lambda name, operation, wait, elapsed, ok: observed.append((operation, ok))
+    try:
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(engine.run(reject, 422))
+    finally:
+        engine.shutdown()
+    assert exc.value.status_code == 422
+    assert observed == [("reject", False)]
+    assert engine.stats()["completed"] == 1
+
+
+def test_processes_are_recycled_after_max_tasks():
+    engine = WorkerEngine("test", max_workers=1, max_tasks_per_child=2)
+
+    async def scenario():
+        return [await engine.run(os.getpid) for _ in range(5)]
+
+    try:
+        pids = asyncio.run(scenario())
+    finally:
+        engine.shutdown()
+    assert pids[0] == pids[1]
+    assert pids[2] == pids[3] != pids[1]
+    assert pids[4] != pids[3]
+    assert engine.recycles == 2
+
+
+def test_crash_rebuilds_the_pool_and_retries_bystanders():
+    engine = WorkerEngine("test", max_workers=2)
+
+    async def scenario():
+        # Arrancar los workers antes de que uno se caiga
+        await asyncio.gather(engine.run(time.sleep, 0.1), engine.run(time.sleep, 0.1))
+        bystander = asyncio.ensure_future(engine.run(time.sleep, 1))
+        await asyncio.sleep(0.2)
+        crash = await asyncio.gather(engine.run(os._exit, 1), return_exceptions=True)
+        return crash[0], await bystander, await engine.run(os.getpid)
+
+    try:
+        crash, bystander, pid = asyncio.run(scenario())
+    finally:
+        engine.shutdown()
+    assert isinstance(crash, WorkerCrashed)
+    assert bystander is None
+    assert pid != os.getpid()
+    assert engine.crashes == 1
+    assert engine.active == 0
@@ -0,0 +1,40 @@
+import pytest
+
+from file_responses import RangeNotSatisfiable, parse_range
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-5000", (990, 999)),
+    ("bytes = 0 - 9", (0, 9)),
+    ("bytes=999-999", (999, 999)),
+])
+def test_parse_range_valid(value, expected):
+    assert parse_range(value, 1000) == expected
+
+
+@pytest.mark.parametrize("value", [
+    "bytes=-",
+    "bytes=0-1,5-9",
+    "items=0-9",
+    "bytes=abc",
+    "bytes=10-5",
+])
+def test_parse_range_ignored(value):
+    # Mal formada o con varios rangos: se envía el archivo completo
+    assert parse_range(value, 1000) is None
+
+
+@pytest.mark.parametrize("value, size", [
+    ("bytes=1000-", 1000),
+    ("bytes=1000-2000", 1000),
+    ("bytes=-0", 1000),
+    ("bytes=-10", 0),
+    ("bytes=0-", 0),
+])
+def test_parse_range_not_satisfiable(value, size):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(value, size)
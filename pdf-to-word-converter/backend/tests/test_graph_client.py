@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+import httpx
+
+from graph_client import AzureUserDirectory, GraphClient, UserLookupCache
+
+
+class SlowGraph:
+    """Graph falso: cuenta las consultas y tarda ``delay`` en responder"""
+
+    def __init__(self, users, delay=0.05, error=None):
+        self.users = users
+        self.delay = delay
+        self.error = error
+        self.calls = []
+
+    async def get_user(self, email):
+        self.calls.append(email)
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.users.get(email)
+
+
+class StaticTokens:
+    def __init__(self):
+        self.tokens = ["viejo", "nuevo"]
+        self.invalidated = 0
+
+    async def get_token(self):
+        return self.tokens[0]
+
+    def invalidate(self):
+        self.invalidated += 1
+        self.tokens.pop(0)
+
+
+def test_cache_expires_positive_and_negative_entries():
+    cache = UserLookupCache(ttl=600, negative_ttl=60, max_entries=2)
+    cache.put("a@example.com", {"id": "a"})
+    cache.put("nadie@example.com", None)
+
+    assert cache.get("a@example.com") == {"id": "a"}
+    assert cache.get("nadie@example.com") is None
+    assert cache.get("b@example.com") is UserLookupCache._MISSING
+
+    cache._entries["nadie@example.com"] = (None, time.time() - 1)
+    assert cache.get("nadie@example.com") is UserLookupCache._MISSING
+
+
+def test_cache_is_bounded():
+    cache = UserLookupCache(max_entries=2)
+    for name in ("a", "b", "c"):
+        cache.put(f"{name}@example.com", {"id": name})
+    assert cache.get("a@example.com") is UserLookupCache._MISSING
+    assert cache.stats()["entries"] == 2
+
+
+def test_concurrent_lookups_share_one_request():
+    graph = SlowGraph({"a@example.com": {"id": "a"}})
+    directory = AzureUserDirectory(graph, UserLookupCache())
+
+    async def scenario():
+        results = await asyncio.gather(*[directory.lookup(" A@example.com ") for _ in range(5)])
+        return results, await directory.lookup("a@example.com")
+
+    results, cached = asyncio.run(scenario())
+    assert results == [{"id": "a"}] * 5
+    assert cached == {"id": "a"}
+    assert graph.calls == ["a@example.com"]
+    assert directory._inflight == {}
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_lookup():
+    graph = SlowGraph({"a@example.com": {"id": "a"}}, delay=0.1)
+    directory = AzureUserDirectory(graph, UserLookupCache())
+
+    async def scenario():
+        first = asyncio.ensure_future(directory.lookup("a@example.com"))
+        second = asyncio.ensure_future(directory.lookup("a@example.com"))
+        await asyncio.sleep(0.02)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == {"id": "a"}
+    assert graph.calls == ["a@example.com"]
+
+
+def test_graph_errors_are_not_cached():
+    graph = SlowGraph({}, error=httpx.ConnectError("sin red"))
+    directory = AzureUserDirectory(graph, UserLookupCache())
+
+    async def scenario():
+        return [await directory.validate_user("a@example.com") for _ in range(2)]
+
+    assert asyncio.run(scenario()) == [False, False]
+    assert len(graph.calls) == 2
+    assert directory.errors == 2
+
+
+def test_unauthorized_response_renews_the_token_once():
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers["authorization"])
+        if request.headers["authorization"] == "Bearer viejo":
+            return httpx.Response(401)
+        return httpx.Response(200, json={"id": "a"})
+
+    tokens = StaticTokens()
+    client = GraphClient(tokens, base_url="https://graph.test/v1.0")
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=client.base_url)
+
+    async def scenario():
+        try:
+            return await client.get_user("a@example.com")
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(scenario()) == {"id": "a"}
+    assert seen == ["Bearer viejo", "Bearer nuevo"]
+    assert tokens.invalidated == 1
+    assert client.requests == 2
+
+
+def test_missing_user_returns_none():
+    client = GraphClient(StaticTokens(), base_url="https://graph.test/v1.0")
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(404)),
+                                       base_url=client.base_url)
+
+    async def scenario():
+        try:
+            return await client.get_user("nadie@example.com")
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(scenario()) is None
@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import pytest
+
+from job_queue import JOB_DONE, JOB_FAILED, JobManager, JobQueueFull
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_jobs_run_and_report_results():
+    async def scenario():
+        manager = JobManager(max_queue_size=5, workers=1)
+        await manager.start()
+
+        async def work(job):
+            job.set_progress(50, "a mitad")
+            return "resultado"
+
+        job = manager.submit("convert", work, meta={"filename": "a.pdf", "_private": 1})
+        await manager._queue.join()
+        await manager.stop()
+        return job
+
+    job = run(scenario())
+    assert job.status == JOB_DONE
+    assert job.result == "resultado"
+    assert job.progress == 100
+    data = job.to_dict()
+    assert data["filename"] == "a.pdf"
+    assert "_private" not in data
+
+
+def test_failed_job_keeps_error_status():
+    class Rejected(Exception):
+        status_code = 422
+        detail = "PDF protegido"
+
+    async def scenario():
+        manager = JobManager(max_queue_size=5, workers=1)
+        await manager.start()
+
+        async def work(job):
+            raise Rejected()
+
+        job = manager.submit("convert", work)
+        await manager._queue.join()
+        await manager.stop()
+        return job
+
+    job = run(scenario())
+    assert job.status == JOB_FAILED
+    assert job.error == "PDF protegido"
+    assert job.error_status == 422
+    assert job.to_dict()["error"] == "PDF protegido"
+
+
+def test_full_queue_raises_with_retry_after():
+    async def scenario():
+        manager = JobManager(max_queue_size=2, workers=1)
+        # Sin workers arrancados nada sale de la cola
+        manager._queue = asyncio.Queue(maxsize=manager.max_queue_size)
+        manager._avg_duration = 30.0
+
+        async def work(job):
+            return None
+
+        manager.submit("convert", work)
+        manager.submit("convert", work)
+        with pytest.raises(JobQueueFull) as exc:
+            manager.submit("convert", work)
+        return manager, exc.value
+
+    manager, error = run(scenario())
+    assert error.retry_after == 60
+    assert len(manager.jobs) == 2
+
+
+def test_submit_requires_started_manager():
+    manager = JobManager()
+    with pytest.raises(RuntimeError):
+        manager.submit("convert", lambda job: None)
+
+
+def test_expired_jobs_are_removed_with_their_files(tmp_path):
+    async def scenario():
+        manager = JobManager(max_queue_size=5, workers=1, result_ttl=60)
+        await manager.start()
+
+        async def work(job):
+            return None
+
+        old = manager.submit("convert", work, cleanup_paths=[str(tmp_path / "old.docx")])
+        recent = manager.submit("convert", work, cleanup_paths=[str(tmp_path / "recent.docx")])
+        await manager._queue.join()
+        await manager.stop()
+        return manager, old, recent
+
+    (tmp_path / "old.docx").write_bytes(b"x")
+    (tmp_path / "recent.docx").write_bytes(b"x")
+    manager, old, recent = run(scenario())
+    old.finished_at = time.time() - 120
+
+    assert manager.get(old.id) is None
+    assert manager.get(recent.id) is recent
+    assert not (tmp_path / "old.docx").exists()
+    assert (tmp_path / "recent.docx").exists()
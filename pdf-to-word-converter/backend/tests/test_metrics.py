@@ -0,0 +1,81 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from metrics import MetricsMiddleware, Registry, record_phase
+
+
+def test_counter_render_escapes_labels():
+    registry = Registry()
+    counter = registry.counter("pdf_errors_total", "Errores", ("reason",))
+    counter.inc(reason='PDF "roto"\nsin EOF')
+    counter.inc(2, reason="timeout")
+
+    assert registry.render().splitlines() == [
+        "# HELP pdf_errors_total Errores",
+        "# TYPE pdf_errors_total counter",
+        'pdf_errors_total{reason="PDF \\"roto\\"\\nsin EOF"} 1',
+        'pdf_errors_total{reason="timeout"} 2',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.histogram("pdf_seconds", "Duración", ("op",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(value, op="split")
+
+    lines = registry.render().splitlines()[2:]
+    assert lines == [
+        'pdf_seconds_bucket{op="split",le="0.1"} 1',
+        'pdf_seconds_bucket{op="split",le="1"} 3',
+        'pdf_seconds_bucket{op="split",le="+Inf"} 4',
+        'pdf_seconds_sum{op="split"} 4.25',
+        'pdf_seconds_count{op="split"} 4',
+    ]
+
+
+def test_callback_metrics_are_read_on_render():
+    registry = Registry()
+    depth = {"value": 3}
+    registry.gauge("pdf_queue_depth", "En cola", (), lambda: [({}, depth["value"])])
+    registry.counter_callback("pdf_crashes_total", "Caídas", ("engine",), lambda: [({"engine": "pdf"}, 2)])
+
+    depth["value"] = 5
+    text = registry.render()
+    assert "# TYPE pdf_queue_depth gauge\npdf_queue_depth 5\n" in text
+    assert '# TYPE pdf_crashes_total counter\npdf_crashes_total{engine="pdf"} 2\n' in text
+
+
+def test_middleware_labels_by_endpoint_and_phase():
+    registry = Registry()
+    requests_total = registry.counter("http_requests_total", "Peticiones", ("endpoint", "method", "status"))
+    duration = registry.histogram("http_seconds", "Duración", ("endpoint",))
+    phases = registry.histogram("http_phase_seconds", "Fases", ("endpoint", "phase"))
+    bytes_in = registry.counter("http_in_bytes_total", "Entrada", ("endpoint",))
+    bytes_out = registry.counter("http_out_bytes_total", "Salida", ("endpoint",))
+
+    app = FastAPI()
+
+    @app.post("/items/{item_id}")
+    async def update_item(item_id: int, request: Request):
+        await request.body()
+        record_phase("process", 0.2)
+        return {"id": item_id}
+
+    app.add_middleware(MetricsMiddleware, requests_total=requests_total, duration=duration, phases=phases,
+                       bytes_in=bytes_in, bytes_out=bytes_out)
+
+    with TestClient(app) as client:
+        assert client.post("/items/1", content=b"abcd").status_code == 200
+        assert client.post("/items/2", content=b"abcd").status_code == 200
+        assert client.get("/missing").status_code == 404
+        assert client.get("/metrics").status_code == 404
+
+    text = registry.render()
+    assert 'http_requests_total{endpoint="update_item",method="POST",status="200"} 2' in text
+    assert 'http_requests_total{endpoint="not_found",method="GET",status="404"} 1' in text
+    assert 'http_phase_seconds_count{endpoint="update_item",phase="process"} 2' in text
+    assert 'http_phase_seconds_count{endpoint="update_item",phase="respond"} 2' in text
+    assert 'http_phase_seconds_count{endpoint="update_item",phase="upload"} 2' in text
+    assert 'http_in_bytes_total{endpoint="update_item"} 8' in text
+    assert 'http_out_bytes_total{endpoint="update_item"} 16' in text
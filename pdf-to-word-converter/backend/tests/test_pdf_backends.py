@@ -0,0 +1,55 @@
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from pdf_backends import PRUNE_MIN_RESOURCES, _used_resources
+
+
+def make_page(content: bytes, xobjects: int, form_without_resources: bool = False):
+    """Página con ``xobjects`` imágenes en /Resources y ``content`` como contenido"""
+    writer = PdfWriter()
+    page = writer.add_blank_page(100, 100)
+    entries = DictionaryObject()
+    for i in range(xobjects):
+        xobject = DecodedStreamObject()
+        xobject.update({NameObject("/Type"): NameObject("/XObject"), NameObject("/Subtype"): NameObject("/Image")})
+        entries[NameObject(f"/Im{i}")] = writer._add_object(xobject)
+    if form_without_resources:
+        form = DecodedStreamObject()
+        form.update({NameObject("/Type"): NameObject("/XObject"), NameObject("/Subtype"): NameObject("/Form")})
+        entries[NameObject("/Fm0")] = writer._add_object(form)
+    font = DictionaryObject({NameObject("/F1"): DictionaryObject({NameObject("/Type"): NameObject("/Font")})})
+    page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/XObject"): entries,
+        NameObject("/Font"): font,
+        NameObject("/ProcSet"): NameObject("/PDF"),
+    })
+    contents = DecodedStreamObject()
+    contents.set_data(content)
+    page[NameObject("/Contents")] = writer._add_object(contents)
+    return page
+
+
+def test_prunes_unused_xobjects():
+    page = make_page(b"q 10 0 0 10 0 0 cm /Im3 Do Q BT /F1 12 Tf (hola) Tj ET", PRUNE_MIN_RESOURCES + 4)
+    pruned = _used_resources(page)
+    assert list(pruned["/XObject"].keys()) == ["/Im3"]
+    assert list(pruned["/Font"].keys()) == ["/F1"]
+    # Lo que no se referencia por nombre se copia tal cual
+    assert pruned["/ProcSet"] == "/PDF"
+
+
+def test_small_resources_are_not_pruned():
+    page = make_page(b"/Im0 Do", PRUNE_MIN_RESOURCES - 2)
+    assert _used_resources(page) is None
+
+
+def test_page_without_resources():
+    writer = PdfWriter()
+    page = writer.add_blank_page(100, 100)
+    assert _used_resources(page) is None
+
+
+def test_inherited_form_resources_disable_pruning():
+    # Un Form sin /Resources propio usa los de la página: no se puede podar
+    page = make_page(b"/Fm0 Do", PRUNE_MIN_RESOURCES + 4, form_without_resources=True)
+    assert _used_resources(page) is None
@@ -0,0 +1,79 @@
+import pytest
+
+import prescan
+from prescan import IMAGE_HEAVY_SETTINGS, classify, plan_route
+
+
+def scan(profile="text", page_count=10, **overrides):
+    return {"readable": True, "encrypted": False, "page_count": page_count, "profile": profile, **overrides}
+
+
+@pytest.mark.parametrize("chars, text_ratio, coverage, images, expected", [
+    (0, 0.0, 0.9, 1, "scanned"),
+    (0, 0.0, 0.0, 0, "empty"),
+    (1500, 1.0, 0.7, 1, "image_heavy"),
+    (800, 1.0, 0.1, 3, "image_heavy"),
+    (800, 1.0, 0.1, 0.5, "mixed"),
+    (2000, 1.0, 0.0, 0, "text"),
+])
+def test_classify(chars, text_ratio, coverage, images, expected):
+    assert classify(chars, text_ratio, coverage, images) == expected
+
+
+@pytest.mark.parametrize("overrides, status_code", [
+    ({"readable": False}, 400),
+    ({"encrypted": True}, 422),
+    ({"page_count": 0}, 422),
+    ({"profile": "scanned"}, 422),
+])
+def test_plan_route_rejects(overrides, status_code):
+    route = plan_route(scan(**overrides))
+    assert not route["accepted"]
+    assert route["engine"] is None
+    assert route["status_code"] == status_code
+
+
+def test_plan_route_rejects_too_many_pages(monkeypatch):
+    monkeypatch.setattr(prescan, "CONVERSION_MAX_PAGES", 100)
+    assert not plan_route(scan(page_count=101))["accepted"]
+    assert plan_route(scan(page_count=100))["accepted"]
+
+
+def test_plan_route_balanced_image_heavy_settings():
+    route = plan_route(scan("image_heavy"))
+    assert route["engine"] == "pdf2docx"
+    assert route["settings"] == IMAGE_HEAVY_SETTINGS
+
+
+def test_plan_route_full_keeps_pdf2docx_defaults():
+    route = plan_route(scan("image_heavy"), mode="full")
+    assert route["engine"] == "pdf2docx"
+    assert route["settings"] == {}
+    assert "modo full" in route["reason"]
+
+
+def test_plan_route_fast_uses_text_engine():
+    assert plan_route(scan("mixed"), "auto", mode="fast")["engine"] == "text"
+    assert plan_route(scan(), "pdf2docx", mode="fast")["engine"] == "text"
+    # LibreOffice pedido explícitamente se respeta
+    assert plan_route(scan(), "libreoffice", True, mode="fast")["engine"] == "libreoffice"
+
+
+def test_plan_route_libreoffice_routing_is_opt_in(monkeypatch):
+    long_text = scan(page_count=prescan.PRESCAN_LIBREOFFICE_MIN_PAGES)
+    monkeypatch.setattr(prescan, "PRESCAN_LIBREOFFICE_ROUTING", False)
+    assert plan_route(long_text, "auto", libreoffice_available=True)["engine"] == "pdf2docx"
+
+    monkeypatch.setattr(prescan, "PRESCAN_LIBREOFFICE_ROUTING", True)
+    assert plan_route(long_text, "auto", libreoffice_available=True)["engine"] == "libreoffice"
+    assert plan_route(long_text, "auto", libreoffice_available=False)["engine"] == "pdf2docx"
+    assert plan_route(long_text, "auto", libreoffice_available=True, mode="full")["engine"] == "pdf2docx"
+    short_text = scan(page_count=prescan.PRESCAN_LIBREOFFICE_MIN_PAGES - 1)
+    assert plan_route(short_text, "auto", libreoffice_available=True)["engine"] == "pdf2docx"
+
+
+def test_plan_route_requested_engine_is_respected():
+    route = plan_route(scan("image_heavy"), "libreoffice", True)
+    assert route["engine"] == "libreoffice"
+    assert route["settings"] == {}
+    assert route["reason"] == "motor pedido"
@@ -0,0 +1,63 @@
+import os
+import time
+
+from result_cache import ResultCache
+
+
+def make_file(directory, name, size):
+    path = directory / name
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def test_hit_links_a_copy_that_survives_removal(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=1000, ttl=60)
+    key = ResultCache.make_key("abc", "1.0", {"mode": "balanced"})
+    cache.put(key, make_file(tmp_path, "converted.docx", 100))
+
+    dest = str(tmp_path / "out.docx")
+    assert cache.get(key, dest) == dest
+    os.remove(dest)
+    assert cache.get(key, dest) == dest
+    assert cache.get(ResultCache.make_key("abc", "1.0", {"mode": "fast"}), dest) is None
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_quota_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=250, ttl=60)
+    for key in ("a", "b"):
+        cache.put(key, make_file(tmp_path, f"{key}.docx", 100))
+    # "a" pasa a ser la más reciente
+    assert cache.get("a", str(tmp_path / "hit.docx"))
+    cache.put("c", make_file(tmp_path, "c.docx", 100))
+
+    assert cache.get("b", str(tmp_path / "miss.docx")) is None
+    assert cache.get("a", str(tmp_path / "a_out.docx"))
+    assert cache.stats()["bytes"] == 200
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=1000, ttl=60)
+    cache.put("a", make_file(tmp_path, "a.docx", 100))
+    cache._entries["a"] = (100, time.time() - 120)
+
+    assert cache.get("a", str(tmp_path / "out.docx")) is None
+    assert not (tmp_path / "cache" / "a.docx").exists()
+    assert cache.stats()["entries"] == 0
+
+
+def test_files_larger_than_the_cache_are_skipped(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=50, ttl=60)
+    cache.put("a", make_file(tmp_path, "a.docx", 100))
+    assert cache.stats()["entries"] == 0
+
+
+def test_index_is_rebuilt_from_disk(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=1000, ttl=60)
+    cache.put("a", make_file(tmp_path, "a.docx", 100))
+
+    reloaded = ResultCache(tmp_path / "cache", max_bytes=1000, ttl=60)
+    assert reloaded.stats()["bytes"] == 100
+    assert reloaded.get("a", str(tmp_path / "out.docx"))
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from result_store import MemoryResultStore, ResultStore, SQLiteResultStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(ttl=60, max_bytes=1000):
+        if request.param == "sqlite":
+            return SQLiteResultStore(tmp_path / "results.db", ttl, max_bytes)
+        return MemoryResultStore(ttl, max_bytes)
+    return make
+
+
+def converted(tmp_path, name, size=100):
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def test_put_get_delete(make_store, tmp_path):
+    store = make_store()
+    path = converted(tmp_path, "a.docx")
+    store.put("a", path, "a.docx", "user@example.com")
+
+    entry = store.get("a")
+    assert entry["path"] == path
+    assert entry["size"] == 100
+    assert store.active_paths() == {path}
+
+    store.delete("a")
+    assert store.get("a") is None
+    assert not (tmp_path / "a.docx").exists()
+
+
+def test_expired_entries_are_swept_with_their_files(make_store, tmp_path):
+    store = make_store()
+    store.put("old", converted(tmp_path, "old.docx"), "old.docx", "user@example.com", ttl=1)
+    store.put("new", converted(tmp_path, "new.docx"), "new.docx", "user@example.com")
+
+    report = store.sweep()
+    assert report == {"removed": 0, "bytes_freed": 0}
+
+    time.sleep(1.1)
+    report = store.sweep()
+    assert report == {"removed": 1, "bytes_freed": 100}
+    assert not (tmp_path / "old.docx").exists()
+    assert store.get("new") is not None
+    assert store.stats()["swept"] == 1
+
+
+def test_quota_evicts_oldest_first(make_store, tmp_path):
+    store = make_store(max_bytes=250)
+    for name in ("a", "b", "c"):
+        store.put(name, converted(tmp_path, f"{name}.docx"), f"{name}.docx", "user@example.com")
+
+    assert store.get("a") is None
+    assert store.get("b") is not None
+    assert store.get("c") is not None
+    stats = store.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] == 200
+    assert stats["evicted"] == 1
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    writer = SQLiteResultStore(tmp_path / "results.db", 60, 1000)
+    reader = SQLiteResultStore(tmp_path / "results.db", 60, 1000)
+    writer.put("a", converted(tmp_path, "a.docx"), "a.docx", "user@example.com")
+
+    assert reader.get("a")["filename"] == "a.docx"
+    reader.delete("a")
+    assert writer.get("a") is None
+
+
+def test_incomplete_backend_cannot_be_instantiated():
+    class Incomplete(ResultStore):
+        name = "incomplete"
+
+        def _insert(self, entry):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete(60, 1000)
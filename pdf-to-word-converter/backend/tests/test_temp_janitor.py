@@ -0,0 +1,126 @@
+import os
+import time
+
+import pytest
+
+from temp_janitor import InUsePaths, TempDirJanitor, in_use_paths
+
+
+def touch(directory, name, size, age):
+    path = directory / name
+    path.write_bytes(b"x" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def remaining(directory):
+    return sorted(p.name for p in directory.iterdir() if p.is_file())
+
+
+def test_quota_evicts_oldest_first(tmp_path):
+    touch(tmp_path, "input_old.pdf", 100, age=4000)
+    touch(tmp_path, "input_mid.pdf", 100, age=3000)
+    touch(tmp_path, "input_new.pdf", 100, age=2000)
+    janitor = TempDirJanitor(tmp_path, max_age=10_000, max_bytes=150, min_age=60)
+
+    report = janitor.run_once()
+
+    assert remaining(tmp_path) == ["input_new.pdf"]
+    assert report["evicted"] == 2
+    assert report["expired"] == 0
+    assert report["bytes_reclaimed"] == 200
+    assert report["bytes_remaining"] == 100
+
+
+def test_expired_files_go_before_the_quota(tmp_path):
+    touch(tmp_path, "merged_expired.pdf", 100, age=5000)
+    touch(tmp_path, "merged_recent.pdf", 100, age=100)
+    janitor = TempDirJanitor(tmp_path, max_age=1000, max_bytes=150, min_age=60)
+
+    report = janitor.run_once()
+
+    assert remaining(tmp_path) == ["merged_recent.pdf"]
+    assert (report["expired"], report["evicted"]) == (1, 0)
+
+
+def test_quota_never_touches_recent_protected_or_foreign_files(tmp_path):
+    touch(tmp_path, "input_recent.pdf", 100, age=10)
+    protected = touch(tmp_path, "converted_pending.docx", 100, age=3000)
+    touch(tmp_path, "otro_archivo.bin", 100, age=3000)
+    touch(tmp_path, "input_old.pdf", 100, age=3000)
+    (tmp_path / "cache").mkdir()
+    janitor = TempDirJanitor(tmp_path, max_age=10_000, max_bytes=0, min_age=60,
+                             protected=lambda: {str(protected)})
+
+    report = janitor.run_once()
+
+    assert remaining(tmp_path) == ["converted_pending.docx", "input_recent.pdf", "otro_archivo.bin"]
+    assert report["evicted"] == 1
+    assert report["bytes_remaining"] == 200
+
+
+def test_in_use_paths_are_protected(tmp_path):
+    in_flight = touch(tmp_path, "input_in_flight.pdf", 100, age=3000)
+    touch(tmp_path, "input_done.pdf", 100, age=2000)
+    janitor = TempDirJanitor(tmp_path, max_age=1000, max_bytes=0, min_age=60)
+
+    in_use_paths.add(str(in_flight))
+    try:
+        janitor.run_once()
+        assert remaining(tmp_path) == ["input_in_flight.pdf"]
+    finally:
+        in_use_paths.discard(str(in_flight))
+
+    janitor.run_once()
+    assert remaining(tmp_path) == []
+
+
+def test_in_use_paths_count_references(tmp_path):
+    paths = InUsePaths()
+    path = str(tmp_path / "input_a.pdf")
+    paths.add(path)
+    paths.add(path)
+    paths.discard(path)
+    assert paths.snapshot() == {os.path.abspath(path)}
+    paths.discard(path)
+    assert paths.snapshot() == set()
+
+
+def test_two_workers_share_a_temp_dir(tmp_path):
+    # Cada worker de uvicorn tiene su janitor y su registro de archivos en uso
+    uploads_a, uploads_b = InUsePaths(), InUsePaths()
+    in_flight = touch(tmp_path, "input_long_conversion.pdf", 100, age=3000)
+    queued = touch(tmp_path, "job_input_queued.pdf", 100, age=3000)
+    touch(tmp_path, "input_finished.pdf", 100, age=2000)
+    uploads_a.add(str(in_flight))
+    worker_a = TempDirJanitor(tmp_path, max_age=10_000, max_bytes=0, min_age=60,
+                              in_use=uploads_a, keepalive=lambda: {str(queued)})
+    worker_b = TempDirJanitor(tmp_path, max_age=10_000, max_bytes=0, min_age=60, in_use=uploads_b)
+
+    # Sin latido, el janitor de B borraría lo que usa A
+    assert worker_a.heartbeat() == 2
+    report = worker_b.run_once()
+
+    assert remaining(tmp_path) == ["input_long_conversion.pdf", "job_input_queued.pdf"]
+    assert report["evicted"] == 1
+
+    # Cuando A termina y deja de refrescarlos, B los recupera
+    uploads_a.discard(str(in_flight))
+    for path in (in_flight, queued):
+        os.utime(path, (time.time() - 3000,) * 2)
+    worker_b.run_once()
+    assert remaining(tmp_path) == []
+
+
+def test_heartbeat_ignores_files_already_removed(tmp_path):
+    paths = InUsePaths()
+    paths.add(str(tmp_path / "input_gone.pdf"))
+    janitor = TempDirJanitor(tmp_path, max_age=1000, max_bytes=0, min_age=60, in_use=paths)
+    assert janitor.heartbeat() == 0
+
+
+@pytest.fixture(autouse=True)
+def no_leaked_in_use_paths():
+    yield
+    assert in_use_paths.snapshot() == set()
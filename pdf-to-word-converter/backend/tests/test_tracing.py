@@ -0,0 +1,56 @@
+import asyncio
+import os
+import time
+
+import httpx
+
+from tracing import TracingMiddleware, prune_profiles
+
+
+def make_profile(directory, name, age):
+    path = directory / f"{name}.prof"
+    path.write_bytes(b"x")
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_prune_profiles_by_age_and_count(tmp_path):
+    for name, age in [("a", 10), ("b", 20), ("c", 30), ("old", 5000)]:
+        make_profile(tmp_path, name, age)
+    (tmp_path / "notes.txt").write_text("no es un perfil")
+
+    assert prune_profiles(tmp_path, max_files=2, max_age=1000) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.prof", "b.prof", "notes.txt"]
+
+
+def test_concurrent_profile_requests_get_409(tmp_path):
+    release = asyncio.Event()
+    started = asyncio.Event()
+
+    async def app(scope, receive, send):
+        started.set()
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = TracingMiddleware(app, profile_dir=tmp_path, profiling_enabled=True, profile_max_files=1)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=middleware)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.ensure_future(client.get("/", headers={"X-Profile": "1"}))
+            await started.wait()
+            second = await client.get("/", headers={"X-Profile": "1"})
+            release.set()
+            first = await first
+            third = await client.get("/", headers={"X-Profile": "1"})
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+
+    assert first.status_code == 200
+    assert "x-profile-id" in first.headers
+    assert second.status_code == 409
+    assert third.status_code == 200
+    assert [p.stem for p in tmp_path.glob("*.prof")] == [third.headers["x-profile-id"]]
@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+import io
+
+import httpx
+import pytest
+from fastapi import HTTPException, UploadFile
+
+import uploads
+from uploads import UploadLimitMiddleware, save_upload
+
+PDF = b"%PDF-1.7\n" + b"x" * 5000
+
+
+def upload(content, filename="a.pdf", size=None):
+    return UploadFile(io.BytesIO(content), filename=filename, size=size)
+
+
+def save(content, dest, **kwargs):
+    return asyncio.run(save_upload(upload(content), dest, **kwargs))
+
+
+def test_saves_the_file_and_its_hash(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 1024)
+    dest = tmp_path / "input.pdf"
+
+    saved = save(PDF, dest)
+
+    assert dest.read_bytes() == PDF
+    assert saved.size == len(PDF)
+    assert saved.sha256 == hashlib.sha256(PDF).hexdigest()
+    assert str(saved) == str(dest)
+
+
+def test_rejects_files_that_are_not_pdfs(tmp_path):
+    dest = tmp_path / "input.pdf"
+    with pytest.raises(HTTPException) as exc:
+        save(b"PK\x03\x04 no soy un pdf", dest)
+    assert exc.value.status_code == 400
+    assert not dest.exists()
+
+    # Fuera de los PDF no se mira la cabecera
+    assert save(b"PK\x03\x04", tmp_path / "batch.zip", require_pdf=False).size == 4
+
+
+def test_rejects_empty_files(tmp_path):
+    with pytest.raises(HTTPException) as exc:
+        save(b"", tmp_path / "input.pdf")
+    assert exc.value.status_code == 400
+
+
+def test_oversized_stream_removes_the_partial_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 1024)
+    dest = tmp_path / "input.pdf"
+    with pytest.raises(HTTPException) as exc:
+        save(PDF, dest, max_bytes=2048)
+    assert exc.value.status_code == 413
+    assert not dest.exists()
+
+
+def test_known_size_is_rejected_before_writing(tmp_path):
+    dest = tmp_path / "input.pdf"
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(save_upload(upload(PDF, size=len(PDF)), dest, max_bytes=1024))
+    assert exc.value.status_code == 413
+    assert not dest.exists()
+
+
+def test_middleware_rejects_by_content_length():
+    reached = []
+
+    async def app(scope, receive, send):
+        reached.append(scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = UploadLimitMiddleware(app, default_max_bytes=1024, limits={"/batch": 4096})
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=middleware)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [
+                (await client.post("/convert", content=b"x" * 2000)).status_code,
+                (await client.post("/batch", content=b"x" * 2000)).status_code,
+                (await client.post("/convert", content=b"x" * 100)).status_code,
+            ]
+
+    assert asyncio.run(scenario()) == [413, 200, 200]
+    assert reached == ["/batch", "/convert"]
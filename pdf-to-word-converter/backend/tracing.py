@@ -0,0 +1,329 @@
+import io
+import os
+import time
+import uuid
+import pstats
+import logging
+import cProfile
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """Una etapa medida: nombre, inicio (epoch), duración y atributos"""
+
+    __slots__ = ("name", "start", "duration", "attributes", "parent")
+
+    def __init__(self, name: str, start: float, duration: float, attributes: Dict[str, Any], parent: Optional[str]):
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.attributes = attributes
+        self.parent = parent
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "parent": self.parent,
+        }
+
+
+# Callbacks globales: listener(span) al cerrar cada span
+_listeners: List[Callable[[Span], None]] = []
+# Spans de la petición / trabajo actual (None = no se recogen)
+_collector: contextvars.ContextVar[Optional[List[Span]]] = contextvars.ContextVar("span_collector", default=None)
+# Nombre del span abierto (para anidar)
+_current: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_span", default=None)
+# Dentro de un worker los spans sólo se recogen: los listeners se llaman al reemitirlos
+_capture_only: contextvars.ContextVar[bool] = contextvars.ContextVar("span_capture_only", default=False)
+# Perfil cProfile de la petición actual
+_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar("request_profile", default=None)
+
+_otel_tracer = None
+if os.getenv("TRACING_OTEL", "false").lower() == "true":
+    try:
+        from opentelemetry import trace as otel_trace
+        _otel_tracer = otel_trace.get_tracer("pdf-tools")
+    except ImportError:
+        logger.warning("TRACING_OTEL=true pero opentelemetry no está instalado")
+
+
+def add_span_listener(listener: Callable[[Span], None]):
+    _listeners.append(listener)
+
+
+def remove_span_listener(listener: Callable[[Span], None]):
+    _listeners.remove(listener)
+
+
+def tracing_active() -> bool:
+    return bool(_listeners) or _collector.get() is not None or _otel_tracer is not None
+
+
+def _emit(record: Span):
+    collector = _collector.get()
+    if collector is not None:
+        collector.append(record)
+        if _capture_only.get():
+            return
+    for listener in _listeners:
+        try:
+            listener(record)
+        except Exception as e:
+            logger.warning(f"Listener de tracing falló: {e}")
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """🔎 Mide una etapa; sin listeners ni colector activo no cuesta casi nada
+
+    Compatible con OpenTelemetry: con ``TRACING_OTEL=true`` cada span se
+    abre también como span de OTel en el proceso actual.
+    """
+    if not tracing_active():
+        yield attributes
+        return
+
+    parent = _current.get()
+    token = _current.set(name)
+    start_wall = time.time()
+    start = time.perf_counter()
+    otel_span = _otel_tracer.start_as_current_span(name, attributes=attributes) if _otel_tracer else None
+    try:
+        if otel_span is not None:
+            with otel_span:
+                yield attributes
+        else:
+            yield attributes
+    finally:
+        _current.reset(token)
+        _emit(Span(name, start_wall, time.perf_counter() - start, attributes, parent))
+
+
+@contextmanager
+def collect_spans(capture_only: bool = False):
+    """Recoge los spans del bloque; ``capture_only`` no avisa a los listeners"""
+    spans: List[Span] = []
+    token = _collector.set(spans)
+    capture_token = _capture_only.set(capture_only)
+    try:
+        yield spans
+    finally:
+        _capture_only.reset(capture_token)
+        _collector.reset(token)
+
+
+def replay(spans: List[Span]):
+    """Reemite en este proceso los spans recogidos en un worker"""
+    parent = _current.get()
+    for record in spans:
+        if record.parent is None:
+            record.parent = parent
+        _emit(record)
+
+
+def server_timing(spans: List[Span]) -> str:
+    """Cabecera Server-Timing con la duración acumulada de cada etapa"""
+    totals: Dict[str, list] = {}
+    for record in spans:
+        entry = totals.setdefault(record.name, [0.0, 0])
+        entry[0] += record.duration
+        entry[1] += 1
+    return ", ".join(
+        f'{name.replace(".", "-")};dur={total * 1000:.1f};desc="x{count}"'
+        for name, (total, count) in totals.items()
+    )
+
+
+# ============================================
+# Perfilado por petición (cProfile)
+# ============================================
+
+class _WorkerStats:
+    """Adaptador para pstats.Stats.add() con estadísticas llegadas de un worker"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class RequestProfile:
+    """cProfile de una petición más los perfiles de sus trabajos en workers
+
+    El perfil del proceso principal cubre el thread del event loop entero,
+    así que puede incluir trabajo de otras peticiones concurrentes.
+    """
+
+    def __init__(self, profile_id: str):
+        self.profile_id = profile_id
+        self.profiler = cProfile.Profile()
+        self.worker_stats: List[dict] = []
+
+    def save(self, profile_dir: Path) -> Path:
+        self.profiler.create_stats()
+        stats = pstats.Stats(self.profiler)
+        for worker_stats in self.worker_stats:
+            stats.add(_WorkerStats(worker_stats))
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        path = profile_dir / f"{self.profile_id}.prof"
+        stats.dump_stats(str(path))
+        return path
+
+
+def profiling_active() -> bool:
+    return _profile.get() is not None
+
+
+def add_worker_profile(stats: Optional[dict]):
+    profile = _profile.get()
+    if profile is not None and stats:
+        profile.worker_stats.append(stats)
+
+
+def prune_profiles(profile_dir: Path, max_files: int, max_age: float) -> int:
+    """🧹 Borra los ``.prof`` más viejos que ``max_age`` y los que sobran de ``max_files``
+
+    Devuelve cuántos perfiles se borraron.
+    """
+    profiles = []
+    for path in profile_dir.glob("*.prof"):
+        try:
+            profiles.append((path.stat().st_mtime, path))
+        except FileNotFoundError:
+            continue
+    profiles.sort(reverse=True)
+    cutoff = time.time() - max_age
+    removed = 0
+    for index, (mtime, path) in enumerate(profiles):
+        if index >= max_files or mtime < cutoff:
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def profile_report(path: Path, limit: int = 40, sort: str = "cumulative") -> str:
+    """Resumen de texto de un perfil guardado"""
+    output = io.StringIO()
+    pstats.Stats(str(path), stream=output).sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+def run_traced(func: Callable, args: tuple, kwargs: dict, trace: bool, profile: bool):
+    """Ejecuta ``func`` recogiendo spans y/o perfil (lado worker)
+
+    Devuelve ``(resultado, spans, estadísticas de cProfile o None)``.
+    """
+    profiler = cProfile.Profile() if profile else None
+    with collect_spans(capture_only=True) if trace else _no_spans() as spans:
+        if profiler:
+            profiler.enable()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            if profiler:
+                profiler.disable()
+    stats = None
+    if profiler:
+        profiler.create_stats()
+        stats = profiler.stats
+    return result, spans, stats
+
+
+@contextmanager
+def _no_spans():
+    yield []
+
+
+# ============================================
+# Middleware: X-Trace y X-Profile por petición
+# ============================================
+
+class TracingMiddleware:
+    """Middleware ASGI que activa tracing y perfilado por cabecera
+
+    - ``X-Trace: 1`` recoge los spans de la petición (incluidos los de los
+      workers) y los devuelve resumidos en la cabecera ``Server-Timing``.
+    - ``X-Profile: 1`` (sólo si ``profiling_enabled``) perfila la petición
+      con cProfile, guarda el ``.prof`` en ``profile_dir`` y devuelve su id
+      en ``X-Profile-Id``.
+
+    cProfile sólo admite un perfilador activo por thread y todas las
+    peticiones comparten el del event loop: mientras hay un perfil en curso
+    otra petición con ``X-Profile`` recibe 409. Tras guardar cada perfil se
+    podan los de ``profile_dir`` por antigüedad (``profile_max_age``
+    segundos) y cantidad (``profile_max_files``).
+    """
+
+    def __init__(self, app, profile_dir: Path, profiling_enabled: bool = False,
+                 profile_max_files: int = 50, profile_max_age: float = 86400):
+        self.app = app
+        self.profile_dir = Path(profile_dir)
+        self.profiling_enabled = profiling_enabled
+        self.profile_max_files = profile_max_files
+        self.profile_max_age = profile_max_age
+        self._profiling = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        trace = headers.get(b"x-trace", b"").lower() in (b"1", b"true")
+        profile = self.profiling_enabled and headers.get(b"x-profile", b"").lower() in (b"1", b"true")
+        if not trace and not profile:
+            await self.app(scope, receive, send)
+            return
+        if profile and self._profiling:
+            response = JSONResponse(status_code=409, content={"detail": "Ya hay una petición perfilándose, reintenta después"})
+            await response(scope, receive, send)
+            return
+
+        spans: List[Span] = []
+        collector_token = _collector.set(spans) if trace else None
+        request_profile = RequestProfile(uuid.uuid4().hex) if profile else None
+        profile_token = _profile.set(request_profile) if profile else None
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                extra = []
+                if trace and spans:
+                    extra.append((b"server-timing", server_timing(spans).encode()))
+                if profile:
+                    extra.append((b"x-profile-id", request_profile.profile_id.encode()))
+                if extra:
+                    message = {**message, "headers": list(message.get("headers", [])) + extra}
+            await send(message)
+
+        if request_profile:
+            self._profiling = True
+            request_profile.profiler.enable()
+        try:
+            with span("http.request", path=scope["path"], method=scope["method"]):
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            if request_profile:
+                request_profile.profiler.disable()
+                self._profiling = False
+                path = request_profile.save(self.profile_dir)
+                logger.info(f"🔬 Perfil guardado: {path}")
+                removed = prune_profiles(self.profile_dir, self.profile_max_files, self.profile_max_age)
+                if removed:
+                    logger.info(f"🧹 Perfiles antiguos borrados: {removed}")
+                _profile.reset(profile_token)
+            if collector_token is not None:
+                _collector.reset(collector_token)
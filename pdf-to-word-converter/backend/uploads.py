@@ -0,0 +1,136 @@
+import os
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from metrics import request_phase
+from temp_janitor import track_in_use
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de bloque al copiar la subida a disco
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# Tamaño máximo por archivo subido (MB)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "100")) * 1024 * 1024
+
+# Cuerpo máximo de una petición con un solo archivo: el archivo más los
+# campos y cabeceras del multipart
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Cuerpo máximo de las peticiones de varios archivos (lotes, unión) (MB)
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_MB", "2048")) * 1024 * 1024
+
+# Cabecera de un PDF; la especificación tolera basura antes de ella en el primer KB
+PDF_MAGIC = b"%PDF-"
+PDF_MAGIC_WINDOW = 1024
+
+
+class SavedUpload:
+    """📥 Archivo subido ya persistido en disco"""
+
+    def __init__(self, path: Path, filename: str, size: int, sha256: str):
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+
+    def __str__(self):
+        return str(self.path)
+
+
+async def save_upload(file: UploadFile, dest: Path, max_bytes: int = MAX_UPLOAD_BYTES,
+                      require_pdf: bool = True) -> SavedUpload:
+    """💾 Copia la subida a ``dest`` por bloques sin cargarla entera en memoria
+
+    - Rechaza con 413 en cuanto se supera ``max_bytes``.
+    - Comprueba la cabecera ``%PDF-`` en el primer bloque.
+    - Calcula el SHA-256 mientras copia.
+    Si algo falla, el archivo parcial se elimina. ``dest`` queda marcado en
+    uso hasta que termina la petición, para que el janitor no lo borre.
+    """
+    track_in_use(dest)
+    with request_phase("upload"):
+        return await _copy_upload(file, dest, max_bytes, require_pdf)
+
+
+async def _copy_upload(file: UploadFile, dest: Path, max_bytes: int, require_pdf: bool) -> SavedUpload:
+    # Rechazo temprano si el tamaño ya es conocido
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"'{file.filename}' supera el tamaño máximo de {max_bytes // (1024 * 1024)} MB"
+        )
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest, "wb") as buffer:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                if size == 0 and require_pdf and PDF_MAGIC not in chunk[:PDF_MAGIC_WINDOW]:
+                    raise HTTPException(status_code=400, detail=f"'{file.filename}' no es un PDF válido")
+
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"'{file.filename}' supera el tamaño máximo de {max_bytes // (1024 * 1024)} MB"
+                    )
+
+                digest.update(chunk)
+                buffer.write(chunk)
+
+        if size == 0:
+            raise HTTPException(status_code=400, detail=f"El archivo está vacío: {file.filename}")
+
+    except BaseException:
+        try:
+            if os.path.exists(dest):
+                os.remove(dest)
+        except OSError as e:
+            logger.warning(f"No se pudo eliminar la subida parcial {dest}: {e}")
+        raise
+
+    logger.info(f"📥 Subida guardada: {file.filename} ({size / 1024 / 1024:.2f} MB)")
+    return SavedUpload(Path(dest), file.filename, size, digest.hexdigest())
+
+
+class UploadLimitMiddleware:
+    """Middleware ASGI: 413 inmediato si ``Content-Length`` supera el límite
+
+    Se comprueba antes de que FastAPI parsee el formulario, así una subida
+    demasiado grande no se llega a recibir ni a escribir en disco. El límite
+    es ``limits[path]`` o ``default_max_bytes``. Los cuerpos sin
+    ``Content-Length`` (chunked) los sigue cortando ``save_upload`` bloque
+    a bloque.
+    """
+
+    def __init__(self, app, default_max_bytes: int, limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.default_max_bytes = default_max_bytes
+        self.limits = limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope.get("headers") or []).get(b"content-length")
+        max_bytes = self.limits.get(scope["path"], self.default_max_bytes)
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_bytes:
+            logger.warning(f"⛔ Petición rechazada por tamaño: {scope['path']} ({int(content_length) / 1024 / 1024:.1f} MB)")
+            response = JSONResponse(
+                status_code=413,
+                content={"detail": f"La petición supera el tamaño máximo de {max_bytes // (1024 * 1024)} MB"},
+                headers={"Connection": "close"}
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,49 @@
+import io
+import asyncio
+import zipfile
+from typing import AsyncIterator, Tuple
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Destino no seekable para ZipFile: acumula bytes hasta que se drenan"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def stream_zip(parts: AsyncIterator[Tuple[str, bytes]],
+                     compression: int = zipfile.ZIP_STORED) -> AsyncIterator[bytes]:
+    """📦 Genera un ZIP al vuelo a partir de (nombre, contenido)
+
+    Cada parte se escribe en cuanto llega y sus bytes salen inmediatamente,
+    sin archivo intermedio en disco. Con ZIP_STORED (por defecto, los PDF ya
+    van comprimidos) escribir es poco más que copiar; si se pide
+    ZIP_DEFLATED la compresión se hace fuera del event loop.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=compression) as zip_file:
+        async for name, data in parts:
+            if compression == zipfile.ZIP_STORED:
+                zip_file.writestr(name, data)
+            else:
+                await asyncio.to_thread(zip_file.writestr, name, data)
+            yield buffer.drain()
+    # Directorio central al cerrar
+    yield buffer.drain()
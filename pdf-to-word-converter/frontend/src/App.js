@@ -16,6 +16,7 @@ const PdfToolsSuite = () => {
   const [error, setError] = useState(null);
   const [success, setSuccess] = useState(false);
   const [pdfInfo, setPdfInfo] = useState(null);
+  const [documentId, setDocumentId] = useState(null); // PDF ya subido (/documents)
   
   // Estados específicos para herramientas
   const [splitRanges, setSplitRanges] = useState([[1, 1]]);
@@ -142,10 +143,11 @@ const PdfToolsSuite = () => {
       setSuccess(false);
       setDownloadUrl(null);
       setPdfInfo(null);
+      setDocumentId(null);
       
-      // Obtener información del PDF automáticamente
+      // Subir el PDF una sola vez: devuelve su id y la información
       if (selectedTool !== 'merge') {
-        getPdfInfo(selectedFile);
+        uploadDocument(selectedFile);
       }
     } else {
       setError('Por favor selecciona un archivo PDF válido');
@@ -197,7 +199,8 @@ const PdfToolsSuite = () => {
         setSuccess(false);
         setDownloadUrl(null);
         setPdfInfo(null);
-        getPdfInfo(droppedFile);
+        setDocumentId(null);
+        uploadDocument(droppedFile);
       } else {
         setError('Por favor arrastra un archivo PDF válido');
       }
@@ -222,19 +225,20 @@ const PdfToolsSuite = () => {
     return interval;
   };
 
-  const getPdfInfo = async (file) => {
+  const uploadDocument = async (file) => {
     try {
       const formData = new FormData();
       formData.append('file', file);
 
       const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
-      const response = await fetch(`${API_URL}/pdf/info`, {
+      const response = await fetch(`${API_URL}/documents`, {
         method: 'POST',
         body: formData,
       });
 
       if (response.ok) {
         const data = await response.json();
+        setDocumentId(data.document_id);
         setPdfInfo(data.info);
       }
     } catch (error) {
@@ -266,22 +270,24 @@ const PdfToolsSuite = () => {
       const formData = new FormData();
       const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
       let endpoint = '';
+      // Con el PDF ya subido se usa su id; si no, se envía el archivo
+      let documentEndpoint = null;
       
       switch (selectedTool) {
         case 'convert':
-          formData.append('file', file);
           endpoint = '/convert';
+          documentEndpoint = 'convert';
           break;
           
         case 'split_pages':
-          formData.append('file', file);
           endpoint = '/pdf/split/pages';
+          documentEndpoint = 'split/pages';
           break;
           
         case 'split_ranges':
-          formData.append('file', file);
           formData.append('ranges', JSON.stringify(splitRanges));
           endpoint = '/pdf/split/ranges';
+          documentEndpoint = 'split/ranges';
           break;
           
         case 'extract':
@@ -292,9 +298,9 @@ const PdfToolsSuite = () => {
           if (pages.length === 0) {
             throw new Error('Formato de páginas inválido');
           }
-          formData.append('file', file);
           formData.append('pages', JSON.stringify(pages));
           endpoint = '/pdf/extract/pages';
+          documentEndpoint = 'extract/pages';
           break;
           
         case 'merge':
@@ -308,10 +314,27 @@ const PdfToolsSuite = () => {
           throw new Error('Herramienta no válida');
       }
 
-      const response = await fetch(`${API_URL}${endpoint}`, {
-        method: 'POST',
-        body: formData,
-      });
+      let response = null;
+      if (documentEndpoint && documentId) {
+        response = await fetch(`${API_URL}/documents/${documentId}/${documentEndpoint}`, {
+          method: 'POST',
+          body: formData,
+        });
+        // El documento caducó en el servidor: se vuelve a enviar el archivo
+        if (response.status === 404) {
+          setDocumentId(null);
+          response = null;
+        }
+      }
+      if (!response) {
+        if (documentEndpoint) {
+          formData.append('file', file);
+        }
+        response = await fetch(`${API_URL}${endpoint}`, {
+          method: 'POST',
+          body: formData,
+        });
+      }
 
       clearInterval(progressInterval);
       setProgress(100);
@@ -367,6 +390,7 @@ const PdfToolsSuite = () => {
     setError(null);
     setSuccess(false);
     setPdfInfo(null);
+    setDocumentId(null);
     setSplitRanges([[1, 1]]);
     setExtractPages('');
     if (fileInputRef.current) {